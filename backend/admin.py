@@ -1,9 +1,15 @@
 import sqlite3
 from functools import wraps
 from typing import List, Tuple, Dict, Any
-from flask import Blueprint, jsonify, request, session, abort
-from werkzeug.security import generate_password_hash
+from flask import Blueprint, current_app, jsonify, request, session, abort
 from db import get_db
+from identity import current_user, forget_user
+from utils.hash import hash_password
+from streaming import stream_rows
+from fieldsets import Fieldset, InvalidFieldset, columnar_from_rows
+import images
+import jobs
+from bulk_import import IMPORTERS, iter_records, run_import
 
 # Blueprint
 
@@ -15,7 +21,8 @@ def admin_required(f):
     """Decorator that ensures the requester has an admin role."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get("role") != "admin":
+        user = current_user()
+        if not user or user["role"] != "admin":
             abort(403)  # Forbidden
         return f(*args, **kwargs)
 
@@ -36,37 +43,121 @@ def _validate_fields(data: Dict[str, Any], required: List[str]) -> Tuple[bool, L
 
 # READ (GET)
 
+
+def _listing_query(
+    select_sql: str,
+    sortable: Dict[str, str],
+    filters: Dict[str, str],
+    search: List[str],
+) -> Tuple[str, List[Any]]:
+    """Build a filtered, sorted, paged listing query from the request args.
+
+    ``sortable`` and ``filters`` map public parameter names to SQL columns;
+    ``search`` lists the columns matched by ``q``. Only whitelisted columns
+    ever reach the SQL text.
+    """
+    args = request.args
+    where, params = [], []
+    for name, column in filters.items():
+        if args.get(name) not in (None, ""):
+            where.append(f"{column} = ?")
+            params.append(args[name])
+    q = (args.get("q") or "").strip()
+    if q and search:
+        where.append("(" + " OR ".join(f"{c} LIKE ?" for c in search) + ")")
+        params.extend([f"%{q}%"] * len(search))
+
+    sort = args.get("sort", "id")
+    column = sortable.get(sort, sortable["id"])
+    direction = "DESC" if args.get("order", "asc").lower() == "desc" else "ASC"
+
+    sql = select_sql
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {column} {direction}"
+    if column != sortable["id"]:
+        sql += f", {sortable['id']} {direction}"
+    limit = args.get("limit", type=int)
+    offset = args.get("offset", 0, type=int)
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([limit if limit is not None and limit >= 0 else -1, max(offset, 0)])
+    return sql, params
+
+
+def _listing(fieldset: Fieldset, default_columns: str, from_sql: str, **query):
+    """Run a listing with ``?fields=`` and ``?format=`` applied and send it.
+
+    Row listings are streamed; columnar listings are built in memory.
+    """
+    try:
+        fields, columnar = fieldset.parse(request.args)
+    except InvalidFieldset as e:
+        return _error(str(e))
+    columns = fieldset.select(fields) if fields else default_columns
+    sql, params = _listing_query(f"SELECT {columns} {from_sql}", **query)
+    cursor = get_db().execute(sql, params)
+    if not columnar:
+        return stream_rows(cursor)
+    rows = cursor.fetchall()
+    if fields:
+        return jsonify(fieldset.shape(rows, fields, True))
+    return jsonify(columnar_from_rows([d[0] for d in cursor.description], rows))
+
+
+USER_FIELDS = Fieldset({
+    name: name
+    for name in ("id", "email", "username", "role", "full_name", "location", "profile_picture", "activities")
+})
+
+PLACE_FIELDS = Fieldset({
+    **{name: f"p.{name}" for name in (
+        "id", "name", "description", "location", "image", "rating", "latitude", "longitude",
+        "category_id", "review_count",
+    )},
+    "category": "c.name",
+})
+
+CATEGORY_FIELDS = Fieldset({name: name for name in ("id", "name", "description", "image")})
+
+
 @admin_bp.route("/users", methods=["GET"])
 @admin_required
 def get_users():
-    db = get_db()
-    users = db.execute(
-        "SELECT id, email, username, role FROM users ORDER BY id"
-    ).fetchall()
-    return jsonify([dict(row) for row in users])
+    return _listing(
+        USER_FIELDS,
+        "id, email, username, role",
+        "FROM users",
+        sortable={"id": "id", "username": "username", "email": "email", "role": "role"},
+        filters={"role": "role"},
+        search=["username", "email"],
+    )
 
 
 @admin_bp.route("/places", methods=["GET"])
 @admin_required
 def get_places():
-    db = get_db()
-    places = db.execute(
-        """
-        SELECT p.*, c.name AS category_id
-        FROM places p
-        LEFT JOIN categories c ON p.category_id = c.id
-        ORDER BY p.id
-        """
-    ).fetchall()
-    return jsonify([dict(row) for row in places])
+    return _listing(
+        PLACE_FIELDS,
+        "p.*, c.name AS category_id",
+        "FROM places p LEFT JOIN categories c ON p.category_id = c.id",
+        sortable={"id": "p.id", "name": "p.name", "rating": "p.rating", "category": "c.name"},
+        filters={"category_id": "p.category_id"},
+        search=["p.name", "p.location"],
+    )
 
 
 @admin_bp.route("/categories", methods=["GET"])
 @admin_required
 def get_categories():
-    db = get_db()
-    cats = db.execute("SELECT * FROM categories ORDER BY id").fetchall()
-    return jsonify([dict(row) for row in cats])
+    return _listing(
+        CATEGORY_FIELDS,
+        "*",
+        "FROM categories",
+        sortable={"id": "id", "name": "name"},
+        filters={},
+        search=["name"],
+    )
 
 
 
@@ -88,7 +179,7 @@ def add_user():
     )
     role = data.get("role", "client").strip() or "client"
 
-    hashed_pw = generate_password_hash(password)
+    hashed_pw = hash_password(password)
     db = get_db()
     try:
         db.execute(
@@ -120,7 +211,9 @@ def add_category():
             "INSERT INTO categories (name, description, image) VALUES (?, ?, ?)",
             (name, description, image),
         )
+        jobs.process_image(db, image)
         db.commit()
+        jobs.notify()
         return jsonify({"message": "Category added successfully."}), 201
     except sqlite3.IntegrityError:
         return _error("Category name already exists", 409)
@@ -162,7 +255,9 @@ def add_place():
         """,
         fields,
     )
+    jobs.process_image(db, fields[3])
     db.commit()
+    jobs.notify()
     return jsonify({"message": "Place added successfully."}), 201
 
 
@@ -181,9 +276,12 @@ def _generic_update(table: str, item_id: int, data: Dict[str, Any]):
 
     try:
         db.execute(f"UPDATE {table} SET {set_clause} WHERE id = ?", values)
+        for column in ("image", "profile_picture"):
+            jobs.process_image(db, data.get(column))
         db.commit()
     except sqlite3.IntegrityError as e:
         return _error(str(e), 409)
+    jobs.notify()
 
     return jsonify({"message": f"{table.rstrip('s').capitalize()} updated."})
 
@@ -193,8 +291,10 @@ def _generic_update(table: str, item_id: int, data: Dict[str, Any]):
 def update_user(item_id):
     data = request.get_json(force=True, silent=True) or {}
     if "password" in data:
-        data["password"] = generate_password_hash(data["password"])
-    return _generic_update("users", item_id, data)
+        data["password"] = hash_password(data["password"])
+    response = _generic_update("users", item_id, data)
+    forget_user(item_id)
+    return response
 
 
 @admin_bp.route("/categories/<int:item_id>", methods=["PUT"])
@@ -215,28 +315,146 @@ def update_place(item_id):
 # DELETE
 
 
+def _delete_with_job(table: str, item_id: int, noun: str, kind: str, **params):
+    """Delete one row now and queue a job to clean up the rows that refer to it."""
+    db = get_db()
+    if db.execute(f"DELETE FROM {table} WHERE id = ?", (item_id,)).rowcount == 0:
+        db.rollback()
+        return _error(f"{noun} not found.", 404)
+    job_id = jobs.enqueue(db, kind, **params)
+    db.commit()
+    jobs.notify()
+    return jsonify({"message": f"{noun} deleted.", "job_id": job_id}), 202
+
+
 @admin_bp.route("/users/<int:item_id>", methods=["DELETE"])
 @admin_required
 def delete_user(item_id):
-    db = get_db()
-    db.execute("DELETE FROM users WHERE id = ?", (item_id,))
-    db.commit()
-    return jsonify({"message": "User deleted."})
+    job_id = jobs.delete_user(get_db(), item_id)
+    if job_id is None:
+        return _error("User not found.", 404)
+    return jsonify({"message": "User deleted.", "job_id": job_id}), 202
 
 
 @admin_bp.route("/categories/<int:item_id>", methods=["DELETE"])
 @admin_required
 def delete_category(item_id):
-    db = get_db()
-    db.execute("DELETE FROM categories WHERE id = ?", (item_id,))
-    db.commit()
-    return jsonify({"message": "Category deleted."})
+    return _delete_with_job("categories", item_id, "Category", "delete_category", category_id=item_id)
 
 
 @admin_bp.route("/places/<int:item_id>", methods=["DELETE"])
 @admin_required
 def delete_place(item_id):
+    return _delete_with_job("places", item_id, "Place", "delete_place", place_id=item_id)
+
+
+# JOBS
+
+
+@admin_bp.route("/jobs", methods=["GET"])
+@admin_required
+def list_jobs():
+    status = request.args.get("status")
+    if status is not None and status not in jobs.STATUSES:
+        return _error(f"status must be one of {', '.join(jobs.STATUSES)}")
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    return jsonify({"jobs": jobs.recent_jobs(get_db(), status, limit)})
+
+
+@admin_bp.route("/jobs", methods=["POST"])
+@admin_required
+def start_job():
+    """Queue a maintenance job: {"kind": "recompute_ratings" | "rebuild_indexes", "params": {...}}."""
+    data = request.get_json(force=True, silent=True) or {}
+    kind = data.get("kind")
+    params = data.get("params") or {}
+    if kind not in jobs.ADMIN_KINDS:
+        return _error(f"kind must be one of {', '.join(jobs.ADMIN_KINDS)}")
+    if not isinstance(params, dict):
+        return _error("params must be an object")
+    if kind == "rebuild_indexes":
+        names = params.get("indexes") or []
+        if not isinstance(names, list) or any(n not in jobs.INDEXES for n in names):
+            return _error(f"indexes must be a list of {', '.join(jobs.INDEXES)}")
+        params = {"indexes": names}
+    else:
+        params = {}
     db = get_db()
-    db.execute("DELETE FROM places WHERE id = ?", (item_id,))
+    job_id = jobs.enqueue(db, kind, **params)
     db.commit()
-    return jsonify({"message": "Place deleted."})
\ No newline at end of file
+    jobs.notify()
+    return jsonify({"job_id": job_id, "job": jobs.get_job(db, job_id)}), 202
+
+
+@admin_bp.route("/jobs/<int:job_id>", methods=["GET"])
+@admin_required
+def get_job(job_id):
+    job = jobs.get_job(get_db(), job_id)
+    if job is None:
+        return _error("Job not found.", 404)
+    return jsonify(job)
+
+
+# IMAGES
+
+
+@admin_bp.route("/images", methods=["POST"])
+@admin_required
+def upload_image():
+    """Store an uploaded image and queue building its derivatives.
+
+    The image may be a multipart ``file`` field or the raw request body. The
+    returned ``image`` is the value to save in places.image, categories.image
+    or users.profile_picture; ``image_set`` stays None until the job is done.
+    """
+    if not images.available():
+        return _error("Image processing is not available on this server", 503)
+    upload = request.files.get("file")
+    limit = current_app.config["IMAGE_MAX_UPLOAD_BYTES"]
+    data = (upload.stream if upload is not None else request.stream).read(limit + 1)
+    if not data:
+        return _error("No image uploaded")
+    if len(data) > limit:
+        return _error(f"Image too large (max {limit} bytes)", 413)
+    try:
+        source = images.save_upload(data)
+    except images.InvalidImage:
+        return _error("Unsupported or corrupt image")
+    db = get_db()
+    job_id = jobs.process_image(db, source)
+    db.commit()
+    jobs.notify()
+    body = images.with_image_sets([{"image": source}])[0]
+    return jsonify({**body, "job_id": job_id}), 202
+
+
+# BULK IMPORT
+
+
+@admin_bp.route("/import/<entity>", methods=["POST"])
+@admin_required
+def import_entity(entity):
+    """Import many rows at once from a CSV or NDJSON upload.
+
+    The upload may be a multipart ``file`` field or the raw request body. The
+    format comes from ``?format=csv|ndjson``, else the content type or file
+    extension, defaulting to CSV.
+    """
+    if entity not in IMPORTERS:
+        return _error(f"Unknown entity: {entity}", 404)
+
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, mimetype = upload.stream, upload.filename or "", upload.mimetype
+    else:
+        stream, filename, mimetype = request.stream, "", request.mimetype
+
+    fmt = request.args.get("format")
+    if fmt is None:
+        is_ndjson = "ndjson" in mimetype or filename.endswith((".ndjson", ".jsonl"))
+        fmt = "ndjson" if is_ndjson else "csv"
+    if fmt not in ("csv", "ndjson"):
+        return _error("format must be 'csv' or 'ndjson'")
+
+    report = run_import(get_db(), entity, iter_records(stream, fmt))
+    return jsonify(report), 200
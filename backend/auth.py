@@ -2,8 +2,10 @@ import sqlite3
 from functools import wraps
 from flask import session, jsonify
 from flask import Blueprint, request, jsonify, session
-from werkzeug.security import check_password_hash, generate_password_hash
 from db import get_db
+from utils.hash import check_password, hash_password, needs_rehash
+from identity import current_user, forget_user
+import jobs
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 
@@ -18,7 +20,7 @@ def signup():
     if not all([username, email, password]):
         return jsonify({"error": "Missing required fields"}), 400
         
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     role = data.get('role', 'client')
 
     db = get_db()
@@ -62,7 +64,12 @@ def login_user():
     db = get_db()
     user = db.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
 
-    if user and check_password_hash(user['password'], password):
+    if user and check_password(user['password'], password):
+        if needs_rehash(user['password']):
+            # Transparently upgrade hashes made with an older method or cost.
+            db.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user['id']))
+            db.commit()
+        forget_user(user['id'])
         session.permanent = True
         session['user_id'] = user['id']
         session['role'] = user['role']
@@ -82,13 +89,15 @@ def login_user():
 
 @auth_bp.route('/check-auth', methods=['GET'])
 def check_auth():
-    user_id = session.get('user_id')
-    role = session.get('role')
+    user = current_user()
+    if not user:
+        return jsonify({"logged_in": False})
 
-    if user_id:
-        return jsonify({"logged_in": True, "user_role": role})
-        
-    return jsonify({"logged_in": False})
+    return jsonify({
+        "logged_in": True,
+        "user_role": user['role'],
+        "user": {"id": user['id'], "username": user['username'], "role": user['role']}
+    })
 
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -102,12 +111,11 @@ def get_profile():
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
-    db = get_db()
-    user = db.execute(
-        "SELECT id, username, email, full_name, location, profile_picture, activities FROM users WHERE id = ?",
-        (user_id,)
-    ).fetchone()
-    return jsonify(dict(user)) if user else jsonify({"error": "Not found"}), 404
+    user = current_user()
+    if not user:
+        return jsonify({"error": "Not found"}), 404
+    fields = ('id', 'username', 'email', 'full_name', 'location', 'profile_picture', 'activities')
+    return jsonify({k: user[k] for k in fields})
 
 
 @auth_bp.route('/adrenaid', methods=['PUT'])
@@ -132,6 +140,7 @@ def update_profile():
         )
     )
     db.commit()
+    forget_user(user_id)
     return jsonify({"message": "Profile updated"})
 
 
@@ -141,16 +150,17 @@ def delete_account():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    db = get_db()
-    db.execute("DELETE FROM users WHERE id=?", (user_id,))
-    db.commit()
+    job_id = jobs.delete_user(get_db(), user_id)
     session.clear()
-    return jsonify({"message": "Account deleted"})
+    if job_id is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify({"message": "Account deleted", "job_id": job_id}), 202
 
 def require_admin(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get('role') != 'admin':
+        user = current_user()
+        if not user or user['role'] != 'admin':
             return jsonify({"error": "Forbidden: Admins only"}), 403
         return f(*args, **kwargs)
     return decorated_function
\ No newline at end of file
@@ -0,0 +1,128 @@
+import contextvars
+import io
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from flask import current_app, jsonify, request, session
+from flask.ctx import RequestContext
+from db import get_db
+from identity import current_user
+from response_cache import table_versions
+
+# Batched GETs.
+#
+# POST /api/batch with {"requests": ["/api/check-auth", {"id": "cats", "path":
+# "/api/categories"}, ...]} runs each GET against the normal view functions
+# and answers with {"responses": [{"id", "path", "status", "body"}, ...]} in
+# request order, so a cold page load costs one round trip. JSON bodies are
+# copied into the combined response byte for byte.
+#
+# Sub-requests run inside the batch request's app context: they share its
+# session (decoded once), its pooled connection, its identity and
+# table_versions lookups, and its metrics and query profile. They run
+# concurrently on BATCH_WORKERS threads; the shared connection is safe because
+# SQLite is built serialized (sqlite3.threadsafety == 3) and no GET handler
+# writes; a GET that started writing would share its transaction with the
+# other sub-requests. Per-request hooks (metrics, profiler headers,
+# compression) run once, for the batch itself.
+#
+# Streamed responses (the SSE feed, the admin listings) are closed unread and
+# answered with a 400 item: a stream may never end and would hold a worker.
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def _parse(data, max_requests):
+    items = data.get("requests") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise InvalidBatch("requests must be a non-empty list")
+    if len(items) > max_requests:
+        raise InvalidBatch(f"Too many requests (max {max_requests})")
+    parsed = []
+    for n, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"path": item}
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            raise InvalidBatch(f"requests[{n}] must be a path or an object with a path")
+        if item.get("method", "GET").upper() != "GET":
+            raise InvalidBatch(f"requests[{n}]: only GET requests can be batched")
+        url = urlsplit(item["path"])
+        if url.scheme or url.netloc or not url.path.startswith("/api/") or url.path == "/api/batch":
+            raise InvalidBatch(f"requests[{n}]: path must be an /api/ path other than /api/batch")
+        parsed.append((item.get("id", n), item["path"], url.path, url.query))
+    return parsed
+
+
+def _environ(path, query):
+    environ = {k: v for k, v in request.environ.items() if not k.startswith("werkzeug.")}
+    for header in ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE", "HTTP_RANGE", "CONTENT_TYPE"):
+        environ.pop(header, None)
+    environ.update(
+        {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "CONTENT_LENGTH": "0",
+            "wsgi.input": io.BytesIO(),
+        }
+    )
+    return environ
+
+
+def _dispatch(app, environ, shared_session):
+    with RequestContext(app, environ, session=shared_session):
+        try:
+            response = app.make_response(app.dispatch_request())
+            if response.is_streamed:
+                # Streams (SSE, the admin listings) may never end; they can't be batched.
+                response.close()
+                return 400, app.json.dumps({"error": "Streamed responses cannot be batched"}).encode()
+        except Exception as e:
+            try:
+                response = app.make_response(app.handle_user_exception(e))
+            except Exception:
+                app.logger.exception(f"batch sub-request {environ['PATH_INFO']} failed")
+                return 500, app.json.dumps({"error": "Internal server error"}).encode()
+        data = response.get_data()
+        if response.is_json:
+            return response.status_code, data.strip() or b"null"
+        if response.status_code >= 400:
+            return response.status_code, app.json.dumps({"error": response.status}).encode()
+        return response.status_code, app.json.dumps(data.decode("utf-8", "replace")).encode()
+
+
+def handle_batch():
+    max_requests = current_app.config.get("BATCH_MAX_REQUESTS", 20)
+    try:
+        items = _parse(request.get_json(silent=True), max_requests)
+    except InvalidBatch as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Resolve the shared per-request state once, before any threads race for it.
+    get_db()
+    table_versions()
+    current_user()
+    app = current_app._get_current_object()
+    shared_session = session._get_current_object()
+    jobs = [(app, _environ(path, query), shared_session) for _, _, path, query in items]
+    executor = app.extensions.get("batch_executor")
+    if executor is None or len(jobs) == 1:
+        results = [_dispatch(*job) for job in jobs]
+    else:
+        futures = [executor.submit(contextvars.copy_context().run, _dispatch, *job) for job in jobs]
+        results = [f.result() for f in futures]
+    # Sub-responses are already JSON; splice them in rather than re-encoding.
+    parts = []
+    for (item_id, full_path, _, _), (status, body) in zip(items, results):
+        head = app.json.dumps({"id": item_id, "path": full_path, "status": status})
+        parts.append(head[:-1].encode() + b',"body":' + body + b"}")
+    return app.response_class(b'{"responses":[' + b",".join(parts) + b"]}\n", mimetype="application/json")
+
+
+def init_app(app):
+    """Register POST /api/batch and its worker pool."""
+    workers = app.config.get("BATCH_WORKERS", 4)
+    if workers > 1:
+        app.extensions["batch_executor"] = ThreadPoolExecutor(workers, thread_name_prefix="batch")
+    app.add_url_rule("/api/batch", "batch", handle_batch, methods=["POST"])
@@ -0,0 +1,9 @@
+"""Benchmarks for the backend. Run modules from the backend directory, e.g.
+
+    python -m benchmarks.nearby
+    python -m benchmarks.datagen /tmp/bench.db --preset medium
+    python -m benchmarks.load /tmp/bench.db
+    python -m benchmarks.write_queue /tmp/bench.db
+    python -m benchmarks.encoding /tmp/bench.db
+    python -m benchmarks.metrics /tmp/bench.db
+"""
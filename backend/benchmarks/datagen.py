@@ -0,0 +1,199 @@
+"""Generate a deterministic synthetic database at configurable scale.
+
+    python -m benchmarks.datagen /tmp/bench.db --preset production
+    python -m benchmarks.datagen /tmp/bench.db --places 5000 --reviews 100000
+
+The schema comes from the app itself: starting it on the empty file runs the
+migrations and installs the triggers and derived tables, so review stats,
+search and spatial indexes and forum counters are maintained exactly as in
+production.
+The same arguments and seed always produce the same rows. Every user's
+password is "benchmark"; user 1 is an admin.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+import uuid
+
+from werkzeug.security import generate_password_hash
+
+PRESETS = {
+    "small": dict(users=2_000, places=1_000, reviews=20_000, favorites=10_000, posts=1_000, comments=20_000),
+    "medium": dict(users=20_000, places=20_000, reviews=500_000, favorites=100_000, posts=10_000, comments=200_000),
+    "production": dict(
+        users=100_000, places=100_000, reviews=5_000_000, favorites=500_000, posts=50_000, comments=1_000_000
+    ),
+}
+
+PASSWORD = "benchmark"
+BATCH = 10_000
+EPOCH = datetime.datetime(2024, 1, 1)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+# Rough bounding box of Great Britain, as in benchmarks.nearby.
+UK_BBOX = (-6.5, 49.9, 1.8, 58.7)
+
+CATEGORIES = (
+    ("Skydiving", "Freefall from 15,000 ft"),
+    ("Bungee Jumping", "Bridges, cranes and gorges"),
+    ("White Water Rafting", "Grade 3 to 5 rapids"),
+    ("Rock Climbing", "Crags, sea cliffs and walls"),
+    ("Paragliding", "Ridge and thermal flying"),
+    ("Surfing", "Reef and beach breaks"),
+    ("Mountain Biking", "Trail centres and downhill"),
+    ("Caving", "Potholes and cave systems"),
+)
+TOWNS = (
+    "London", "Manchester", "Bristol", "Leeds", "Glasgow", "Edinburgh", "Cardiff", "Newquay",
+    "Keswick", "Fort William", "Aviemore", "Snowdonia", "Brighton", "York", "Inverness", "Plymouth",
+)
+ADJECTIVES = ("Wild", "High", "Extreme", "Storm", "Rapid", "Summit", "Vertical", "Red", "Black", "Thunder")
+NOUNS = ("Ridge", "Falls", "Drop", "Point", "Valley", "Peak", "Gorge", "Bay", "Edge", "Canyon")
+WORDS = (
+    "amazing", "scary", "worth", "instructor", "weather", "booking", "views", "safety", "briefing",
+    "adrenaline", "friendly", "expensive", "queue", "gear", "again", "first", "time", "best", "rush",
+)
+
+
+def _text(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _timestamp(rng):
+    return (EPOCH + datetime.timedelta(seconds=rng.randrange(SPAN_SECONDS))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _insert(conn, sql, rows, label):
+    start = time.perf_counter()
+    batch, total = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    print(f"{label:>16}: {total:>9} rows in {time.perf_counter() - start:6.1f} s", file=sys.stderr)
+
+
+def _users(rng, n, password_hash):
+    for i in range(1, n + 1):
+        yield (
+            f"user{i}", f"user{i}@example.com", password_hash, "admin" if i == 1 else "client",
+            f"User {i}", rng.choice(TOWNS), None, ",".join(c[0] for c in rng.sample(CATEGORIES, 2)),
+        )
+
+
+def _places(rng, n, categories):
+    min_lng, min_lat, max_lng, max_lat = UK_BBOX
+    for i in range(1, n + 1):
+        yield (
+            f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}", _text(rng, 20), rng.choice(TOWNS),
+            f"/images/place-{i % 50}.jpg", rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng),
+            rng.randint(1, categories),
+        )
+
+
+def _reviews(rng, n, places, users):
+    # Skewed per-place counts: a few places collect most of the reviews.
+    weights = [1.0 / (i + 1) ** 0.8 for i in range(places)]
+    scale = n / sum(weights)
+    order = list(range(1, places + 1))
+    rng.shuffle(order)
+    remaining = n
+    for place_id, w in zip(order, weights):
+        k = min(remaining, users, max(0, round(w * scale)))
+        remaining -= k
+        for user_id in rng.sample(range(1, users + 1), k):
+            yield place_id, user_id, rng.randint(1, 5), _text(rng, 12), _timestamp(rng)
+        if remaining <= 0:
+            break
+
+
+def _favorites(rng, n, places, users):
+    seen = set()
+    while len(seen) < n:
+        pair = (rng.randint(1, users), rng.randint(1, places))
+        if pair not in seen:
+            seen.add(pair)
+            yield pair
+
+
+def _posts(rng, n, users, post_ids):
+    for _ in range(n):
+        post_ids.append(str(uuid.UUID(int=rng.getrandbits(128), version=4)))
+        yield (
+            post_ids[-1], rng.choice(CATEGORIES)[0], f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} trip report",
+            _text(rng, 60), f"user{rng.randint(1, users)}", _timestamp(rng),
+        )
+
+
+def _comments(rng, n, users, post_ids):
+    for _ in range(n):
+        yield rng.choice(post_ids), f"user{rng.randint(1, users)}", _text(rng, 15), _timestamp(rng)
+
+
+def generate(path, users, places, reviews, favorites, posts, comments, seed=42):
+    """Create a fresh database at path and fill it with synthetic rows."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    users = max(users, 1)
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Starting the app runs the migrations and installs triggers and derived tables.
+    os.environ["DATABASE"] = os.path.abspath(path)
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    sys.path.insert(0, backend)
+    import run  # noqa: F401  (creates the app on import)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    password_hash = generate_password_hash(PASSWORD)
+    _insert(conn, "INSERT INTO categories (name, description, image) VALUES (?, ?, ?)",
+            ((name, desc, f"/images/category-{i}.jpg") for i, (name, desc) in enumerate(CATEGORIES)),
+            "categories")
+    _insert(conn, "INSERT INTO users (username, email, password, role, full_name, location, "
+                  "profile_picture, activities) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            _users(rng, users, password_hash), "users")
+    _insert(conn, "INSERT INTO places (name, description, location, image, latitude, longitude, category_id) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _places(rng, places, len(CATEGORIES)), "places")
+    _insert(conn, "INSERT INTO reviews (place_id, user_id, rating, text, created_at) VALUES (?, ?, ?, ?, ?)",
+            _reviews(rng, reviews, places, users), "reviews")
+    _insert(conn, "INSERT INTO user_favorites (user_id, place_id) VALUES (?, ?)",
+            _favorites(rng, min(favorites, users * places), places, users), "favorites")
+    post_ids = []
+    _insert(conn, "INSERT INTO forum_posts (id, category, title, body, username, created_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?)",
+            _posts(rng, posts, users, post_ids), "forum posts")
+    if post_ids:
+        _insert(conn, "INSERT INTO forum_comments (post_id, username, body, created_at) VALUES (?, ?, ?, ?)",
+                _comments(rng, comments, users, post_ids), "forum comments")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    for name in PRESETS["small"]:
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    scale = {k: getattr(args, k) if getattr(args, k) is not None else v for k, v in PRESETS[args.preset].items()}
+    generate(args.path, seed=args.seed, **scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure bytes on the wire and JSON serialization time for the large listings.
+
+    python -m benchmarks.datagen /tmp/bench.db --preset medium
+    python -m benchmarks.encoding /tmp/bench.db --repeat 5
+
+For each endpoint it reports the identity, gzip and brotli body sizes, the
+time to compress the body once (what a response-cache miss pays), the time to
+serialize the decoded payload with Flask's stdlib provider and with the orjson
+provider, and the median request time per Accept-Encoding with the response
+cache warm. The database is copied, never modified.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("/api/places", "/api/category/1", "/api/admin/places", "/api/admin/users")
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="database made by benchmarks.datagen (copied, never modified)")
+    parser.add_argument("--repeat", type=int, default=5, help="timings keep the best (or median) of this many")
+    args = parser.parse_args()
+    sys.path.insert(0, BACKEND)
+
+    workdir = tempfile.mkdtemp(prefix="bench-enc-")
+    database = os.path.join(workdir, "bench.db")
+    shutil.copy(args.database, database)
+    os.environ.update(DATABASE=database, FLASK_ENV="development", QUERY_PROFILER="0")
+    import run
+    from flask.json.provider import DefaultJSONProvider
+    from compression import brotli, compress
+    from json_provider import FastJSONProvider, orjson
+
+    app = run.create_app()
+    app.config["TESTING"] = True
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"], sess["role"] = 1, "admin"
+    stdlib, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    encodings = ENCODINGS if brotli is not None else ENCODINGS[:2]
+    if orjson is None:
+        print("orjson is not installed: the fast provider falls back to the stdlib encoder")
+
+    print(f"{'endpoint':<20} {'identity':>10} {'gzip':>10} {'br':>10} {'gzip ms':>8} {'br ms':>8} "
+          f"{'stdlib ms':>10} {'orjson ms':>10}")
+    timings = {}
+    for url in ENDPOINTS:
+        body = client.get(url, headers={"Accept-Encoding": "identity"}).get_data()
+        payload = json.loads(body)
+        sizes, compress_ms = {"identity": len(body)}, {}
+        for encoding in encodings[1:]:
+            sizes[encoding] = len(compress(body, encoding, app.config))
+            compress_ms[encoding] = _best(lambda: compress(body, encoding, app.config), args.repeat)
+        with app.app_context():
+            stdlib_ms = _best(lambda: stdlib.dumps(payload, separators=(",", ":")), args.repeat)
+            fast_ms = _best(lambda: fast.dumps(payload), args.repeat)
+        print(
+            f"{url:<20} {sizes['identity']:>10} {sizes.get('gzip', 0):>10} {sizes.get('br', 0):>10} "
+            f"{compress_ms.get('gzip', 0):>8.2f} {compress_ms.get('br', 0):>8.2f} {stdlib_ms:>10.2f} {fast_ms:>10.2f}"
+        )
+        for encoding in encodings:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                client.get(url, headers={"Accept-Encoding": encoding}).get_data()
+                times.append(time.perf_counter() - start)
+            timings[(url, encoding)] = statistics.median(times) * 1000
+
+    print("\nmedian request ms, response cache warm")
+    print(f"{'endpoint':<20} " + " ".join(f"{e:>10}" for e in encodings))
+    for url in ENDPOINTS:
+        print(f"{url:<20} " + " ".join(f"{timings[(url, e)]:>10.2f}" for e in encodings))
+    print(f"\ncompressed-body cache: {app.extensions['compression'].stats()}")
+    with app.app_context():
+        run.get_pool().close_all()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Drive every API route through the Flask test client and record latency.
+
+    python -m benchmarks.datagen /tmp/bench.db --preset medium
+    python -m benchmarks.load /tmp/bench.db --iterations 200 --concurrency 4
+
+Each run works on a copy of the database, so runs start from identical data.
+For every route it reports p50/p95/p99 latency, throughput and status codes,
+and it reports the process's peak RSS. Results are written to --output
+(default benchmarks/results/last.json). The file already there, or --baseline
+when given, is treated as the previous run and compared against.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.datagen import CATEGORIES, PASSWORD, UK_BBOX, WORDS
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(BACKEND, "benchmarks", "results", "last.json")
+
+Scenario = namedtuple("Scenario", "name method rule build")
+
+
+class Context:
+    """Ids to request and untimed setup helpers shared by the scenarios."""
+
+    def __init__(self, conn, seed):
+        self.rng = random.Random(seed)
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.counter = 0
+        one = lambda sql: conn.execute(sql).fetchone()[0] or 0  # noqa: E731
+        self.max_user = one("SELECT MAX(id) FROM users")
+        self.max_place = one("SELECT MAX(id) FROM places")
+        self.category_ids = [r[0] for r in conn.execute("SELECT id FROM categories")]
+        self.post_ids = [r[0] for r in conn.execute("SELECT id FROM forum_posts LIMIT 1000")]
+        self.password_hash = generate_password_hash(PASSWORD)
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+    def user(self):
+        return self.rng.randint(2, max(self.max_user, 2))
+
+    def place(self):
+        return self.rng.randint(1, max(self.max_place, 1))
+
+    def point(self):
+        min_lng, min_lat, max_lng, max_lat = UK_BBOX
+        return self.rng.uniform(min_lat, max_lat), self.rng.uniform(min_lng, max_lng)
+
+    def _insert(self, sql, params):
+        cur = self.conn.execute(sql, params)
+        self.conn.commit()
+        return cur.lastrowid
+
+    def new_user(self):
+        n = self.next()
+        return self._insert(
+            "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+            (f"bench-{n}", f"bench-{n}@example.com", self.password_hash),
+        )
+
+    def new_place(self):
+        lat, lng = self.point()
+        return self._insert(
+            "INSERT INTO places (name, latitude, longitude, category_id) VALUES (?, ?, ?, ?)",
+            (f"Bench place {self.next()}", lat, lng, self.rng.choice(self.category_ids)),
+        )
+
+    def new_category(self):
+        return self._insert("INSERT INTO categories (name) VALUES (?)", (f"Bench category {self.next()}",))
+
+    def new_review(self):
+        return self._insert(
+            "INSERT INTO reviews (place_id, user_id, rating, text) VALUES (?, ?, 3, 'ok')",
+            (self.place(), self.new_user()),
+        )
+
+    def new_post(self):
+        post_id = f"bench-post-{self.next()}"
+        self._insert(
+            "INSERT INTO forum_posts (id, category, title, body, username) VALUES (?, 'Bench', 't', 'b', 'user2')",
+            (post_id,),
+        )
+        return post_id
+
+
+def _req(url, user=None, **kwargs):
+    return dict(url=url, user=user, **kwargs)
+
+
+def _bbox(ctx):
+    lat, lng = ctx.point()
+    span = ctx.rng.choice((0.2, 1.0, 4.0))
+    zoom = ctx.rng.randint(5, 13)
+    return f"/api/places?bbox={lng - span},{lat - span},{lng + span},{lat + span}&zoom={zoom}"
+
+
+def _nearby(ctx):
+    lat, lng = ctx.point()
+    return f"/api/places/nearby?lat={lat:.4f}&lng={lng:.4f}&k=10"
+
+
+def _import_body(ctx):
+    rows = []
+    for _ in range(100):
+        lat, lng = ctx.point()
+        rows.append(json.dumps({
+            "name": f"Imported {ctx.next()}", "latitude": lat, "longitude": lng,
+            "category_id": ctx.rng.choice(ctx.category_ids),
+        }))
+    return "\n".join(rows).encode()
+
+
+ADMIN = 1
+
+SCENARIOS = [
+    # Public reads.
+    Scenario("health", "GET", "/api/health", lambda c: _req("/api/health")),
+    Scenario("categories", "GET", "/api/categories", lambda c: _req("/api/categories")),
+    Scenario("places", "GET", "/api/places", lambda c: _req("/api/places")),
+    Scenario("places_bbox", "GET", "/api/places", lambda c: _req(_bbox(c))),
+    Scenario("places_markers", "GET", "/api/places", lambda c: _req(
+        "/api/places?fields=id,name,latitude,longitude,category_id,rating&format=columnar")),
+    Scenario("places_nearby", "GET", "/api/places/nearby", lambda c: _req(_nearby(c))),
+    Scenario("category", "GET", "/api/category/<int:id>",
+             lambda c: _req(f"/api/category/{c.rng.choice(c.category_ids)}")),
+    Scenario("place", "GET", "/api/place/<int:id>", lambda c: _req(f"/api/place/{c.place()}")),
+    Scenario("user_public", "GET", "/api/users/<int:user_id>", lambda c: _req(f"/api/users/{c.user()}")),
+    Scenario("search_places", "GET", "/api/search", lambda c: _req(f"/api/search?q={c.rng.choice(WORDS)}")),
+    Scenario("search_posts", "GET", "/api/search",
+             lambda c: _req(f"/api/search?type=posts&q={c.rng.choice(WORDS)}")),
+    Scenario("community_list", "GET", "/api/community", lambda c: _req("/api/community")),
+    Scenario("community_hot", "GET", "/api/community", lambda c: _req("/api/community?sort=hot")),
+    Scenario("community_active", "GET", "/api/community", lambda c: _req("/api/community?sort=active")),
+    Scenario("community_post", "GET", "/api/community/<string:post_id>",
+             lambda c: _req(f"/api/community/{c.rng.choice(c.post_ids or ['missing'])}")),
+    # Signed-in reads.
+    Scenario("check_auth", "GET", "/api/check-auth", lambda c: _req("/api/check-auth", c.user())),
+    Scenario("adrenaid_get", "GET", "/api/adrenaid", lambda c: _req("/api/adrenaid", c.user())),
+    Scenario("profile_me_get", "GET", "/api/profile/me", lambda c: _req("/api/profile/me", c.user())),
+    Scenario("favorites_list", "GET", "/api/user/favorites", lambda c: _req("/api/user/favorites", c.user())),
+    Scenario("places_personalized", "GET", "/api/places", lambda c: _req("/api/places", c.user())),
+    Scenario("batch_startup", "POST", "/api/batch", lambda c: _req("/api/batch", c.user(), json={
+        "requests": ["/api/check-auth", "/api/categories", "/api/places", "/api/user/favorites"]})),
+    # Auth.
+    Scenario("signup", "POST", "/api/signup", lambda c: _req("/api/signup", json={
+        "username": f"signup-{c.next()}", "email": f"signup-{c.counter}@example.com", "password": PASSWORD})),
+    Scenario("login", "POST", "/api/login", lambda c: _req("/api/login", json={
+        "email": f"user{c.user()}@example.com", "password": PASSWORD})),
+    Scenario("logout", "POST", "/api/logout", lambda c: _req("/api/logout", c.user())),
+    # Signed-in writes.
+    Scenario("adrenaid_put", "PUT", "/api/adrenaid", lambda c: _req("/api/adrenaid", c.user(), json={
+        "full_name": "Bench User", "location": "York", "activities": ["Surfing"]})),
+    Scenario("profile_me_put", "PUT", "/api/profile/me", lambda c: _req("/api/profile/me", c.user(), json={
+        "full_name": "Bench User", "location": "Leeds"})),
+    Scenario("profile_me_delete", "DELETE", "/api/profile/me", lambda c: _req("/api/profile/me", c.new_user())),
+    Scenario("delete_account", "DELETE", "/api/profile", lambda c: _req("/api/profile", c.new_user())),
+    Scenario("favorite_add", "POST", "/api/user/favorites",
+             lambda c: _req("/api/user/favorites", c.user(), json={"placeId": c.place()})),
+    Scenario("favorite_remove", "DELETE", "/api/user/favorites",
+             lambda c: _req("/api/user/favorites", c.user(), json={"placeId": c.place()})),
+    Scenario("favorites_sync", "POST", "/api/user/favorites/sync", lambda c: _req(
+        "/api/user/favorites/sync", c.user(),
+        json={"add": [c.place() for _ in range(5)], "remove": [c.place() for _ in range(5)]})),
+    Scenario("review_add", "POST", "/api/place/<int:id>/review", lambda c: _req(
+        f"/api/place/{c.place()}/review", c.new_user(), json={"text": "Great fun", "rating": 4})),
+    Scenario("review_delete", "DELETE", "/api/review/<int:review_id>",
+             lambda c: _req(f"/api/review/{c.new_review()}", ADMIN)),
+    Scenario("post_create", "POST", "/api/community", lambda c: _req("/api/community", c.user(), json={
+        "title": "Bench post", "body": "Benchmark body", "category": CATEGORIES[0][0]})),
+    Scenario("comment_add", "POST", "/api/community/<string:post_id>/comments", lambda c: _req(
+        f"/api/community/{c.rng.choice(c.post_ids or ['missing'])}/comments", c.user(), json={"body": "+1"})),
+    Scenario("post_delete", "DELETE", "/api/community/<string:post_id>",
+             lambda c: _req(f"/api/community/{c.new_post()}", ADMIN)),
+    # Admin.
+    Scenario("metrics", "GET", "/api/metrics", lambda c: _req("/api/metrics", ADMIN)),
+    Scenario("admin_users", "GET", "/api/admin/users",
+             lambda c: _req(f"/api/admin/users?q=user{c.rng.randint(1, 99)}&limit=50", ADMIN)),
+    Scenario("admin_places", "GET", "/api/admin/places",
+             lambda c: _req(f"/api/admin/places?sort=name&limit=100&offset={c.rng.randint(0, 1000)}", ADMIN)),
+    Scenario("admin_categories", "GET", "/api/admin/categories", lambda c: _req("/api/admin/categories", ADMIN)),
+    Scenario("admin_user_add", "POST", "/api/admin/users", lambda c: _req("/api/admin/users", ADMIN, json={
+        "username": f"admin-add-{c.next()}", "email": f"admin-add-{c.counter}@example.com",
+        "password": PASSWORD})),
+    Scenario("admin_category_add", "POST", "/api/admin/categories",
+             lambda c: _req("/api/admin/categories", ADMIN, json={"name": f"Added category {c.next()}"})),
+    Scenario("admin_place_add", "POST", "/api/admin/places", lambda c: _req("/api/admin/places", ADMIN, json={
+        "name": f"Added place {c.next()}", "category_id": c.rng.choice(c.category_ids)})),
+    Scenario("admin_user_update", "PUT", "/api/admin/users/<int:item_id>",
+             lambda c: _req(f"/api/admin/users/{c.user()}", ADMIN, json={"location": "Bristol"})),
+    Scenario("admin_category_update", "PUT", "/api/admin/categories/<int:item_id>", lambda c: _req(
+        f"/api/admin/categories/{c.rng.choice(c.category_ids)}", ADMIN, json={"description": "Updated"})),
+    Scenario("admin_place_update", "PUT", "/api/admin/places/<int:item_id>",
+             lambda c: _req(f"/api/admin/places/{c.place()}", ADMIN, json={"description": "Updated"})),
+    Scenario("admin_user_delete", "DELETE", "/api/admin/users/<int:item_id>",
+             lambda c: _req(f"/api/admin/users/{c.new_user()}", ADMIN)),
+    Scenario("admin_category_delete", "DELETE", "/api/admin/categories/<int:item_id>",
+             lambda c: _req(f"/api/admin/categories/{c.new_category()}", ADMIN)),
+    Scenario("admin_place_delete", "DELETE", "/api/admin/places/<int:item_id>",
+             lambda c: _req(f"/api/admin/places/{c.new_place()}", ADMIN)),
+    Scenario("admin_import_places", "POST", "/api/admin/import/<entity>", lambda c: _req(
+        "/api/admin/import/places?format=ndjson", ADMIN, data=_import_body(c),
+        content_type="application/x-ndjson")),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def uncovered_routes(app):
+    covered = {(s.method, s.rule) for s in SCENARIOS}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static":
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return missing
+
+
+def run_scenario(app, ctx, scenario, iterations, concurrency):
+    latencies, statuses = [], Counter()
+    remaining = [iterations]
+
+    def worker():
+        client = app.test_client()
+        current_user = None
+        while True:
+            with ctx.lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                spec = scenario.build(ctx)
+            user = spec.pop("user")
+            if user != current_user:
+                with client.session_transaction() as sess:
+                    sess.clear()
+                    if user is not None:
+                        sess["user_id"] = user
+                        sess["role"] = "admin" if user == ADMIN else "client"
+                current_user = user
+            url = spec.pop("url")
+            start = time.perf_counter()
+            response = client.open(url, method=scenario.method, **spec)
+            response.get_data()
+            elapsed = time.perf_counter() - start
+            response.close()
+            with ctx.lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+            if scenario.name in ("logout", "profile_me_delete", "delete_account"):
+                current_user = None  # the response cleared the session
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        "method": scenario.method,
+        "rule": scenario.rule,
+        "requests": len(latencies),
+        "errors": sum(n for code, n in statuses.items() if code >= 500),
+        "status": {str(code): n for code, n in sorted(statuses.items())},
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+    }
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def compare(previous, current, threshold):
+    """Print per-scenario latency changes; return the names that regressed."""
+    regressed = []
+    print(f"\nvs previous run ({previous['meta'].get('timestamp')}, {previous['meta'].get('git')}):")
+    for name, now in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before or not before.get("p95_ms") or now.get("p95_ms") is None:
+            continue
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        mark = ""
+        if change > threshold:
+            mark = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:>22}: p95 {before['p95_ms']:9.2f} -> {now['p95_ms']:9.2f} ms ({change:+6.1f}%){mark}")
+    before_rss = previous.get("peak_rss_mb")
+    if before_rss:
+        print(f"{'peak RSS':>22}: {before_rss} -> {current['peak_rss_mb']} MB")
+    return regressed
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="database made by benchmarks.datagen (copied, never modified)")
+    parser.add_argument("--iterations", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads per scenario")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="results file to compare against (default: previous --output)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    database = os.path.join(workdir, "bench.db")
+    shutil.copy(args.database, database)
+    os.environ["DATABASE"] = database
+    # Development cookie settings: the test client does not send Secure cookies.
+    os.environ.setdefault("FLASK_ENV", "development")
+    os.environ.setdefault("QUERY_PROFILER", "0")
+    sys.path.insert(0, BACKEND)
+    from run import app
+    from db import get_pool
+    app.config["TESTING"] = True
+
+    conn = sqlite3.connect(database, check_same_thread=False, timeout=30)
+    ctx = Context(conn, args.seed)
+    missing = uncovered_routes(app)
+    if missing:
+        print("Routes without a scenario: " + ", ".join(missing), file=sys.stderr)
+
+    results = {}
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        results[scenario.name] = r = run_scenario(app, ctx, scenario, args.iterations, args.concurrency)
+        print(
+            f"{scenario.name:>22}: p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+            f"  {r['throughput_rps']:8.1f} req/s  errors {r['errors']}  {r['status']}"
+        )
+
+    counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("users", "places", "reviews", "user_favorites", "forum_posts", "forum_comments")}
+    conn.close()
+    with app.app_context():
+        get_pool().close_all()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    current = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "database": os.path.abspath(args.database),
+            "rows_after_run": counts,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "scenarios": results,
+    }
+    print(f"{'peak RSS':>22}: {current['peak_rss_mb']} MB")
+
+    previous_path = args.baseline or args.output
+    regressed = []
+    if os.path.exists(previous_path):
+        with open(previous_path, encoding="utf8") as f:
+            regressed = compare(json.load(f), current, args.threshold)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf8") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
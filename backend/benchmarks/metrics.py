@@ -0,0 +1,128 @@
+"""Measure what the request metrics cost per request.
+
+    python -m benchmarks.datagen /tmp/bench.db --preset small
+    python -m benchmarks.metrics /tmp/bench.db --requests 200 --rounds 15
+
+One app is built with metrics on; between rounds its hooks (request hooks
+and the SQL hook) are detached and reattached, so rounds with and
+without metrics alternate and drift in machine load hits both alike. Each
+endpoint is requested with the response cache warm, where the hooks are the
+largest share of the work. The best per-request time over the rounds is
+reported per mode.
+
+The hooks cost a few microseconds, less than the run-to-run noise of a whole
+request, so they are also timed on their own inside each endpoint's request
+context (one SQL statement per request). That figure, as a share of the
+request time without metrics, is what --max-overhead (percent) is checked
+against. The database is copied, never modified.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = (
+    "/api/categories",
+    "/api/places?fields=id,name,latitude,longitude&format=columnar",
+    "/api/place/1",
+    "/api/community",
+    "/api/search?q=views",
+)
+
+
+def _attach(app, on):
+    import db
+    import metrics
+
+    hooks = (
+        (db.query_hooks, metrics._on_query),
+        (app.before_request_funcs.setdefault(None, []), metrics._before_request),
+        (app.after_request_funcs.setdefault(None, []), metrics._after_request),
+        (app.teardown_request_funcs.setdefault(None, []), metrics._teardown_request),
+    )
+    for funcs, fn in hooks:
+        if on and fn not in funcs:
+            funcs.append(fn)
+        elif not on and fn in funcs:
+            funcs.remove(fn)
+
+
+def _per_request_ms(client, url, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(url).get_data()
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def _hooks_us(app, url, requests):
+    import metrics
+    from flask import Response
+
+    response = Response(b"x" * 1024)
+    with app.test_request_context(url):
+        start = time.perf_counter()
+        for _ in range(requests):
+            metrics._before_request()
+            metrics._on_query("SELECT 1", (), 0.0)
+            metrics._after_request(response)
+            metrics._teardown_request(None)
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="database made by benchmarks.datagen (copied, never modified)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint per round")
+    parser.add_argument("--rounds", type=int, default=15, help="alternating rounds per mode; the best is kept")
+    parser.add_argument("--max-overhead", type=float, default=2.0, help="percent; exit 1 above it")
+    args = parser.parse_args()
+    sys.path.insert(0, BACKEND)
+
+    workdir = tempfile.mkdtemp(prefix="bench-metrics-")
+    database = os.path.join(workdir, "bench.db")
+    shutil.copy(args.database, database)
+    os.environ.update(
+        DATABASE=database, FLASK_ENV="development", QUERY_PROFILER="0", JOBS_WORKERS="0", METRICS_ENABLED="1"
+    )
+    import run
+
+    app = run.create_app()
+    app.config["TESTING"] = True
+    client = app.test_client()
+    best = {(url, on): float("inf") for url in ENDPOINTS for on in (False, True)}
+    hooks = {url: float("inf") for url in ENDPOINTS}
+    for url in ENDPOINTS:
+        client.get(url).get_data()  # warm the response cache
+        for n in range(args.rounds):
+            for on in ((False, True) if n % 2 else (True, False)):
+                _attach(app, on)
+                best[(url, on)] = min(best[(url, on)], _per_request_ms(client, url, args.requests))
+            hooks[url] = min(hooks[url], _hooks_us(app, url, args.requests))
+    _attach(app, True)
+
+    print(f"{'endpoint':<64} {'off ms':>8} {'on ms':>8} {'delta':>7} {'hooks us':>9} {'share':>6}")
+    for url in ENDPOINTS:
+        off, on = best[(url, False)], best[(url, True)]
+        share = hooks[url] / 10 / off
+        print(f"{url:<64} {off:>8.3f} {on:>8.3f} {(on / off - 1) * 100:>6.1f}% {hooks[url]:>9.2f} {share:>5.2f}%")
+    total_off = sum(best[(url, False)] for url in ENDPOINTS)
+    total_on = sum(best[(url, True)] for url in ENDPOINTS)
+    total_hooks = sum(hooks.values())
+    overhead = total_hooks / 10 / total_off
+    print(
+        f"{'total':<64} {total_off:>8.3f} {total_on:>8.3f} {(total_on / total_off - 1) * 100:>6.1f}%"
+        f" {total_hooks:>9.2f} {overhead:>5.2f}%"
+    )
+    with app.app_context():
+        run.get_pool().close_all()
+    shutil.rmtree(workdir, ignore_errors=True)
+    if overhead > args.max_overhead:
+        sys.exit(f"metrics overhead {overhead:.1f}% exceeds {args.max_overhead}%")
+
+
+if __name__ == "__main__":
+    main()
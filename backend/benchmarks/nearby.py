@@ -0,0 +1,79 @@
+"""Compare GeoGridIndex k-NN/radius queries against a full scan.
+
+    python -m benchmarks.nearby --places 100000 --queries 500
+"""
+import argparse
+import heapq
+import random
+import time
+
+from geo_index import GeoGridIndex, haversine_km
+
+# Rough bounding box of Great Britain.
+UK_BBOX = (-6.5, 49.9, 1.8, 58.7)
+
+
+def random_places(n, seed=42, categories=6):
+    rng = random.Random(seed)
+    min_lng, min_lat, max_lng, max_lat = UK_BBOX
+    return [
+        (i, rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng), rng.randint(1, categories))
+        for i in range(1, n + 1)
+    ]
+
+
+def full_scan_nearest(places, lat, lng, k, radius_km=None):
+    hits = ((haversine_km(lat, lng, plat, plng), pid) for pid, plat, plng, _ in places)
+    if radius_km is not None:
+        hits = (h for h in hits if h[0] <= radius_km)
+    return heapq.nsmallest(k, hits)
+
+
+def _timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, default=25.0)
+    parser.add_argument("--cell-deg", type=float, default=0.25)
+    args = parser.parse_args()
+
+    places = random_places(args.places)
+    rng = random.Random(7)
+    min_lng, min_lat, max_lng, max_lat = UK_BBOX
+    queries = [(rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = GeoGridIndex(args.cell_deg)
+    for pid, lat, lng, cat in places:
+        index.upsert(pid, lat, lng, cat)
+    build = time.perf_counter() - start
+    print(f"{args.places} places, {args.queries} queries, index build {build * 1000:.1f} ms")
+
+    cases = [
+        (f"k-NN k={args.k}",
+         lambda q: index.nearest(q[0], q[1], k=args.k),
+         lambda q: full_scan_nearest(places, q[0], q[1], args.k)),
+        (f"radius {args.radius_km:g} km",
+         lambda q: index.within(q[0], q[1], args.radius_km),
+         lambda q: full_scan_nearest(places, q[0], q[1], len(places), args.radius_km)),
+    ]
+    for name, indexed, scan in cases:
+        t_index, r_index = _timed(indexed, queries)
+        t_scan, r_scan = _timed(scan, queries)
+        same = all([p for _, p in a] == [p for _, p in b] for a, b in zip(r_index, r_scan))
+        print(
+            f"{name:>16}: index {t_index / len(queries) * 1000:8.3f} ms/query, "
+            f"full scan {t_scan / len(queries) * 1000:8.3f} ms/query, "
+            f"speedup {t_scan / t_index:6.1f}x, results match: {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
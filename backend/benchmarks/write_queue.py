@@ -0,0 +1,125 @@
+"""Compare per-request commits with the group-commit write queue.
+
+    python -m benchmarks.datagen /tmp/bench.db --preset small
+    python -m benchmarks.write_queue /tmp/bench.db --writers 200 --ops 20
+
+Each mode runs on its own copy of the database. Every writer thread signs in
+as a different user and cycles through adding a review, a forum comment and a
+favorite via the Flask test client.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values, pct):
+    return values[min(len(values), max(1, round(pct / 100 * len(values)))) - 1]
+
+
+def run_mode(source, queued, writers, ops, pool_size, synchronous):
+    workdir = tempfile.mkdtemp(prefix="bench-wq-")
+    database = os.path.join(workdir, "bench.db")
+    shutil.copy(source, database)
+    os.environ.update(
+        DATABASE=database,
+        FLASK_ENV="development",
+        QUERY_PROFILER="0",
+        WRITE_QUEUE="1" if queued else "0",
+        DB_POOL_SIZE=str(pool_size),
+        DB_POOL_TIMEOUT="60",
+        DB_BUSY_TIMEOUT_MS="60000",
+        DB_SYNCHRONOUS=synchronous,
+    )
+    import run
+    app = run.create_app()
+    app.config["TESTING"] = True
+
+    conn = sqlite3.connect(database)
+    user_ids = [r[0] for r in conn.execute("SELECT id FROM users ORDER BY id LIMIT ?", (writers,))]
+    place_ids = [r[0] for r in conn.execute("SELECT id FROM places ORDER BY id")]
+    post_ids = [r[0] for r in conn.execute("SELECT id FROM forum_posts LIMIT 100")]
+    conn.close()
+    if len(user_ids) < writers:
+        sys.exit(f"database has only {len(user_ids)} users; need one per writer")
+
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(writers + 1)
+
+    def writer(n, user_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"], sess["role"] = user_id, "client"
+        barrier.wait()
+        for i in range(ops):
+            # Offset by writer so users review places they have not reviewed yet.
+            place_id = place_ids[(n * ops + i) % len(place_ids)]
+            kind = i % 3
+            start = time.perf_counter()
+            if kind == 0:
+                r = client.post(f"/api/place/{place_id}/review", json={"text": "Bench", "rating": 1 + i % 5})
+            elif kind == 1:
+                r = client.post(f"/api/community/{post_ids[i % len(post_ids)]}/comments", json={"body": "Bench"})
+            else:
+                r = client.post("/api/user/favorites", json={"placeId": place_id})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[r.status_code] += 1
+
+    threads = [threading.Thread(target=writer, args=(n, uid)) for n, uid in enumerate(user_ids)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    stats = app.extensions.get("write_queue")
+    stats = stats.stats() if stats else None
+    with app.app_context():
+        run.get_pool().close_all()
+    shutil.rmtree(workdir, ignore_errors=True)
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / wall,
+        "p50": _percentile(latencies, 50) * 1000,
+        "p95": _percentile(latencies, 95) * 1000,
+        "p99": _percentile(latencies, 99) * 1000,
+        "status": dict(sorted(statuses.items())),
+        "queue": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="database made by benchmarks.datagen (copied, never modified)")
+    parser.add_argument("--writers", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=20, help="writes per writer")
+    parser.add_argument("--pool-size", type=int, default=64)
+    parser.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous, e.g. NORMAL or FULL")
+    args = parser.parse_args()
+    sys.path.insert(0, BACKEND)
+
+    print(f"{args.writers} writers x {args.ops} writes, pool {args.pool_size}, synchronous={args.synchronous}")
+    for name, queued in (("per-request commit", False), ("write queue", True)):
+        r = run_mode(args.database, queued, args.writers, args.ops, args.pool_size, args.synchronous)
+        print(
+            f"{name:>18}: {r['throughput']:8.1f} writes/s  p50 {r['p50']:8.2f}  p95 {r['p95']:8.2f}  "
+            f"p99 {r['p99']:8.2f} ms  {r['status']}"
+        )
+        if r["queue"]:
+            print(f"{'':>18}  {r['queue']}")
+
+
+if __name__ == "__main__":
+    main()
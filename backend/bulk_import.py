@@ -0,0 +1,236 @@
+import csv
+import hashlib
+import io
+import json
+import math
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from utils.hash import hash_password
+
+# Bulk import for places, categories and users.
+#
+# Rows are parsed and validated one at a time as the upload streams in, then
+# inserted with executemany in batches, one transaction per batch. Derived
+# data (rating stats, spatial/search indexes, version counters, the place
+# changelog) is maintained by triggers inside those same transactions, and the
+# in-process geo index catches up with a single refresh on its next query.
+
+BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+# A werkzeug generate_password_hash() result: "method$salt$hexdigest".
+_PASSWORD_HASH = re.compile(r"^(?:scrypt(?::\d+){0,3}|pbkdf2:(\w+)(?::\d+)?)\$[^$]+\$[0-9a-f]+$")
+# Bytes that were not valid UTF-8, as decoded with errors="surrogateescape".
+_UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+class RowError(ValueError):
+    """A row failed validation; the message is reported back to the client."""
+
+
+def _text(row: Dict[str, Any], key: str, required: bool = False) -> Optional[str]:
+    value = row.get(key)
+    value = "" if value is None else str(value).strip()
+    if not value:
+        if required:
+            raise RowError(f"Missing required field: {key}")
+        return None
+    return value
+
+
+def _number(row: Dict[str, Any], key: str, cast: Callable = float, lo=None, hi=None):
+    raw = _text(row, key)
+    if raw is None:
+        return None
+    try:
+        value = cast(raw)
+    except ValueError:
+        raise RowError(f"{key} must be a number")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise RowError(f"{key} must be a finite number")
+    if (lo is not None and value < lo) or (hi is not None and value > hi):
+        raise RowError(f"{key} must be between {lo} and {hi}")
+    return value
+
+
+class _Importer(ABC):
+    table: str
+    columns: Tuple[str, ...]
+
+    def prepare(self, db) -> None:
+        """Load whatever lookup data validation needs, once per import."""
+
+    @abstractmethod
+    def validate(self, row: Dict[str, Any]) -> Tuple:
+        """Return the row's values for `columns`, or raise RowError."""
+
+    @property
+    def insert_sql(self) -> str:
+        marks = ", ".join("?" * len(self.columns))
+        return f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({marks})"
+
+
+class _PlaceImporter(_Importer):
+    table = "places"
+    columns = ("name", "description", "location", "image", "latitude", "longitude", "category_id")
+
+    def prepare(self, db):
+        self.category_ids = {r[0] for r in db.execute("SELECT id FROM categories")}
+
+    def validate(self, row):
+        category_id = _number(row, "category_id", int)
+        if category_id is None:
+            raise RowError("Missing required field: category_id")
+        if category_id not in self.category_ids:
+            raise RowError(f"Category not found: {category_id}")
+        latitude = _number(row, "latitude", float, -90, 90)
+        longitude = _number(row, "longitude", float, -180, 180)
+        return (
+            _text(row, "name", required=True),
+            _text(row, "description"),
+            _text(row, "location"),
+            _text(row, "image"),
+            latitude,
+            longitude,
+            category_id,
+        )
+
+
+class _CategoryImporter(_Importer):
+    table = "categories"
+    columns = ("name", "description", "image")
+
+    def validate(self, row):
+        return (_text(row, "name", required=True), _text(row, "description"), _text(row, "image"))
+
+
+class _UserImporter(_Importer):
+    table = "users"
+    columns = ("username", "email", "password", "role")
+
+    def validate(self, row):
+        username = _text(row, "username", required=True)
+        email = _text(row, "email", required=True)
+        if "@" not in email:
+            raise RowError("email is not valid")
+        role = _text(row, "role") or "client"
+        if role not in ("client", "admin"):
+            raise RowError("role must be 'client' or 'admin'")
+        # Pre-hashed passwords skip the (deliberately slow) hash entirely, but
+        # must be a hash werkzeug can check, or the account could never log in.
+        password_hash = _text(row, "password_hash")
+        if password_hash is None:
+            password_hash = hash_password(_text(row, "password", required=True))
+        else:
+            match = _PASSWORD_HASH.match(password_hash)
+            if not match or (match.group(1) and match.group(1) not in hashlib.algorithms_available):
+                raise RowError("password_hash is not a werkzeug password hash")
+        return (username, email, password_hash, role)
+
+
+IMPORTERS = {
+    "places": _PlaceImporter,
+    "categories": _CategoryImporter,
+    "users": _UserImporter,
+}
+
+
+def _csv_records(text) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(text)
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # The reader starts afresh on the next line.
+            yield {"__error__": f"Malformed CSV: {e}"}
+            continue
+        yield record
+
+
+def _json_records(text) -> Iterator[Dict[str, Any]]:
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield {"__error__": "Line is not valid JSON"}
+            continue
+        yield record if isinstance(record, dict) else {"__error__": "Line is not a JSON object"}
+
+
+def _undecodable(record: Dict[str, Any]) -> bool:
+    return any(
+        isinstance(v, str) and _UNDECODABLE.search(v) for item in record.items() for v in item
+    )
+
+
+def iter_records(stream, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Yield one dict per CSV or NDJSON record from a binary stream.
+
+    Records that cannot be read (bad UTF-8, malformed CSV or JSON) come out as
+    {"__error__": message}, so one bad row cannot end an import half done.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    for record in (_csv_records if fmt == "csv" else _json_records)(text):
+        if "__error__" not in record and _undecodable(record):
+            record = {"__error__": "Row is not valid UTF-8"}
+        yield record
+
+
+def _flush(db, importer: _Importer, batch: List[Tuple[int, Tuple]], report: Dict[str, Any]):
+    """Insert one batch in its own transaction, isolating rows that violate constraints."""
+    if not batch:
+        return
+    try:
+        db.executemany(importer.insert_sql, [values for _, values in batch])
+        db.commit()
+        report["inserted"] += len(batch)
+        return
+    except sqlite3.IntegrityError:
+        db.rollback()
+    # Something in the batch clashed (e.g. a duplicate name): retry row by row
+    # so the good rows still land and the bad ones are reported.
+    for line_no, values in batch:
+        try:
+            db.execute(importer.insert_sql, values)
+            report["inserted"] += 1
+        except sqlite3.IntegrityError as e:
+            _record_error(report, line_no, str(e))
+    db.commit()
+
+
+def _record_error(report: Dict[str, Any], line_no: int, message: str):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": line_no, "error": message})
+    else:
+        report["errors_truncated"] = True
+
+
+def run_import(db, entity: str, records: Iterator[Dict[str, Any]], batch_size: int = BATCH_SIZE):
+    """Validate and insert records for `entity`; return a per-row error report."""
+    importer = IMPORTERS[entity]()
+    importer.prepare(db)
+    report = {"entity": entity, "inserted": 0, "failed": 0, "errors": []}
+    batch: List[Tuple[int, Tuple]] = []
+    for line_no, record in enumerate(records, start=1):
+        if "__error__" in record:
+            _record_error(report, line_no, record["__error__"])
+            continue
+        try:
+            batch.append((line_no, importer.validate(record)))
+        except RowError as e:
+            _record_error(report, line_no, str(e))
+            continue
+        if len(batch) >= batch_size:
+            _flush(db, importer, batch, report)
+            batch = []
+    _flush(db, importer, batch, report)
+    report["errors"].sort(key=lambda e: e["row"])
+    return report
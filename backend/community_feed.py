@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from flask import Response, current_app, jsonify, request
+from db import get_db, get_pool
+
+# Live community feed over Server-Sent Events.
+#
+# create_post, add_comment and delete_post publish an event by inserting it
+# into community_events inside their own transaction, then wake this worker's
+# poller. One poller thread per process reads new events (on wake-up, or every
+# COMMUNITY_STREAM_POLL_MS to catch writes made by other workers) and hands
+# each one, encoded once, to the matching in-process subscribers.
+#
+# GET /api/community/stream[?post=<id>] streams them. Each subscriber has a
+# bounded queue; one that falls COMMUNITY_STREAM_QUEUE events behind gets a
+# `reset` event and is disconnected, and reconnects from its Last-Event-ID.
+# Event ids are the community_events rowids, so a reconnecting EventSource is
+# replayed what it missed from the table (the newest COMMUNITY_EVENTS_KEEP
+# events are kept). A comment line goes out every
+# COMMUNITY_STREAM_HEARTBEAT_S seconds to keep proxies from closing idle
+# streams and to notice clients that have gone.
+#
+# Streams hold no database connection while idle. Under the default sync
+# workers each open stream still occupies a worker thread; to hold thousands
+# of idle subscribers per worker run gunicorn with gevent workers
+# (`gunicorn -k gevent --worker-connections 10000 wsgi:app`), where each
+# stream is a greenlet waiting on its queue.
+
+EVENT_TYPES = ("post_created", "post_deleted", "comment_created")
+
+log = logging.getLogger(__name__)
+
+
+def publish(conn, event_type, post_id, data):
+    """Record an event on conn, in the caller's transaction.
+
+    Safe to call from a write intent: it touches nothing but conn.
+    """
+    conn.execute(
+        "INSERT INTO community_events (type, post_id, data) VALUES (?, ?, ?)",
+        (event_type, post_id, json.dumps(dict(data), ensure_ascii=False, separators=(",", ":"), default=str)),
+    )
+
+
+def notify():
+    """Deliver just-committed events to this worker's subscribers now."""
+    current_app.extensions["community_feed"].wake()
+
+
+def _encode(row):
+    return f"id: {row['id']}\nevent: {row['type']}\ndata: {row['data']}\n\n".encode()
+
+
+class Subscriber:
+    def __init__(self, post_id, max_queue):
+        self.post_id = post_id
+        self.max_queue = max_queue
+        self.overflowed = False
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def offer(self, event_id, message):
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.overflowed = True
+            else:
+                self._queue.append((event_id, message))
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Return queued (id, message) pairs, [] on timeout, None once overflowed."""
+        with self._cond:
+            if not self._queue and not self.overflowed:
+                self._cond.wait(timeout)
+            if self.overflowed:
+                return None
+            events = list(self._queue)
+            self._queue.clear()
+            return events
+
+
+class CommunityFeed:
+    def __init__(self, pool, poll_interval=1.0, max_queue=256, keep=10000, max_subscribers=10000):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.max_queue = max_queue
+        self.keep = keep
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = {"delivered": 0, "overflowed": 0}
+
+    def _ensure_poller(self):
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._subscribers = set()
+            self._thread = threading.Thread(target=self._run, name="community-feed", daemon=True)
+            self._thread.start()
+
+    def subscribe(self, post_id=None):
+        """Register a subscriber, or return None when the worker is full."""
+        with self._lock:
+            self._ensure_poller()
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(post_id, self.max_queue)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.remove(subscriber)
+            if subscriber.overflowed:
+                self._stats["overflowed"] += 1
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        conn = self.pool.connect()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM community_events").fetchone()[0]
+        last_prune = time.monotonic()
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                rows = conn.execute(
+                    "SELECT id, type, post_id, data FROM community_events WHERE id > ? ORDER BY id",
+                    (last_id,),
+                ).fetchall()
+                if rows:
+                    last_id = rows[-1]["id"]
+                    self._dispatch(rows)
+                if time.monotonic() - last_prune > 60:
+                    last_prune = time.monotonic()
+                    conn.execute("DELETE FROM community_events WHERE id <= ?", (last_id - self.keep,))
+                    conn.commit()
+            except Exception:
+                log.exception("community feed poll failed")
+                time.sleep(self.poll_interval)
+
+    def _dispatch(self, rows):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for row in rows:
+            message = _encode(row)
+            for subscriber in subscribers:
+                if subscriber.post_id is None or subscriber.post_id == row["post_id"]:
+                    subscriber.offer(row["id"], message)
+                    self._stats["delivered"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "subscribers": len(self._subscribers)}
+
+
+def _backlog(db, after_id, post_id, keep):
+    """Messages after after_id, or None if some of them have been pruned."""
+    oldest = db.execute("SELECT MIN(id) FROM community_events").fetchone()[0]
+    if oldest is not None and after_id < oldest - 1:
+        return None
+    sql = "SELECT id, type, post_id, data FROM community_events WHERE id > ?"
+    params = [after_id]
+    if post_id is not None:
+        sql += " AND post_id = ?"
+        params.append(post_id)
+    rows = db.execute(sql + " ORDER BY id LIMIT ?", params + [keep]).fetchall()
+    return [(row["id"], _encode(row)) for row in rows]
+
+
+def _stream(feed, subscriber, backlog, sent, heartbeat):
+    try:
+        yield b"retry: 3000\n\n"
+        if backlog is None:
+            yield b"event: reset\ndata: {}\n\n"
+        else:
+            for event_id, message in backlog:
+                sent = event_id
+                yield message
+        while True:
+            events = subscriber.wait(heartbeat)
+            if events is None:
+                yield b"event: reset\ndata: {}\n\n"
+                return
+            if not events:
+                yield b": keepalive\n\n"
+                continue
+            for event_id, message in events:
+                # Anything up to the client's last id or the backlog's end was already sent.
+                if event_id > sent:
+                    yield message
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+def stream():
+    """GET /api/community/stream: SSE feed, optionally for one post (?post=)."""
+    config = current_app.config
+    feed = current_app.extensions["community_feed"]
+    post_id = request.args.get("post") or None
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if last_event_id is not None and not last_event_id.isdigit():
+        return jsonify({"error": "Last-Event-ID must be an event id"}), 400
+
+    # Subscribe before reading the backlog so nothing falls in between.
+    subscriber = feed.subscribe(post_id)
+    if subscriber is None:
+        return jsonify({"error": "Too many open streams, try again later"}), 503
+    backlog, sent = [], int(last_event_id or 0)
+    if last_event_id is not None:
+        try:
+            backlog = _backlog(get_db(), int(last_event_id), post_id, config["COMMUNITY_EVENTS_KEEP"])
+        except Exception:
+            feed.unsubscribe(subscriber)
+            raise
+
+    response = Response(
+        _stream(feed, subscriber, backlog, sent, config["COMMUNITY_STREAM_HEARTBEAT_S"]),
+        mimetype="text/event-stream",
+    )
+    # The generator's finally only runs once iteration has started; a response
+    # closed unread (a refused batch item, a dropped client) must still let go.
+    response.call_on_close(lambda: feed.unsubscribe(subscriber))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return response
+
+
+def init_app(app):
+    """Attach the feed; the poller starts with the first subscriber."""
+    app.extensions["community_feed"] = CommunityFeed(
+        get_pool(app),
+        poll_interval=app.config["COMMUNITY_STREAM_POLL_MS"] / 1000,
+        max_queue=app.config["COMMUNITY_STREAM_QUEUE"],
+        keep=app.config["COMMUNITY_EVENTS_KEEP"],
+        max_subscribers=app.config["COMMUNITY_STREAM_MAX_SUBSCRIBERS"],
+    )
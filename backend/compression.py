@@ -0,0 +1,153 @@
+import threading
+import zlib
+from collections import OrderedDict
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Negotiated response compression.
+#
+# Text and JSON responses are compressed with brotli (if installed) or gzip,
+# whichever the client's Accept-Encoding prefers, once they reach
+# COMPRESSION_MIN_BYTES. Streamed responses (the admin listings) are always
+# compressed, chunk by chunk, so they keep streaming.
+#
+# Responses with a strong ETag (everything served by the response cache) have
+# their compressed bodies kept in a small LRU keyed by ETag and encoding, so a
+# cached listing is compressed once, not on every hit. The ETag of a compressed
+# response is sent as weak, since the bytes differ from the identity encoding.
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+
+def _compressible(mimetype):
+    # Event streams must reach the client as each event is written.
+    if mimetype == "text/event-stream":
+        return False
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+
+def _offered():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate():
+    """Return the encoding to use for this request, or None for identity."""
+    return request.accept_encodings.best_match(_offered())
+
+
+def compress(data, encoding, config):
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESSION_BROTLI_QUALITY"])
+    compressor = zlib.compressobj(config["COMPRESSION_GZIP_LEVEL"], zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks, encoding, config):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config["COMPRESSION_BROTLI_QUALITY"])
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(config["COMPRESSION_GZIP_LEVEL"], zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    for chunk in chunks:
+        # Flush every chunk so the client can start parsing straight away.
+        out = process(chunk) + flush()
+        if out:
+            yield out
+    yield finish()
+
+
+class CompressedBodies:
+    """Thread-safe LRU of compressed bodies keyed by (etag, encoding), bounded by bytes."""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def count(self, raw, compressed):
+        with self._lock:
+            self._stats["bytes_in"] += raw
+            self._stats["bytes_out"] += compressed
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+def _compress_response(response):
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not _compressible(response.mimetype or "")
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate()
+    if encoding is None:
+        return response
+    config = current_app.config
+    if response.is_streamed:
+        original = response.response
+        response.response = _compress_stream(response.iter_encoded(), encoding, config)
+        if hasattr(original, "close"):
+            response.call_on_close(original.close)
+        response.headers.pop("Content-Length", None)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    data = response.get_data()
+    if len(data) < config["COMPRESSION_MIN_BYTES"]:
+        return response
+    bodies = current_app.extensions["compression"]
+    etag, weak = response.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+    body = bodies.get(key) if key else None
+    if body is None:
+        body = compress(data, encoding, config)
+        if key:
+            bodies.put(key, body)
+    bodies.count(len(data), len(body))
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Register the compression hook and its compressed-body cache."""
+    app.extensions["compression"] = CompressedBodies(app.config.get("COMPRESSION_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    app.after_request(_compress_response)
@@ -1,28 +1,211 @@
+import os
 import sqlite3
+import threading
+import time
 import click
 from flask import current_app, g
 
+
+# Callables invoked as hook(sql, parameters, seconds) after every statement
+# run through a pooled connection; see metrics.py and query_profiler.py.
+# executemany() reports parameters=None.
+query_hooks = []
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that reports each statement's run time to query_hooks."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in query_hooks:
+                hook(sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in query_hooks:
+                hook(sql, None, elapsed)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of persistent SQLite connections.
+
+    Connections are opened lazily, tuned once with the configured PRAGMAs and
+    handed back to the pool at the end of each request instead of being
+    closed. A thread gets back the connection it used last whenever that one
+    is idle, so a worker thread normally keeps a single warm connection.
+    """
+
+    def __init__(self, database, size=10, timeout=5.0, pragmas=None, detect_types=0):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.detect_types = detect_types
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._total = 0
+        self._stats = {"created": 0, "reused": 0, "waits": 0, "timeouts": 0, "discarded": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            detect_types=self.detect_types,
+            check_same_thread=False,
+            factory=TimedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def connect(self):
+        """Open a tuned connection that is not managed by the pool."""
+        return self._connect()
+
+    def acquire(self):
+        """Return an idle connection, opening a new one if the pool has room."""
+        with self._cond:
+            if self._pid != os.getpid():
+                # Forked since the pool was used: never share the parent's handles.
+                self._reset()
+            deadline = None
+            while True:
+                if self._idle:
+                    mine = getattr(self._local, "conn", None)
+                    if mine is not None and mine in self._idle:
+                        self._idle.remove(mine)
+                        conn = mine
+                    else:
+                        conn = self._idle.pop()
+                    self._stats["reused"] += 1
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        self._total -= 1
+                        raise
+                    self._stats["created"] += 1
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout("Timed out waiting for a database connection")
+                self._cond.wait(remaining)
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.discard(conn)
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a broken connection and free its slot."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._total -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._total -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self.size,
+                "open": self._total,
+                "idle": len(self._idle),
+                "in_use": self._total - len(self._idle),
+            }
+
+
+def _pool_from_config(app):
+    cfg = app.config
+    pragmas = {
+        "journal_mode": cfg.get("DB_JOURNAL_MODE", "WAL"),
+        "synchronous": cfg.get("DB_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(cfg.get("DB_BUSY_TIMEOUT_MS", 5000)),
+        "mmap_size": int(cfg.get("DB_MMAP_SIZE", 256 * 1024 * 1024)),
+        # Negative cache_size is in KiB rather than pages.
+        "cache_size": -int(cfg.get("DB_CACHE_SIZE_KB", 64 * 1024)),
+        "temp_store": "MEMORY",
+    }
+    return ConnectionPool(
+        cfg["DATABASE"],
+        size=int(cfg.get("DB_POOL_SIZE", 10)),
+        timeout=float(cfg.get("DB_POOL_TIMEOUT", 5.0)),
+        pragmas=pragmas,
+    )
+
+
+def get_pool(app=None):
+    """Return the app's connection pool, creating it on first use."""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get("db_pool")
+    if pool is None:
+        pool = app.extensions["db_pool"] = _pool_from_config(app)
+    return pool
+
+
 def get_db():
-    """Connect to the application's configured database."""
+    """Return this request's pooled connection to the configured database."""
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.db = get_pool().acquire()
     return g.db
 
 def close_db(e=None):
-    """If this request connected to the database, close the connection."""
+    """If this request used a connection, hand it back to the pool."""
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        get_pool().release(db)
 
 def init_db():
-    """Clear existing data and create new tables."""
-    db = get_db()
-    with current_app.open_resource('schema.sql') as f:
-        db.executescript(f.read().decode('utf8'))
+    """Create any missing tables and apply every pending migration."""
+    from migrations import migrate
+    return migrate(get_db())
 
 @click.command('init-db')
 def init_db_command():
@@ -34,4 +217,3 @@ def init_app(app):
     """Register database functions with the Flask app."""
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
-
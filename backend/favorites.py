@@ -0,0 +1,132 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, session
+from db import get_db
+from response_cache import table_versions
+from write_queue import run_write
+
+# Per-user favorite sets.
+#
+# Each worker keeps a bounded LRU of user id -> frozenset of favorited place
+# ids. Entries are tagged with the user_favorites table version, so a write
+# from any worker invalidates them. Listing endpoints are cached once for all
+# users and the current user's favorites are merged in afterwards.
+
+
+class FavoritesCache:
+    def __init__(self, max_users=10000):
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1], entry[2]
+
+    def put(self, user_id, version, ids):
+        digest = hashlib.sha1(",".join(map(str, sorted(ids))).encode()).hexdigest()[:16]
+        with self._lock:
+            self._entries[user_id] = (version, ids, digest)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return ids, digest
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def _cache():
+    return current_app.extensions["favorites_cache"]
+
+
+def user_favorites(user_id):
+    """Return (frozenset of place ids, digest) for a user, from cache when current."""
+    version = table_versions().get("user_favorites", 0)
+    hit = _cache().get(user_id, version)
+    if hit is not None:
+        return hit
+    rows = get_db().execute(
+        "SELECT place_id FROM user_favorites WHERE user_id = ?", (user_id,)
+    ).fetchall()
+    return _cache().put(user_id, version, frozenset(r["place_id"] for r in rows))
+
+
+def mark_favorites(data, ids):
+    """Set is_favorited on a place, a list of places or a {"places": ...} payload.
+
+    Only places that already carry is_favorited are marked, so responses
+    limited with ?fields= stay as requested. Columnar payloads are handled too.
+    """
+    if isinstance(data, dict) and "places" in data:
+        mark_favorites(data["places"], ids)
+        return data
+    if isinstance(data, dict) and data.get("format") == "columnar":
+        columns = data["columns"]
+        if "is_favorited" in columns and "id" in columns:
+            columns["is_favorited"] = [pid in ids for pid in columns["id"]]
+        return data
+    for place in data if isinstance(data, list) else [data]:
+        if isinstance(place, dict) and "is_favorited" in place and "id" in place:
+            place["is_favorited"] = place["id"] in ids
+    return data
+
+
+def personalize():
+    """Response-cache hook merging the session user's favorites into a payload.
+
+    Returns None when there is nothing to merge (anonymous user or no
+    favorites), so the shared cached body is served as is.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return None
+    ids, digest = user_favorites(user_id)
+    if not ids:
+        return None
+    return f"fav-{user_id}-{digest}", lambda data: mark_favorites(data, ids)
+
+
+def add_favorite(conn, user_id, place_id):
+    """Write intent: favorite a place; True if it was not already a favorite."""
+    return conn.execute(
+        "INSERT OR IGNORE INTO user_favorites (user_id, place_id) VALUES (?, ?)", (user_id, place_id)
+    ).rowcount > 0
+
+
+def remove_favorite(conn, user_id, place_id):
+    """Write intent: unfavorite a place."""
+    conn.execute("DELETE FROM user_favorites WHERE user_id = ? AND place_id = ?", (user_id, place_id))
+
+
+def _sync(conn, user_id, add, remove):
+    conn.executemany(
+        "INSERT OR IGNORE INTO user_favorites (user_id, place_id) "
+        "SELECT ?, id FROM places WHERE id = ?",
+        [(user_id, pid) for pid in add],
+    )
+    conn.executemany(
+        "DELETE FROM user_favorites WHERE user_id = ? AND place_id = ?",
+        [(user_id, pid) for pid in remove],
+    )
+    rows = conn.execute(
+        "SELECT place_id FROM user_favorites WHERE user_id = ? ORDER BY place_id", (user_id,)
+    ).fetchall()
+    return [r["place_id"] for r in rows]
+
+
+def sync_favorites(user_id, add, remove):
+    """Apply added and removed place ids in one transaction; return the new set."""
+    place_ids = run_write(_sync, user_id, add, remove)
+    _cache().forget(user_id)
+    return place_ids
+
+
+def init_app(app):
+    app.extensions["favorites_cache"] = FavoritesCache(app.config.get("FAVORITES_CACHE_USERS", 10000))
@@ -0,0 +1,87 @@
+# Sparse fieldsets and columnar listings.
+#
+# Listing routes accept ?fields=id,name,latitude to select only those fields;
+# the projection is pushed into the SQL, so unrequested columns are never read
+# or turned into dicts. ?format=columnar returns
+#
+#     {"format": "columnar", "length": n, "columns": {"id": [...], "name": [...]}}
+#
+# instead of a list of objects: one list per field, built straight from the
+# cursor rows. Without ?fields= a route returns its usual fields.
+#
+# A Fieldset maps public field names to SQL expressions. Computed fields are
+# derived from one selected column, a whole column at a time; their source
+# column is selected even when it was not itself requested.
+
+
+class InvalidFieldset(ValueError):
+    pass
+
+
+FORMATS = ("json", "columnar")
+
+
+class Fieldset:
+    def __init__(self, columns, computed=None):
+        self.columns = columns  # {name: SQL expression}
+        self.computed = computed or {}  # {name: (source column, fn(list) -> list)}
+
+    def parse(self, args):
+        """Return (field names or None, columnar?) from the request args."""
+        fmt = args.get("format", "json")
+        if fmt not in FORMATS:
+            raise InvalidFieldset("format must be 'json' or 'columnar'")
+        raw = args.get("fields")
+        if raw is None:
+            return None, fmt == "columnar"
+        names = list(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+        unknown = [n for n in names if n not in self.columns and n not in self.computed]
+        if not names or unknown:
+            allowed = ", ".join(list(self.columns) + list(self.computed))
+            raise InvalidFieldset(f"Unknown field(s): {', '.join(unknown) or '(none)'}; choose from {allowed}")
+        return names, fmt == "columnar"
+
+    def _selected(self, names):
+        selected = [n for n in names if n in self.columns]
+        for name in names:
+            source = self.computed.get(name, (None,))[0]
+            if source is not None and source not in selected:
+                selected.append(source)
+        return selected
+
+    def select(self, names):
+        """SQL select list for names (and the sources of computed names)."""
+        return ", ".join(f"{self.columns[n]} AS {n}" for n in self._selected(names))
+
+    def shape(self, rows, names, columnar):
+        """Turn rows selected with select(names) into dicts or a columnar payload."""
+        data = _columns(self._selected(names), rows)
+        for name in names:
+            if name in self.computed:
+                source, fn = self.computed[name]
+                data[name] = fn(data[source] if source else [None] * len(rows))
+        if columnar:
+            return to_columnar({n: data[n] for n in names}, len(rows))
+        return [dict(zip(names, values)) for values in zip(*(data[n] for n in names))]
+
+
+def _columns(names, rows):
+    """{name: list of values} from rows whose columns are names, in order."""
+    if not rows:
+        return {n: [] for n in names}
+    return dict(zip(names, map(list, zip(*rows))))
+
+
+def to_columnar(columns, length):
+    return {"format": "columnar", "length": length, "columns": columns}
+
+
+def columnar_from_rows(names, rows):
+    """Columnar payload straight from cursor rows whose columns are names."""
+    return to_columnar(_columns(names, rows), len(rows))
+
+
+def columnar_from_dicts(rows):
+    """Columnar payload for a list of dicts sharing the first row's keys."""
+    names = list(rows[0]) if rows else []
+    return to_columnar({n: [r.get(n) for r in rows] for n in names}, len(rows))
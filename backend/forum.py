@@ -0,0 +1,178 @@
+import sqlite3
+from db import get_db
+
+# Forum indexes and maintained counters.
+#
+# forum_posts.comment_count and the forum_posts row in table_counts are kept
+# up to date by triggers, so listings can report totals without COUNT(*).
+#
+# The same triggers maintain forum_posts.last_activity_at (newest comment, or
+# the post itself) and hot_score, an indexed time-decayed ranking:
+#
+#     hot_score = log10(1 + comment_count) + (created_at - HOT_EPOCH) / HOT_GRAVITY
+#
+# Newer posts always gain on older ones, so a stored score never goes stale;
+# ten times the comments is worth HOT_GRAVITY seconds (12.5 hours) of age.
+
+HOT_EPOCH = 1704067200  # 2024-01-01 UTC; keeps scores small
+HOT_GRAVITY = 45000
+
+# What the API shows of a post. forum_posts.seq is an internal key (the
+# search index's rowid) and is left out.
+POST_COLUMNS = "id, category, title, body, username, created_at, comment_count, last_activity_at, hot_score"
+
+# sort= option -> keyset columns, newest or highest first.
+SORT_KEYS = {
+    "new": ("created_at", "id"),
+    "active": ("last_activity_at", "id"),
+    "hot": ("hot_score", "id"),
+}
+
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_forum_posts_created ON forum_posts (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_forum_comments_post_created "
+    "ON forum_comments (post_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_forum_posts_active ON forum_posts (last_activity_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_forum_posts_hot ON forum_posts (hot_score, id)",
+)
+
+# Set by ensure_schema when this SQLite build lacks log10() and friends.
+_HAS_MATH = True
+
+
+def _log10_1p(n):
+    """SQL for log10(1 + n); piecewise-linear if SQLite lacks math functions."""
+    if _HAS_MATH:
+        return f"log10(1 + ({n}))"
+    bands = ((0, 9), (9, 90), (99, 900), (999, 9000), (9999, 90000))
+    return "(" + " + ".join(f"MIN(MAX(({n}) - {lo}, 0), {w}) / {w}.0" for lo, w in bands) + ")"
+
+
+def hot_score_sql(comment_count, created_at):
+    return (
+        f"({_log10_1p(comment_count)} + "
+        f"(CAST(strftime('%s', {created_at}) AS REAL) - {HOT_EPOCH}) / {HOT_GRAVITY}.0)"
+    )
+
+
+def _triggers():
+    return (
+        """
+CREATE TRIGGER IF NOT EXISTS forum_posts_count_insert AFTER INSERT ON forum_posts
+BEGIN
+    UPDATE table_counts SET value = value + 1 WHERE name = 'forum_posts';
+END
+        """,
+        """
+CREATE TRIGGER IF NOT EXISTS forum_posts_count_delete AFTER DELETE ON forum_posts
+BEGIN
+    UPDATE table_counts SET value = MAX(value - 1, 0) WHERE name = 'forum_posts';
+END
+        """,
+        f"""
+CREATE TRIGGER IF NOT EXISTS forum_posts_activity_insert AFTER INSERT ON forum_posts
+BEGIN
+    UPDATE forum_posts
+    SET last_activity_at = NEW.created_at,
+        hot_score = {hot_score_sql("NEW.comment_count", "NEW.created_at")}
+    WHERE rowid = NEW.rowid;
+END
+        """,
+        f"""
+CREATE TRIGGER IF NOT EXISTS forum_comments_count_insert AFTER INSERT ON forum_comments
+BEGIN
+    UPDATE forum_posts
+    SET comment_count = comment_count + 1,
+        last_activity_at = MAX(COALESCE(last_activity_at, created_at), NEW.created_at),
+        hot_score = {hot_score_sql("comment_count + 1", "created_at")}
+    WHERE id = NEW.post_id;
+END
+        """,
+        f"""
+CREATE TRIGGER IF NOT EXISTS forum_comments_count_delete AFTER DELETE ON forum_comments
+BEGIN
+    UPDATE forum_posts
+    SET comment_count = MAX(comment_count - 1, 0),
+        last_activity_at = COALESCE(
+            (SELECT MAX(created_at) FROM forum_comments WHERE post_id = OLD.post_id), created_at
+        ),
+        hot_score = {hot_score_sql("MAX(comment_count - 1, 0)", "created_at")}
+    WHERE id = OLD.post_id;
+END
+        """,
+    )
+
+
+def rebuild_forum_counters(db):
+    """Recompute the post total and every post's comment_count, last_activity_at and hot_score."""
+    db.execute(
+        "INSERT OR REPLACE INTO table_counts (name, value) "
+        "SELECT 'forum_posts', COUNT(*) FROM forum_posts"
+    )
+    db.execute("UPDATE forum_posts SET comment_count = 0")
+    db.execute(
+        """
+        UPDATE forum_posts SET comment_count = agg.n
+        FROM (SELECT post_id, COUNT(*) AS n FROM forum_comments GROUP BY post_id) AS agg
+        WHERE agg.post_id = forum_posts.id
+        """
+    )
+    db.execute("UPDATE forum_posts SET last_activity_at = created_at")
+    db.execute(
+        """
+        UPDATE forum_posts SET last_activity_at = MAX(forum_posts.created_at, agg.latest)
+        FROM (SELECT post_id, MAX(created_at) AS latest FROM forum_comments GROUP BY post_id) AS agg
+        WHERE agg.post_id = forum_posts.id
+        """
+    )
+    db.execute(f"UPDATE forum_posts SET hot_score = {hot_score_sql('comment_count', 'created_at')}")
+
+
+def ensure_schema(db):
+    """Create the forum indexes, counters and triggers if the database predates them."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        cols = {r[1] for r in db.execute("PRAGMA table_info(forum_posts)").fetchall()}
+        has_comments = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'forum_comments'"
+        ).fetchone()
+        if not cols or not has_comments:
+            db.rollback()
+            return
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS table_counts ("
+            "name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+        )
+        backfill = db.execute(
+            "SELECT 1 FROM table_counts WHERE name = 'forum_posts'"
+        ).fetchone() is None
+        if "comment_count" not in cols:
+            db.execute("ALTER TABLE forum_posts ADD COLUMN comment_count INTEGER NOT NULL DEFAULT 0")
+            backfill = True
+        if "hot_score" not in cols:
+            db.execute("ALTER TABLE forum_posts ADD COLUMN last_activity_at TIMESTAMP")
+            db.execute("ALTER TABLE forum_posts ADD COLUMN hot_score REAL")
+            backfill = True
+        global _HAS_MATH
+        try:
+            db.execute("SELECT log10(1)")
+        except sqlite3.OperationalError:
+            _HAS_MATH = False
+        for statement in _INDEXES + _triggers():
+            db.execute(statement)
+        if backfill:
+            rebuild_forum_counters(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def total_posts(db):
+    row = db.execute("SELECT value FROM table_counts WHERE name = 'forum_posts'").fetchone()
+    return row["value"] if row else 0
+
+
+def init_app(app):
+    """Install the forum indexes and counters."""
+    ensure_schema(get_db())
@@ -0,0 +1,253 @@
+import heapq
+import math
+import threading
+from flask import current_app
+from db import get_db
+
+# In-process geo index for nearest-place queries.
+#
+# Places are bucketed into a lat/lng grid held in memory. Triggers on places
+# append to place_changes, and every query first replays the changes it has
+# not seen yet, so admin writes made by any worker are picked up incrementally
+# without rescanning the places table. The index is loaded at startup, so the
+# first nearby query does not pay for a full scan.
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# How many change rows to keep. An index that falls further behind rebuilds.
+CHANGELOG_RETENTION = 10000
+
+_TRIGGERS = (
+    """
+CREATE TRIGGER IF NOT EXISTS place_changes_insert AFTER INSERT ON places
+BEGIN
+    INSERT INTO place_changes (place_id) VALUES (NEW.id);
+END
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS place_changes_update
+AFTER UPDATE OF id, latitude, longitude, category_id ON places
+BEGIN
+    INSERT INTO place_changes (place_id) VALUES (OLD.id);
+    INSERT INTO place_changes (place_id) SELECT NEW.id WHERE NEW.id != OLD.id;
+END
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS place_changes_delete AFTER DELETE ON places
+BEGIN
+    INSERT INTO place_changes (place_id) VALUES (OLD.id);
+END
+    """,
+    f"""
+CREATE TRIGGER IF NOT EXISTS place_changes_prune AFTER INSERT ON place_changes
+BEGIN
+    DELETE FROM place_changes WHERE seq <= NEW.seq - {CHANGELOG_RETENTION};
+END
+    """,
+)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoGridIndex:
+    """Grid of lat/lng cells answering k-nearest and radius queries."""
+
+    def __init__(self, cell_deg=0.25):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.points = {}
+        self.bounds = None
+        self.last_seq = 0
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def __len__(self):
+        return len(self.points)
+
+    def clear(self):
+        self.cells = {}
+        self.points = {}
+        self.bounds = None
+
+    def upsert(self, place_id, lat, lng, category_id=None):
+        with self.lock:
+            self.remove(place_id)
+            if lat is None or lng is None:
+                return
+            point = (place_id, lat, lng, category_id)
+            self.points[place_id] = point
+            i, j = self._cell(lat, lng)
+            self.cells.setdefault((i, j), []).append(point)
+            # Bounds only grow; removals leave them conservative.
+            if self.bounds is None:
+                self.bounds = (i, i, j, j)
+            else:
+                min_i, max_i, min_j, max_j = self.bounds
+                self.bounds = (min(min_i, i), max(max_i, i), min(min_j, j), max(max_j, j))
+
+    def remove(self, place_id):
+        with self.lock:
+            point = self.points.pop(place_id, None)
+            if point is None:
+                return
+            key = self._cell(point[1], point[2])
+            bucket = [p for p in self.cells.get(key, []) if p[0] != place_id]
+            if bucket:
+                self.cells[key] = bucket
+            else:
+                self.cells.pop(key, None)
+
+    def _ring(self, center, r):
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield (ci - r, j)
+            yield (ci + r, j)
+        for i in range(ci - r + 1, ci + r):
+            yield (i, cj - r)
+            yield (i, cj + r)
+
+    def _max_ring(self, center):
+        if self.bounds is None:
+            return -1
+        ci, cj = center
+        min_i, max_i, min_j, max_j = self.bounds
+        return max(abs(min_i - ci), abs(max_i - ci), abs(min_j - cj), abs(max_j - cj))
+
+    def _ring_lower_bound_km(self, lat, r):
+        # Every unvisited cell lies at least r cells away along lat or lng.
+        # Longitude degrees are shortest at the highest latitude in reach.
+        span = r * self.cell_deg
+        lat_km = span * KM_PER_DEGREE
+        max_lat = min(abs(lat) + span, 90.0)
+        lng_km = haversine_km(max_lat, 0.0, max_lat, min(span, 180.0))
+        return min(lat_km, lng_km)
+
+    def nearest(self, lat, lng, k=10, radius_km=None, category_id=None):
+        """Return up to k (distance_km, place_id) pairs ordered by distance."""
+        with self.lock:
+            center = self._cell(lat, lng)
+            max_ring = self._max_ring(center)
+            heap = []  # max-heap via negated distances
+            r = 0
+            while r <= max_ring:
+                for key in self._ring(center, r):
+                    for pid, plat, plng, cat in self.cells.get(key, ()):
+                        if category_id is not None and cat != category_id:
+                            continue
+                        d = haversine_km(lat, lng, plat, plng)
+                        if radius_km is not None and d > radius_km:
+                            continue
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-d, pid))
+                        elif d < -heap[0][0]:
+                            heapq.heapreplace(heap, (-d, pid))
+                bound = self._ring_lower_bound_km(lat, r)
+                if radius_km is not None and bound > radius_km:
+                    break
+                if len(heap) == k and bound >= -heap[0][0]:
+                    break
+                r += 1
+            return sorted((-d, pid) for d, pid in heap)
+
+    def within(self, lat, lng, radius_km, category_id=None):
+        """Return every (distance_km, place_id) within radius_km, nearest first."""
+        return self.nearest(lat, lng, k=len(self.points) or 1, radius_km=radius_km,
+                            category_id=category_id)
+
+    def load(self, db):
+        """Rebuild the whole index from the places table."""
+        with self.lock:
+            self.clear()
+            row = db.execute("SELECT MAX(seq) AS seq FROM place_changes").fetchone()
+            self.last_seq = row["seq"] or 0
+            for p in db.execute(
+                "SELECT id, latitude, longitude, category_id FROM places "
+                "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+            ):
+                self.upsert(p["id"], p["latitude"], p["longitude"], p["category_id"])
+            self.loaded = True
+
+    def refresh(self, db):
+        """Apply place changes committed since the last load or refresh."""
+        with self.lock:
+            if not self.loaded:
+                self.load(db)
+                return
+            changes = db.execute(
+                "SELECT seq, place_id FROM place_changes WHERE seq > ? ORDER BY seq",
+                (self.last_seq,),
+            ).fetchall()
+            if not changes:
+                return
+            if changes[0]["seq"] > self.last_seq + 1:
+                # The changelog was pruned past what we have seen; start over.
+                self.load(db)
+                return
+            ids = list({c["place_id"] for c in changes})
+            found = set()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for p in db.execute(
+                    f"SELECT id, latitude, longitude, category_id FROM places WHERE id IN ({marks})",
+                    chunk,
+                ):
+                    found.add(p["id"])
+                    self.upsert(p["id"], p["latitude"], p["longitude"], p["category_id"])
+            for pid in ids:
+                if pid not in found:
+                    self.remove(pid)
+            self.last_seq = changes[-1]["seq"]
+
+
+def ensure_schema(db):
+    """Create the place changelog and its triggers if the database predates them."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        has_places = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'places'"
+        ).fetchone()
+        if not has_places:
+            db.rollback()
+            return
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS place_changes ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, place_id INTEGER NOT NULL)"
+        )
+        for trigger in _TRIGGERS:
+            db.execute(trigger)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def get_index():
+    """Return this app's geo index, caught up with the database."""
+    index = current_app.extensions["geo_index"]
+    index.refresh(get_db())
+    return index
+
+
+def init_app(app):
+    """Install the changelog schema and attach the index, loaded from the places table."""
+    db = get_db()
+    ensure_schema(db)
+    index = app.extensions["geo_index"] = GeoGridIndex(app.config.get("GEO_INDEX_CELL_DEG", 0.25))
+    # No places table yet (before `flask init-db`): the first query loads it.
+    if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'place_changes'").fetchone():
+        index.load(db)
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, session
+from db import get_db
+from response_cache import table_versions
+
+# Server-side identity for the session user.
+#
+# The users row behind session["user_id"] is cached per worker in a bounded
+# TTL/LRU map, so check-auth, admin guards and profile reads cost no users
+# lookup on a hit. Entries are tagged with the users table version (read once
+# per request, shared with the response cache), so a role change or deletion
+# on any worker invalidates them at once; forget_user() also drops the entry
+# within the current request.
+
+IDENTITY_COLUMNS = (
+    "id", "username", "email", "role", "full_name", "profile_picture", "location", "activities",
+)
+
+
+class IdentityCache:
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, user_id, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < now or entry[1] != version:
+                self._entries.pop(user_id, None)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return entry[2]
+
+    def put(self, user_id, version, identity):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, version, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+def _cache():
+    return current_app.extensions["identity_cache"]
+
+
+def load_user(user_id):
+    """Return the identity dict for user_id, from cache or the database; None if missing."""
+    version = table_versions().get("users", 0)
+    identity = _cache().get(user_id, version)
+    if identity is not None:
+        return identity
+    row = get_db().execute(
+        f"SELECT {', '.join(IDENTITY_COLUMNS)} FROM users WHERE id = ?", (user_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    identity = dict(row)
+    _cache().put(user_id, version, identity)
+    return identity
+
+
+def current_user():
+    """Return the session user's identity, or None when logged out or deleted."""
+    if "identity" not in g:
+        user_id = session.get("user_id")
+        g.identity = load_user(user_id) if user_id else None
+    return g.identity
+
+
+def forget_user(user_id):
+    """Drop a user's cached identity after their row changed."""
+    _cache().forget(user_id)
+    if g.get("identity") and g.identity["id"] == user_id:
+        g.pop("identity")
+
+
+def init_app(app):
+    app.extensions["identity_cache"] = IdentityCache(
+        app.config.get("IDENTITY_CACHE_SIZE", 10000),
+        app.config.get("IDENTITY_CACHE_TTL", 60.0),
+    )
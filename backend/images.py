@@ -0,0 +1,257 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import click
+from flask import abort, current_app, send_from_directory
+from db import get_db
+from response_cache import table_versions
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are served as stored
+    Image = ImageOps = None
+
+# Image derivatives.
+#
+# Every image referenced by places.image, categories.image or
+# users.profile_picture can be resized to IMAGE_WIDTHS and re-encoded as JPEG
+# (PNG when it has transparency) plus WebP. Each derivative is stored in
+# IMAGE_STORE under a name derived from its own bytes and served from
+# /api/images/<name> with an immutable, year-long Cache-Control, so a changed
+# image always gets new URLs.
+#
+# image_assets (created by a migration) maps each source string to its
+# derivatives. API responses keep the original field and add `<field>_set`
+# next to it: {src, srcset, webp_srcset, width, height}, or None for images
+# that have not been processed (yet, or at all: external URLs, missing files,
+# or no Pillow installed).
+#
+# Sources are processed by `flask build-images`. Uploading to POST
+# /api/admin/images, or saving a place, category or profile with a new image,
+# queues a process_image job (see jobs.process_image) rather than resizing and
+# encoding in the request. Local sources are paths under IMAGE_SOURCE_DIR (the
+# frontend's public/ directory) or uploads already in IMAGE_STORE.
+
+URL_PREFIX = "/api/images/"
+_NAME = re.compile(r"^[0-9a-f]{20}\.(?:jpg|png|webp)$")
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+IMAGE_COLUMNS = (("places", "image"), ("categories", "image"), ("users", "profile_picture"))
+
+
+class InvalidImage(ValueError):
+    """The bytes could not be decoded as an image."""
+
+
+def available():
+    return Image is not None
+
+
+def _store(name, data):
+    """Write data to IMAGE_STORE/name unless it is already there; return its URL."""
+    path = os.path.join(current_app.config["IMAGE_STORE"], name)
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return URL_PREFIX + name
+
+
+def _hashed_name(data, fmt):
+    return f"{hashlib.sha256(data).hexdigest()[:20]}.{_EXTENSIONS[fmt]}"
+
+
+def _encode(img, fmt):
+    out = io.BytesIO()
+    quality = current_app.config["IMAGE_QUALITY"]
+    if fmt == "JPEG":
+        img.convert("RGB").save(out, fmt, quality=quality, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        img.save(out, fmt, quality=quality, method=4)
+    else:
+        img.save(out, fmt, optimize=True)
+    return out.getvalue()
+
+
+def _open(data):
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception as e:
+        raise InvalidImage(str(e)) from None
+    return img
+
+
+def _widths(original):
+    widths = sorted(w for w in current_app.config["IMAGE_WIDTHS"] if w < original)
+    largest = min(original, max(current_app.config["IMAGE_WIDTHS"]))
+    return widths if largest in widths else widths + [largest]
+
+
+def derive(data):
+    """Resize and re-encode image bytes; return (width, height, [[width, format, url], ...])."""
+    img = ImageOps.exif_transpose(_open(data))
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    fallback = "PNG" if has_alpha else "JPEG"
+    variants = []
+    for width in _widths(img.width):
+        height = max(1, round(img.height * width / img.width))
+        resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+        for fmt in (fallback, "WEBP"):
+            encoded = _encode(resized, fmt)
+            variants.append([width, fmt.lower(), _store(_hashed_name(encoded, fmt), encoded)])
+    return img.width, img.height, variants
+
+
+def _local_path(source):
+    """Return the file behind a local source string, or None."""
+    if not source or "://" in source or source.startswith("//"):
+        return None
+    if source.startswith(URL_PREFIX):
+        root, relative = current_app.config["IMAGE_STORE"], source[len(URL_PREFIX):]
+    else:
+        root, relative = current_app.config["IMAGE_SOURCE_DIR"], source.lstrip("/")
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, relative))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def process(db, source, data=None, force=False):
+    """Build and record derivatives for source; return True if anything was (re)built.
+
+    data defaults to the contents of the local file behind source. Sources that
+    are already processed from identical bytes are skipped unless force is set.
+    The image_assets row is written on db; committing is left to the caller.
+    """
+    if data is None:
+        path = _local_path(source)
+        if path is None:
+            return False
+        with open(path, "rb") as f:
+            data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    row = db.execute("SELECT digest FROM image_assets WHERE source = ?", (source,)).fetchone()
+    if row and row["digest"] == digest and not force:
+        return False
+    width, height, variants = derive(data)
+    db.execute(
+        "INSERT OR REPLACE INTO image_assets (source, digest, width, height, variants) VALUES (?, ?, ?, ?, ?)",
+        (source, digest, width, height, json.dumps(variants)),
+    )
+    return True
+
+
+def processable(source):
+    """True when source is a local image this worker can build derivatives for."""
+    return available() and _local_path(source) is not None
+
+
+def save_upload(data):
+    """Store uploaded image bytes under their hash and return the source.
+
+    Only the original is written; queue jobs.process_image for the derivatives.
+    """
+    if not available():
+        raise RuntimeError("Pillow is not installed")
+    img = _open(data)
+    fmt = img.format if img.format in _EXTENSIONS else "PNG" if "A" in img.getbands() else "JPEG"
+    if fmt != img.format:
+        data = _encode(img, fmt)
+    return _store(_hashed_name(data, fmt), data)
+
+
+def _build_set(row):
+    variants = json.loads(row["variants"])
+    fallback = [v for v in variants if v[1] != "webp"]
+    webp = [v for v in variants if v[1] == "webp"]
+    default = current_app.config["IMAGE_DEFAULT_WIDTH"]
+    src = next((v for v in fallback if v[0] >= default), fallback[-1])
+    return {
+        "src": src[2],
+        "srcset": ", ".join(f"{url} {w}w" for w, _, url in fallback),
+        "webp_srcset": ", ".join(f"{url} {w}w" for w, _, url in webp),
+        "width": row["width"],
+        "height": row["height"],
+    }
+
+
+class ImageSets:
+    """Process-wide {source: image set}, reloaded when image_assets changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._sets = {}
+
+    def get(self):
+        version = table_versions().get("image_assets", 0)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    rows = get_db().execute("SELECT source, width, height, variants FROM image_assets")
+                    self._sets = {r["source"]: _build_set(r) for r in rows}
+                    self._version = version
+        return self._sets
+
+
+def with_image_sets(rows, field="image"):
+    """Add `<field>_set` to each dict in rows; returns rows."""
+    sets = current_app.extensions["image_sets"].get()
+    for row in rows:
+        row[f"{field}_set"] = sets.get(row.get(field))
+    return rows
+
+
+def image_set_column(sources):
+    """Image sets for a list of sources (a fieldsets computed column)."""
+    sets = current_app.extensions["image_sets"].get()
+    return [sets.get(s) for s in sources]
+
+
+def serve(name):
+    if not _NAME.match(name):
+        abort(404)
+    response = send_from_directory(current_app.config["IMAGE_STORE"], name, max_age=365 * 24 * 3600)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@click.command("build-images")
+@click.option("--force", is_flag=True, help="Rebuild derivatives even for unchanged sources.")
+def build_images_command(force):
+    """Build resized JPEG/PNG and WebP derivatives for every referenced image."""
+    if not available():
+        raise click.ClickException("Pillow is not installed (pip install Pillow).")
+    db = get_db()
+    sources = set()
+    for table, column in IMAGE_COLUMNS:
+        sources.update(r[0] for r in db.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} <> ''"))
+    built = skipped = failed = 0
+    for source in sorted(sources):
+        if _local_path(source) is None:
+            skipped += 1
+            continue
+        try:
+            built += process(db, source, force=force)
+            db.commit()
+        except InvalidImage as e:
+            failed += 1
+            click.echo(f"FAIL {source}: {e}")
+    click.echo(f"✅ {built} built, {len(sources) - built - skipped - failed} unchanged, "
+               f"{skipped} not local, {failed} failed.")
+
+
+def init_app(app):
+    """Load the image sets and register the derivative route and build command."""
+    os.makedirs(app.config["IMAGE_STORE"], exist_ok=True)
+    app.extensions["image_sets"] = ImageSets()
+    app.extensions["image_sets"].get()  # so the first request does not pay for it
+    app.add_url_rule("/api/images/<name>", "image", serve)
+    app.cli.add_command(build_images_command)
@@ -0,0 +1,389 @@
+import json
+import logging
+import os
+import threading
+import time
+import click
+from flask import current_app
+from db import get_pool
+from identity import forget_user
+import community_feed
+import forum
+import images
+import place_stats
+import search
+import spatial
+
+# Persistent background jobs.
+#
+# Work too heavy for a request (cascading deletes, rating recomputes, index
+# rebuilds, image resizing) is recorded as a row in the jobs table and picked up by worker
+# threads. Handlers enqueue in their own transaction, so a job exists exactly
+# when the change that needs it was committed:
+#
+#     db.execute("DELETE FROM places WHERE id = ?", (place_id,))
+#     job_id = jobs.enqueue(db, "delete_place", place_id=place_id)
+#     db.commit()
+#     jobs.notify()
+#
+# and answer with the job id, which admins poll at /api/admin/jobs/<id>.
+#
+# Jobs work in chunks of JOBS_CHUNK_SIZE rows, each its own short
+# transaction, so request writes are never locked out for long; handlers must
+# therefore be safe to rerun from the start. A job whose worker stops
+# heartbeating for JOBS_STALE_S (the process died) is queued again, up to
+# JOBS_MAX_ATTEMPTS times. Workers of every process claim from the same
+# table; with JOBS_WORKERS=0 jobs only run under `flask run-jobs`.
+
+STATUSES = ("queued", "running", "done", "failed")
+
+log = logging.getLogger(__name__)
+
+
+class UnknownJob(ValueError):
+    pass
+
+
+def enqueue(conn, kind, **params):
+    """Queue a job on conn, in the caller's transaction, and return its id."""
+    if kind not in HANDLERS:
+        raise UnknownJob(f"Unknown job kind: {kind}")
+    return conn.execute(
+        "INSERT INTO jobs (kind, params) VALUES (?, ?)", (kind, json.dumps(params))
+    ).lastrowid
+
+
+def notify():
+    """Start a local worker on just-committed jobs instead of at its next poll."""
+    current_app.extensions["jobs"].wake()
+
+
+def process_image(db, source):
+    """Queue building the derivatives of a local image source on db, in the caller's transaction.
+
+    Returns the job id, or None when there is nothing to build.
+    """
+    if not source or not images.processable(source):
+        return None
+    return enqueue(db, "process_image", source=source)
+
+
+def delete_user(db, user_id):
+    """Delete a user's account now and queue the cleanup of what it left behind.
+
+    Commits db. Returns the job id, or None if there is no such user.
+    """
+    row = db.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+    if row is None:
+        return None
+    db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    job_id = enqueue(db, "delete_user", user_id=user_id, username=row["username"])
+    db.commit()
+    notify()
+    forget_user(user_id)
+    return job_id
+
+
+def _row_dict(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def get_job(db, job_id):
+    row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_dict(row) if row else None
+
+
+def recent_jobs(db, status=None, limit=50):
+    sql, params = "SELECT * FROM jobs", []
+    if status:
+        sql += " WHERE status = ?"
+        params.append(status)
+    rows = db.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+    return [_row_dict(r) for r in rows]
+
+
+class Job:
+    """A claimed job, as seen by its handler."""
+
+    def __init__(self, conn, row, chunk_size, pause):
+        self.conn = conn
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.params = json.loads(row["params"])
+        self.chunk_size = chunk_size
+        self.pause = pause
+
+    def step(self, fn, *args):
+        """Run fn(conn, *args) in its own transaction; it returns the rows it handled."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = fn(self.conn, *args) or 0
+            self.conn.execute(
+                "UPDATE jobs SET progress = progress + ?, heartbeat_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (done, self.id),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if self.pause:
+            time.sleep(self.pause)  # let queued request writers in between chunks
+        return done
+
+    def delete(self, table, where, params=(), on_deleted=None):
+        """Delete matching rows of table chunk by chunk and return how many went.
+
+        on_deleted(conn, ids) runs inside each chunk's transaction.
+        """
+        sql = (
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE {where} LIMIT ?) RETURNING id"
+        )
+
+        def chunk(conn):
+            ids = [r[0] for r in conn.execute(sql, (*params, self.chunk_size)).fetchall()]
+            if ids and on_deleted:
+                on_deleted(conn, ids)
+            return len(ids)
+
+        total = 0
+        while True:
+            done = self.step(chunk)
+            total += done
+            if done < self.chunk_size:
+                return total
+
+    def each_id_range(self, table, fn):
+        """Call fn(conn, low, high) over table's ids, chunk_size rows at a time.
+
+        Returns the number of rows covered.
+        """
+        last = total = 0
+        while True:
+            row = self.conn.execute(
+                f"SELECT MIN(id), MAX(id), COUNT(*) FROM "
+                f"(SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)",
+                (last, self.chunk_size),
+            ).fetchone()
+            if not row[2]:
+                return total
+            low, high, count = row
+            total += self.step(lambda conn: fn(conn, low, high) or count)
+            last = row[1]
+
+
+# Handlers. Each takes the Job and returns a JSON-able result.
+
+
+def _publish_deleted_posts(conn, ids):
+    for post_id in ids:
+        community_feed.publish(conn, "post_deleted", post_id, {"id": post_id})
+
+
+def _delete_user(job):
+    """Remove what a deleted account left behind; the users row is already gone."""
+    user_id, username = job.params["user_id"], job.params.get("username")
+    deleted = {
+        "favorites": job.delete("user_favorites", "user_id = ?", (user_id,)),
+        "reviews": job.delete("reviews", "user_id = ?", (user_id,)),
+    }
+    if username:
+        # Forum rows only carry the username; leave them be if it was taken again.
+        unclaimed = "NOT EXISTS (SELECT 1 FROM users WHERE username = ?)"
+        deleted["comments"] = job.delete(
+            "forum_comments",
+            f"post_id IN (SELECT id FROM forum_posts WHERE username = ?) AND {unclaimed}",
+            (username, username),
+        ) + job.delete("forum_comments", f"username = ? AND {unclaimed}", (username, username))
+        deleted["posts"] = job.delete(
+            "forum_posts", f"username = ? AND {unclaimed}", (username, username), _publish_deleted_posts
+        )
+    return deleted
+
+
+def _delete_place(job):
+    """Remove the reviews and favorites of a deleted place."""
+    place_id = job.params["place_id"]
+    return {
+        "favorites": job.delete("user_favorites", "place_id = ?", (place_id,)),
+        "reviews": job.delete("reviews", "place_id = ?", (place_id,)),
+    }
+
+
+def _delete_category(job):
+    """Remove a deleted category's places, with their reviews and favorites."""
+    in_category = "place_id IN (SELECT id FROM places WHERE category_id = ?)"
+    category_id = job.params["category_id"]
+    return {
+        "favorites": job.delete("user_favorites", in_category, (category_id,)),
+        "reviews": job.delete("reviews", in_category, (category_id,)),
+        "places": job.delete("places", "category_id = ?", (category_id,)),
+    }
+
+
+def _recompute_ratings(job):
+    """Recompute every place's rating statistics from its reviews."""
+    return {"places": job.each_id_range("places", place_stats.rebuild_place_stats)}
+
+
+def _process_image(job):
+    """Resize and re-encode one image source; the request that saved it did not wait."""
+    return {"built": images.process(job.conn, job.params["source"])}
+
+
+# index name -> rebuild(conn). Each is rebuilt in one transaction: a
+# half-rebuilt index would answer queries wrongly.
+INDEXES = {
+    "search": search.rebuild_search_index,
+    "spatial": spatial.rebuild_spatial_index,
+    "forum_counters": forum.rebuild_forum_counters,
+}
+
+
+def _rebuild_indexes(job):
+    """Rebuild the named derived indexes (all of them by default)."""
+    names = job.params.get("indexes") or list(INDEXES)
+    unknown = [n for n in names if n not in INDEXES]
+    if unknown:
+        raise UnknownJob(f"Unknown index(es): {', '.join(unknown)}; choose from {', '.join(INDEXES)}")
+    for name in names:
+        job.step(lambda conn: INDEXES[name](conn) or 1)
+    return {"rebuilt": names}
+
+
+HANDLERS = {
+    "delete_user": _delete_user,
+    "delete_place": _delete_place,
+    "delete_category": _delete_category,
+    "recompute_ratings": _recompute_ratings,
+    "rebuild_indexes": _rebuild_indexes,
+    "process_image": _process_image,
+}
+
+# Kinds an admin may start directly; the deletes follow their routes.
+ADMIN_KINDS = ("recompute_ratings", "rebuild_indexes")
+
+
+class JobRunner:
+    def __init__(self, app, pool, workers=1, poll_interval=2.0, chunk_size=500, pause=0.01,
+                 stale_after=300, max_attempts=3):
+        self.app = app
+        self.pool = pool
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._stats = {"done": 0, "failed": 0}
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or not self.workers:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._threads = [
+                    threading.Thread(target=self._run, name=f"jobs-{n}", daemon=True)
+                    for n in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _requeue_stale(self, conn):
+        stale = f"-{int(self.stale_after)} seconds"
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', "
+            "finished_at = CURRENT_TIMESTAMP WHERE status = 'running' "
+            "AND heartbeat_at < datetime('now', ?) AND attempts >= ?",
+            (stale, self.max_attempts),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND heartbeat_at < datetime('now', ?)",
+            (stale,),
+        )
+
+    def claim(self, conn):
+        """Atomically take the oldest queued job, or return None."""
+        self._requeue_stale(conn)
+        return conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, progress = 0, "
+            "started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP "
+            "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1) "
+            "RETURNING *"
+        ).fetchone()
+
+    def run_one(self, conn):
+        """Claim and run one job; return False when the queue is empty."""
+        row = self.claim(conn)
+        if row is None:
+            return False
+        job = Job(conn, row, self.chunk_size, self.pause)
+        with self.app.app_context():
+            try:
+                result, status, error = HANDLERS[job.kind](job), "done", None
+            except Exception as e:
+                log.exception(f"job {job.id} ({job.kind}) failed")
+                result, status, error = None, "failed", str(e)
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, job.id),
+            )
+            self._stats[status] += 1
+            if job.kind == "delete_user":
+                community_feed.notify()
+        return True
+
+    def _run(self):
+        conn = self.pool.connect()
+        conn.isolation_level = None  # autocommit; Job.step manages transactions
+        while True:
+            try:
+                while self.run_one(conn):
+                    pass
+            except Exception:
+                log.exception("job worker failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def stats(self):
+        return {**self._stats, "workers": self.workers}
+
+
+@click.command("run-jobs")
+def run_jobs_command():
+    """Run queued background jobs in the foreground until none are left."""
+    runner = current_app.extensions["jobs"]
+    conn = runner.pool.connect()
+    conn.isolation_level = None
+    count = 0
+    while runner.run_one(conn):
+        count += 1
+    conn.close()
+    click.echo(f"✅ Ran {count} job(s).")
+
+
+def init_app(app):
+    """Attach the job runner; workers start with the first request of each process."""
+    runner = app.extensions["jobs"] = JobRunner(
+        app,
+        get_pool(app),
+        workers=app.config["JOBS_WORKERS"],
+        poll_interval=app.config["JOBS_POLL_S"],
+        chunk_size=app.config["JOBS_CHUNK_SIZE"],
+        pause=app.config["JOBS_CHUNK_PAUSE_MS"] / 1000,
+        stale_after=app.config["JOBS_STALE_S"],
+        max_attempts=app.config["JOBS_MAX_ATTEMPTS"],
+    )
+    app.before_request(runner.ensure_started)
+    app.cli.add_command(run_jobs_command)
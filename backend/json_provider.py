@@ -0,0 +1,55 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+# JSON provider backed by orjson when it is installed.
+#
+# Output matches Flask's default provider: keys sorted, compact separators
+# (indent 2 in debug), and the same fallback for dates, UUIDs, decimals and
+# dataclasses. orjson writes non-ASCII characters as UTF-8 rather than \u
+# escapes, which is equally valid JSON. Anything orjson refuses (integers wider
+# than 64 bits, or dumps() arguments it has no equivalent for, such as
+# ensure_ascii) goes through the stdlib encoder unchanged.
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def _dumpb(self, obj, indent=None, default=None):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default or self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or not kwargs.keys() <= {"indent", "default"}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._dumpb(obj, kwargs.get("indent"), kwargs.get("default")).decode()
+        except TypeError:  # includes orjson.JSONEncodeError
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers are unaffected.
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._dumpb(obj, indent)
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_app(app):
+    """Serialize JSON with orjson when available."""
+    app.json = FastJSONProvider(app)
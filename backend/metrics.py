@@ -0,0 +1,191 @@
+import bisect
+import contextvars
+import hmac
+import threading
+import time
+from flask import Response, current_app, jsonify, request
+import db
+from db import get_pool
+from identity import current_user
+
+# Request and SQL metrics in Prometheus text exposition format.
+#
+# Per-request work is a handful of lookups and additions: a timestamp in
+# before_request, a counter bump per SQL statement (via db.query_hooks) and
+# one locked update in after_request (see benchmarks/metrics.py for the
+# measured overhead). Metrics are per process; with several gunicorn workers
+# each scrape sees the worker that answered it.
+#
+# GET /api/metrics answers admins, and scrapers that send
+# "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set; it shows
+# route names, latencies and pool sizes. METRICS_ENABLED=0 turns the hooks
+# and the endpoint off.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.size = {}
+        self.queries = {}
+        self.requests = {}
+        self.sql_seconds = {}
+        self.sql_statements = {}
+
+    def record(self, endpoint, method, status, seconds, size, n_queries, sql_seconds):
+        key = (endpoint, method)
+        with self.lock:
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.size[key] = Histogram(SIZE_BUCKETS)
+                self.queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+            hist.observe(seconds)
+            if size is not None:
+                self.size[key].observe(size)
+            self.queries[key].observe(n_queries)
+            rkey = (endpoint, method, status)
+            self.requests[rkey] = self.requests.get(rkey, 0) + 1
+            self.sql_seconds[key] = self.sql_seconds.get(key, 0.0) + sql_seconds
+            self.sql_statements[key] = self.sql_statements.get(key, 0) + n_queries
+
+
+def _labels(**labels):
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(name, series):
+    for (endpoint, method), hist in sorted(series.items()):
+        cumulative = 0
+        for bound, n in zip(hist.buckets, hist.counts):
+            cumulative += n
+            yield f"{name}_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}"
+        yield f"{name}_bucket{_labels(endpoint=endpoint, method=method, le='+Inf')} {hist.count}"
+        yield f"{name}_sum{_labels(endpoint=endpoint, method=method)} {hist.sum}"
+        yield f"{name}_count{_labels(endpoint=endpoint, method=method)} {hist.count}"
+
+
+def render(registry, pool_stats=None):
+    """Render the registry in Prometheus text format (version 0.0.4)."""
+    with registry.lock:
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by endpoint.",
+            "# TYPE http_request_duration_seconds histogram",
+            *_histogram_lines("http_request_duration_seconds", registry.latency),
+            "# HELP http_response_size_bytes Response body size by endpoint.",
+            "# TYPE http_response_size_bytes histogram",
+            *_histogram_lines("http_response_size_bytes", registry.size),
+            "# HELP sql_queries_per_request SQL statements executed per request.",
+            "# TYPE sql_queries_per_request histogram",
+            *_histogram_lines("sql_queries_per_request", registry.queries),
+            "# HELP http_requests_total Requests by endpoint, method and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (endpoint, method, status), n in sorted(registry.requests.items()):
+            lines.append(f"http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {n}")
+        lines += [
+            "# HELP sql_statements_total SQL statements executed, by endpoint.",
+            "# TYPE sql_statements_total counter",
+        ]
+        for (endpoint, method), n in sorted(registry.sql_statements.items()):
+            lines.append(f"sql_statements_total{_labels(endpoint=endpoint, method=method)} {n}")
+        lines += [
+            "# HELP sql_statement_seconds_total Time spent executing SQL, by endpoint.",
+            "# TYPE sql_statement_seconds_total counter",
+        ]
+        for (endpoint, method), secs in sorted(registry.sql_seconds.items()):
+            lines.append(f"sql_statement_seconds_total{_labels(endpoint=endpoint, method=method)} {secs}")
+    if pool_stats:
+        for name in ("open", "idle", "in_use"):
+            lines += [f"# TYPE db_pool_{name} gauge", f"db_pool_{name} {pool_stats[name]}"]
+        for name in ("created", "waits", "timeouts"):
+            lines += [f"# TYPE db_pool_{name}_total counter", f"db_pool_{name}_total {pool_stats[name]}"]
+    return "\n".join(lines) + "\n"
+
+
+# [start, statements, sql seconds] for the request being handled. A context
+# variable rather than g: the SQL hook runs for every statement, and reading
+# it costs no proxy lookups.
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _on_query(sql, parameters, seconds):
+    state = _current.get()
+    if state is not None:
+        state[1] += 1
+        state[2] += seconds
+
+
+def _before_request():
+    _current.set([time.perf_counter(), 0, 0.0])
+
+
+def _after_request(response):
+    state = _current.get()
+    if state is None:
+        return response
+    start, n_queries, sql_seconds = state
+    # Resolve each proxy once; every lookup through one costs about a microsecond.
+    req = request._get_current_object()
+    registry = current_app.extensions["metrics"]
+    endpoint = req.url_rule.rule if req.url_rule is not None else "<unmatched>"
+    size = response.content_length  # None for streamed bodies
+    registry.record(endpoint, req.method, response.status_code, time.perf_counter() - start, size, n_queries, sql_seconds)
+    return response
+
+
+def _teardown_request(exc):
+    # Worker threads keep their context between requests; don't carry state over.
+    _current.set(None)
+
+
+def _may_scrape():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        return True
+    user = current_user()
+    return user is not None and user["role"] == "admin"
+
+
+def init_app(app):
+    """Register the metrics hooks and the /api/metrics endpoint."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    app.extensions["metrics"] = Registry()
+    if _on_query not in db.query_hooks:
+        db.query_hooks.append(_on_query)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.get("/api/metrics")
+    def metrics():
+        if not _may_scrape():
+            return jsonify({"error": "Forbidden"}), 403
+        body = render(app.extensions["metrics"], get_pool().stats())
+        return Response(body, mimetype="text/plain; version=0.0.4; charset=utf-8")
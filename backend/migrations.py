@@ -0,0 +1,284 @@
+import logging
+import sqlite3
+import sys
+import click
+from flask import current_app
+from db import get_db
+from query_profiler import full_scans
+
+# Versioned schema migrations.
+#
+# Each migration runs once, in order, inside its own transaction, and is
+# recorded in schema_migrations. Pending migrations are applied at startup and
+# by `flask migrate`; `flask init-db` creates a fresh database the same way.
+# Triggers and derived tables owned by feature modules (place_stats, search,
+# spatial, forum, ...) are still installed by their own ensure_schema().
+#
+# `flask check-query-plans` runs EXPLAIN QUERY PLAN over HOT_QUERIES and fails
+# if any of them would scan a whole table.
+
+log = logging.getLogger(__name__)
+
+
+def _statements(script):
+    """Split an SQL script into complete statements."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        if line.lstrip().startswith("--") and not statement:
+            continue
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+
+def _base_schema(db):
+    with current_app.open_resource("schema_data.sql") as f:
+        for statement in _statements(f.read().decode("utf8")):
+            db.execute(statement)
+
+
+def _lookup_indexes(db):
+    db.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews (user_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_places_category ON places (category_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_user_favorites_place ON user_favorites (place_id)")
+
+
+def _unique_reviews(db):
+    # Databases built from older schema files lack UNIQUE(place_id, user_id),
+    # which add_review relies on. Keep each user's latest review of a place
+    # (newest created_at, then highest id) and log how many were removed.
+    for index in db.execute("PRAGMA index_list(reviews)").fetchall():
+        if index["unique"]:
+            cols = [r["name"] for r in db.execute(f"PRAGMA index_info({index['name']})")]
+            if cols == ["place_id", "user_id"]:
+                return
+    removed = db.execute(
+        "DELETE FROM reviews WHERE EXISTS (SELECT 1 FROM reviews newer "
+        "WHERE newer.place_id = reviews.place_id AND newer.user_id = reviews.user_id "
+        "AND (COALESCE(newer.created_at, ''), newer.id) > (COALESCE(reviews.created_at, ''), reviews.id))"
+    ).rowcount
+    if removed:
+        log.warning("Removed %d duplicate review(s), keeping each user's latest review of a place", removed)
+    db.execute("CREATE UNIQUE INDEX idx_reviews_place_user ON reviews (place_id, user_id)")
+
+
+def _drop_unused_posts(db):
+    # A leftover table nothing reads or writes; only dropped while empty.
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts'").fetchone()
+    if exists and db.execute("SELECT 1 FROM posts LIMIT 1").fetchone() is None:
+        db.execute("DROP TABLE posts")
+
+
+def _image_assets(db):
+    # Derivatives built by images.py, keyed by the source string stored in
+    # places.image, categories.image or users.profile_picture.
+    db.execute(
+        "CREATE TABLE image_assets ("
+        "source TEXT PRIMARY KEY, digest TEXT NOT NULL, width INTEGER NOT NULL, "
+        "height INTEGER NOT NULL, variants TEXT NOT NULL, "
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+
+
+def _community_events(db):
+    # Log of forum events streamed by community_feed.py; ids are SSE event ids.
+    db.execute(
+        "CREATE TABLE community_events ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL, post_id TEXT, "
+        "data TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    db.execute("CREATE INDEX idx_community_events_post ON community_events(post_id, id)")
+
+
+def _jobs(db):
+    # Background jobs run by jobs.py. The forum tables are only linked to users
+    # by username, which account deletion looks them up by.
+    db.execute(
+        "CREATE TABLE jobs ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, params TEXT NOT NULL, "
+        "status TEXT NOT NULL DEFAULT 'queued', progress INTEGER NOT NULL DEFAULT 0, "
+        "attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, started_at TIMESTAMP, "
+        "heartbeat_at TIMESTAMP, finished_at TIMESTAMP)"
+    )
+    db.execute("CREATE INDEX idx_jobs_status ON jobs(status, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_forum_posts_username ON forum_posts(username)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_forum_comments_username ON forum_comments(username)")
+
+
+def _forum_post_keys(db):
+    # forum_posts was keyed on TEXT id alone, so its rowid (which the search
+    # index points at) could be renumbered by VACUUM. Rebuild it around a
+    # stable seq INTEGER PRIMARY KEY, keeping today's rowids, and drop the
+    # search index so search.py rebuilds it on seq. The triggers and most
+    # indexes touching forum_posts are dropped; their modules' ensure_schema()
+    # puts them back.
+    cols = [r["name"] for r in db.execute("PRAGMA table_info(forum_posts)").fetchall()]
+    if not cols or "seq" in cols:
+        return
+    extra = {
+        "comment_count": "comment_count INTEGER NOT NULL DEFAULT 0",
+        "last_activity_at": "last_activity_at TIMESTAMP",
+        "hot_score": "hot_score REAL",
+    }
+    db.execute(
+        "CREATE TABLE forum_posts_new ("
+        "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, category TEXT NOT NULL, "
+        "title TEXT NOT NULL, body TEXT NOT NULL, username TEXT NOT NULL, "
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        + "".join(f", {extra[c]}" for c in extra if c in cols)
+        + ")"
+    )
+    copied = ", ".join(c for c in cols if c != "seq")
+    db.execute(f"INSERT INTO forum_posts_new (seq, {copied}) SELECT rowid, {copied} FROM forum_posts")
+    db.execute("DROP TABLE IF EXISTS forum_posts_fts")
+    # Triggers on other tables (forum_comments) that update forum_posts would
+    # block the rename below.
+    for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%forum_posts%'"
+    ).fetchall():
+        db.execute(f"DROP TRIGGER {row['name']}")
+    db.execute("DROP TABLE forum_posts")
+    db.execute("ALTER TABLE forum_posts_new RENAME TO forum_posts")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_forum_posts_username ON forum_posts(username)")
+
+
+MIGRATIONS = (
+    (1, "base schema", _base_schema),
+    (2, "lookup indexes", _lookup_indexes),
+    (3, "unique review per user and place", _unique_reviews),
+    (4, "drop unused posts table", _drop_unused_posts),
+    (5, "image assets", _image_assets),
+    (6, "community events", _community_events),
+    (7, "background jobs", _jobs),
+    (8, "stable forum post keys", _forum_post_keys),
+)
+
+# Queries on the request path that must be served by an index, with sample
+# parameters. Unfiltered listings are deliberately absent.
+HOT_QUERIES = {
+    "category places": ("SELECT * FROM places p WHERE p.category_id = ?", (1,)),
+    "place reviews, newest": (
+        "SELECT r.id FROM reviews r JOIN users u ON r.user_id = u.id WHERE r.place_id = ? "
+        "ORDER BY r.created_at DESC, r.id DESC LIMIT 20",
+        (1,),
+    ),
+    "place reviews, highest": (
+        "SELECT r.id FROM reviews r JOIN users u ON r.user_id = u.id WHERE r.place_id = ? "
+        "ORDER BY r.rating DESC, r.created_at DESC, r.id DESC LIMIT 20",
+        (1,),
+    ),
+    "duplicate review check": ("SELECT 1 FROM reviews WHERE place_id = ? AND user_id = ?", (1, 1)),
+    "user's reviews": ("SELECT id FROM reviews WHERE user_id = ?", (1,)),
+    "user's favorites": (
+        "SELECT p.id FROM user_favorites uf JOIN places p ON uf.place_id = p.id WHERE uf.user_id = ?",
+        (1,),
+    ),
+    "place's favorites": ("SELECT user_id FROM user_favorites WHERE place_id = ?", (1,)),
+    "login by email": ("SELECT * FROM users WHERE email = ?", ("a@example.com",)),
+    "post comments": (
+        "SELECT * FROM forum_comments WHERE post_id = ? ORDER BY created_at DESC, id DESC LIMIT 20",
+        ("x",),
+    ),
+    "posts page, new": (
+        "SELECT * FROM forum_posts WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 20",
+        ("2030-01-01", "x"),
+    ),
+    "posts page, hot": (
+        "SELECT * FROM forum_posts WHERE (hot_score, id) < (?, ?) ORDER BY hot_score DESC, id DESC LIMIT 20",
+        (1e9, "x"),
+    ),
+    "posts page, active": (
+        "SELECT * FROM forum_posts WHERE (last_activity_at, id) < (?, ?) "
+        "ORDER BY last_activity_at DESC, id DESC LIMIT 20",
+        ("2030-01-01", "x"),
+    ),
+    "next queued job": ("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1", ()),
+    "user's posts": ("SELECT id FROM forum_posts WHERE username = ?", ("x",)),
+    "user's comments": ("SELECT id FROM forum_comments WHERE username = ?", ("x",)),
+    "post events since": ("SELECT id FROM community_events WHERE post_id = ? AND id > ? ORDER BY id", ("x", 0)),
+}
+
+
+def current_version(db):
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    db.commit()
+    return db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+
+def migrate(db, target=None):
+    """Apply pending migrations up to target (default: all); return those applied."""
+    applied = []
+    version = current_version(db)
+    for number, name, apply in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have got here first.
+            if db.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (number,)).fetchone():
+                db.rollback()
+                continue
+            apply(db)
+            db.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (number, name))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied.append((number, name))
+    return applied
+
+
+def check_query_plans(db):
+    """Return {name: [full scan details]} for hot queries that would scan a table."""
+    problems = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        scans = full_scans(db, sql, params)
+        if scans:
+            problems[name] = scans
+    return problems
+
+
+@click.command("migrate")
+@click.option("--list", "list_only", is_flag=True, help="Show migrations and whether each is applied.")
+@click.option("--target", type=int, help="Stop after this migration version.")
+def migrate_command(list_only, target):
+    """Apply pending schema migrations."""
+    db = get_db()
+    if list_only:
+        done = {r["version"]: r["applied_at"] for r in db.execute(
+            "SELECT version, applied_at FROM schema_migrations"
+        )} if current_version(db) else {}
+        for number, name, _ in MIGRATIONS:
+            click.echo(f"{number:>4} {'applied ' + str(done[number]) if number in done else 'pending':<28} {name}")
+        return
+    applied = migrate(db, target)
+    for number, name in applied:
+        click.echo(f"Applied {number}: {name}")
+    click.echo(f"✅ Schema at version {current_version(db)}.")
+
+
+@click.command("check-query-plans")
+def check_query_plans_command():
+    """Fail if any hot query's plan scans a whole table."""
+    problems = check_query_plans(get_db())
+    for name in HOT_QUERIES:
+        click.echo(f"{'FAIL' if name in problems else 'ok  '} {name}")
+        for detail in problems.get(name, ()):
+            click.echo(f"       {detail}")
+    if problems:
+        sys.exit(1)
+
+
+def init_app(app):
+    """Apply pending migrations and register the migration commands."""
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(check_query_plans_command)
+    migrate(get_db())
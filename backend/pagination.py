@@ -0,0 +1,57 @@
+import base64
+import json
+
+# Keyset (cursor) pagination helpers.
+#
+# A cursor is the sort key of the last row on a page, JSON encoded and then
+# base64url encoded so clients treat it as opaque. The next page is fetched
+# with a row-value comparison against that key, which an index on the same
+# columns turns into a range scan: page N costs the same as page 1.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor parameter cannot be decoded."""
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor into a list of `size` values, or raise InvalidCursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Invalid cursor")
+    # Values are bound as SQL parameters, which must be scalars.
+    if not all(v is None or isinstance(v, (str, int, float)) for v in values):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def page_args(args, default_limit=DEFAULT_LIMIT):
+    """Read limit and cursor from request args; limit is clamped to 1..MAX_LIMIT."""
+    limit = args.get("limit", default_limit, type=int)
+    return min(max(limit, 1), MAX_LIMIT), args.get("cursor") or None
+
+
+def fetch_page(db, sql, params, key_columns, limit):
+    """Run a keyset query and split off the next-page cursor.
+
+    `sql` must end with ORDER BY over `key_columns` and accept a trailing LIMIT
+    parameter. One extra row is fetched to tell whether another page exists.
+    """
+    rows = db.execute(f"{sql} LIMIT ?", (*params, limit + 1)).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[c] for c in key_columns)
+    return [dict(r) for r in rows], next_cursor
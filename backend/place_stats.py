@@ -0,0 +1,204 @@
+import click
+from db import get_db
+
+# Per-place rating statistics.
+#
+# places.review_count, places.rating_sum and places.rating are kept up to date
+# by triggers on the reviews table, so every write path (add_review, the admin
+# delete_review route, account deletion, ...) updates them without extra code.
+# Listing endpoints read the aggregate straight off the places row.
+# The same triggers keep a 1-5 star histogram in places.stars_1 .. stars_5.
+
+AVERAGE_RATING_SQL = (
+    "CASE WHEN p.review_count > 0 "
+    "THEN ROUND(p.rating_sum * 1.0 / p.review_count, 2) ELSE 0 END"
+)
+
+PLACE_STATS_COLUMNS = f"{AVERAGE_RATING_SQL} AS average_rating, p.review_count AS num_reviews"
+
+STAR_COLUMNS = tuple(f"stars_{i}" for i in range(1, 6))
+
+
+def _star(rating):
+    """SQL for the 1-5 histogram bucket of a (possibly fractional) rating."""
+    return f"MIN(MAX(CAST(ROUND({rating}) AS INTEGER), 1), 5)"
+
+
+def _add_review(rating):
+    stars = "".join(
+        f",\n        stars_{i} = COALESCE(stars_{i}, 0) + ({_star(rating)} = {i})" for i in range(1, 6)
+    )
+    return f"""
+        review_count = COALESCE(review_count, 0) + 1,
+        rating_sum = COALESCE(rating_sum, 0) + {rating},
+        rating = ROUND((COALESCE(rating_sum, 0) + {rating}) * 1.0 / (COALESCE(review_count, 0) + 1), 2){stars}"""
+
+
+def _remove_review(rating):
+    stars = "".join(
+        f",\n        stars_{i} = MAX(COALESCE(stars_{i}, 0) - ({_star(rating)} = {i}), 0)" for i in range(1, 6)
+    )
+    return f"""
+        review_count = MAX(COALESCE(review_count, 0) - 1, 0),
+        rating_sum = CASE WHEN COALESCE(review_count, 0) > 1
+                          THEN COALESCE(rating_sum, 0) - {rating} ELSE 0 END,
+        rating = CASE WHEN COALESCE(review_count, 0) > 1
+                      THEN ROUND((COALESCE(rating_sum, 0) - {rating}) * 1.0 / (review_count - 1), 2)
+                      ELSE 0 END{stars}"""
+
+
+_TRIGGERS = {
+    "reviews_stats_insert": f"""
+CREATE TRIGGER reviews_stats_insert AFTER INSERT ON reviews
+BEGIN
+    UPDATE places SET{_add_review("NEW.rating")}
+    WHERE id = NEW.place_id;
+END
+    """,
+    "reviews_stats_delete": f"""
+CREATE TRIGGER reviews_stats_delete AFTER DELETE ON reviews
+BEGIN
+    UPDATE places SET{_remove_review("OLD.rating")}
+    WHERE id = OLD.place_id;
+END
+    """,
+    "reviews_stats_update": f"""
+CREATE TRIGGER reviews_stats_update AFTER UPDATE OF rating, place_id ON reviews
+BEGIN
+    UPDATE places SET{_remove_review("OLD.rating")}
+    WHERE id = OLD.place_id;
+    UPDATE places SET{_add_review("NEW.rating")}
+    WHERE id = NEW.place_id;
+END
+    """,
+}
+
+# Keyset indexes for a place's review pages (see REVIEW_SORTS).
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_reviews_place_created ON reviews (place_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_reviews_place_rating ON reviews (place_id, rating, created_at, id)",
+)
+
+# sort= option -> (rating order, or None to ignore rating). Ties are always
+# broken newest first.
+REVIEW_SORTS = {"newest": None, "highest": "DESC", "lowest": "ASC"}
+
+
+def rating_histogram(place):
+    """Return a place row's star histogram as {"1": n, ..., "5": n}."""
+    return {str(i): place[f"stars_{i}"] or 0 for i in range(1, 6)}
+
+
+def review_page_query(place_id, sort, after=None):
+    """Build a keyset query for one page of a place's reviews.
+
+    Returns (sql, params, key_columns) for pagination.fetch_page. `after` is
+    the decoded cursor: (created_at, id) for "newest", (rating, created_at, id)
+    for the rating sorts.
+    """
+    order = REVIEW_SORTS[sort]
+    sql = (
+        "SELECT r.id, r.rating, r.text, r.created_at, "
+        "COALESCE(u.full_name, u.username, 'Anonymous') AS author, u.full_name, u.id AS user_id "
+        "FROM reviews r JOIN users u ON r.user_id = u.id WHERE r.place_id = ?"
+    )
+    params = [place_id]
+    if order is None:
+        keys = ("created_at", "id")
+        if after:
+            sql += " AND (r.created_at, r.id) < (?, ?)"
+            params += after
+        sql += " ORDER BY r.created_at DESC, r.id DESC"
+    else:
+        keys = ("rating", "created_at", "id")
+        if after:
+            past = "<" if order == "DESC" else ">"
+            sql += f" AND (r.rating {past} ? OR (r.rating = ? AND (r.created_at, r.id) < (?, ?)))"
+            params += [after[0], after[0], after[1], after[2]]
+        sql += f" ORDER BY r.rating {order}, r.created_at DESC, r.id DESC"
+    return sql, params, keys
+
+
+def _columns(db, table):
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def rebuild_place_stats(db, low=None, high=None):
+    """Recompute review_count, rating_sum, rating and the star histogram from reviews.
+
+    With low and high, only places whose id is in that range are recomputed.
+    """
+    where, params = "", ()
+    if low is not None:
+        where, params = "WHERE {} BETWEEN ? AND ?", (low, high)
+    zero = ", ".join(f"{c} = 0" for c in STAR_COLUMNS)
+    db.execute(
+        f"UPDATE places SET review_count = 0, rating_sum = 0, rating = 0, {zero} {where.format('id')}", params
+    )
+    db.execute(
+        f"""
+        UPDATE places SET
+            review_count = agg.num_reviews,
+            rating_sum = agg.rating_sum,
+            rating = ROUND(agg.rating_sum * 1.0 / agg.num_reviews, 2),
+            {", ".join(f"stars_{i} = agg.stars_{i}" for i in range(1, 6))}
+        FROM (
+            SELECT place_id, COUNT(*) AS num_reviews, SUM(rating) AS rating_sum,
+                   {", ".join(f"SUM({_star('rating')} = {i}) AS stars_{i}" for i in range(1, 6))}
+            FROM reviews
+            {where.format('place_id')}
+            GROUP BY place_id
+        ) AS agg
+        WHERE agg.place_id = places.id
+        """,
+        params,
+    )
+
+
+def ensure_schema(db):
+    """Add the stats columns and triggers if the database predates them."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        cols = _columns(db, "places")
+        if not cols:
+            db.rollback()
+            return
+        backfill = False
+        if "review_count" not in cols:
+            db.execute("ALTER TABLE places ADD COLUMN review_count INTEGER DEFAULT 0")
+            backfill = True
+        if "rating_sum" not in cols:
+            db.execute("ALTER TABLE places ADD COLUMN rating_sum REAL DEFAULT 0")
+            backfill = True
+        for column in STAR_COLUMNS:
+            if column not in cols:
+                db.execute(f"ALTER TABLE places ADD COLUMN {column} INTEGER DEFAULT 0")
+                backfill = True
+        # Recreate the triggers every time so databases pick up changes to them.
+        for name, trigger in _TRIGGERS.items():
+            db.execute(f"DROP TRIGGER IF EXISTS {name}")
+            db.execute(trigger)
+        if _columns(db, "reviews"):
+            for index in _INDEXES:
+                db.execute(index)
+        if backfill:
+            rebuild_place_stats(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+@click.command('rebuild-place-stats')
+def rebuild_place_stats_command():
+    """Recompute per-place rating statistics from the reviews table."""
+    db = get_db()
+    rebuild_place_stats(db)
+    db.commit()
+    click.echo('✅ Place stats rebuilt.')
+
+
+def init_app(app):
+    """Install the stats schema and register the rebuild command."""
+    app.cli.add_command(rebuild_place_stats_command)
+    ensure_schema(get_db())
@@ -0,0 +1,231 @@
+import contextvars
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import click
+from flask import current_app, g, has_request_context, request
+import db
+
+# Development query profiler.
+#
+# When enabled (QUERY_PROFILER, on by default in debug mode) every statement a
+# request runs is collected. After the request the profiler:
+#   - adds X-Query-Count and X-Query-Time-Ms response headers,
+#   - logs a warning when the request exceeds QUERY_PROFILER_MAX_QUERIES or
+#     QUERY_PROFILER_MAX_TIME_MS, listing statement shapes run repeatedly
+#     (QUERY_PROFILER_REPEAT_THRESHOLD or more times, the usual N+1 sign),
+#   - runs EXPLAIN QUERY PLAN once per distinct filtered SELECT shape and logs
+#     any full table scan it finds (unfiltered listings scan by design).
+#
+# Statements issued while a streamed body is being sent come after the
+# headers and are not counted.
+#
+# For CI, `flask check-query-budgets` requests each URL in QUERY_BUDGETS (or a
+# JSON file) and exits non-zero when one runs more statements than allowed or
+# does not answer 2xx. {place} and {category} in a URL stand for an existing
+# id, looked up in the database, so the budget measures the real page.
+
+DEFAULT_QUERY_BUDGETS = {
+    "/api/places": 2,
+    "/api/places?bbox=-180,-90,180,90&zoom=3": 3,
+    "/api/categories": 2,
+    "/api/category/{category}": 3,
+    "/api/place/{place}": 3,
+    "/api/place/{place}?sort=highest": 3,
+    "/api/search?q=a": 2,
+    "/api/community": 2,
+    "/api/community?sort=hot": 2,
+}
+
+# URL placeholder -> query for an id that exists.
+SAMPLE_IDS = {
+    "place": "SELECT MIN(id) FROM places",
+    "category": "SELECT MIN(id) FROM categories",
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(sql):
+    """Normalize a statement so calls differing only in literals compare equal."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _SPACE.sub(" ", shape).strip()
+    return _IN_LIST.sub("(...)", shape)
+
+
+def full_scans(conn, sql, parameters):
+    """Return the EXPLAIN QUERY PLAN details that are full table scans."""
+    try:
+        # Bypass TimedConnection so the EXPLAIN is not itself profiled.
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return []
+    scans = []
+    for row in rows:
+        detail = row[3]
+        if detail.startswith("SCAN ") and "USING" not in detail and "VIRTUAL TABLE" not in detail \
+                and detail != "SCAN CONSTANT ROW":
+            scans.append(detail)
+    return scans
+
+
+class QueryProfiler:
+    def __init__(self, max_queries=20, max_time_ms=100.0, repeat_threshold=5, explain=True):
+        self.max_queries = max_queries
+        self.max_time_ms = max_time_ms
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+        self._explained = set()
+        self._lock = threading.Lock()
+
+    def report(self, app, queries):
+        """Inspect a finished request's queries; return (count, total milliseconds)."""
+        total_ms = sum(q[2] for q in queries) * 1000
+        shapes = Counter(statement_shape(q[0]) for q in queries)
+        label = f"{request.method} {request.full_path.rstrip('?')}"
+        repeated = [(n, s) for s, n in shapes.most_common() if n >= self.repeat_threshold]
+        if len(queries) > self.max_queries or total_ms > self.max_time_ms or repeated:
+            lines = [f"{label}: {len(queries)} queries in {total_ms:.1f} ms"]
+            lines += [f"  {n}x {s}" for n, s in repeated]
+            app.logger.warning("\n".join(lines))
+        if self.explain and "db" in g:
+            for sql, parameters, _ in queries:
+                if parameters is None or sql.lstrip()[:6].upper().rstrip() not in ("SELECT", "WITH"):
+                    continue
+                shape = statement_shape(sql)
+                if " WHERE " not in shape.upper() and " JOIN " not in shape.upper():
+                    continue
+                with self._lock:
+                    if shape in self._explained:
+                        continue
+                    self._explained.add(shape)
+                for detail in full_scans(g.db, sql, parameters):
+                    app.logger.warning(f"{label}: full table scan ({detail}) in: {shape}")
+        return len(queries), total_ms
+
+
+def _on_query(sql, parameters, seconds):
+    if has_request_context():
+        queries = g.get("profiled_queries")
+        if queries is not None:
+            queries.append((sql, parameters, seconds))
+
+
+def _before_request():
+    g.profiled_queries = []
+
+
+def _after_request(response):
+    queries = g.pop("profiled_queries", None)
+    if queries is None:
+        return response
+    count, total_ms = current_app.extensions["query_profiler"].report(current_app, queries)
+    response.headers["X-Query-Count"] = str(count)
+    response.headers["X-Query-Time-Ms"] = f"{total_ms:.2f}"
+    return response
+
+
+_captures = []
+
+
+def _capture_hook(sql, parameters, seconds):
+    ident = threading.get_ident()
+    for owner, queries in list(_captures):
+        if owner == ident:
+            queries.append((sql, parameters, seconds))
+
+
+@contextmanager
+def capture_queries():
+    """Collect (sql, parameters, seconds) for statements run on this thread.
+
+    Works whether or not the request profiler is enabled, e.g.:
+
+        with capture_queries() as queries:
+            client.get("/api/places")
+        assert len(queries) <= 3
+    """
+    entry = (threading.get_ident(), [])
+    if not _captures:
+        db.query_hooks.append(_capture_hook)
+    _captures.append(entry)
+    try:
+        yield entry[1]
+    finally:
+        _captures.remove(entry)
+        if not _captures:
+            db.query_hooks.remove(_capture_hook)
+
+
+def _sample_ids(app):
+    # Its own app context, so the connection goes back to the pool for the
+    # first measured request instead of that request paying to open one.
+    with app.app_context():
+        conn = db.get_db()
+        return {name: conn.execute(sql).fetchone()[0] for name, sql in SAMPLE_IDS.items()}
+
+
+@click.command("check-query-budgets")
+@click.argument("budgets_file", required=False, type=click.File())
+def check_query_budgets_command(budgets_file):
+    """Fail if any endpoint runs more SQL statements than its budget.
+
+    BUDGETS_FILE is a JSON object of URL -> maximum statements; by default the
+    QUERY_BUDGETS config (or the built-in set) is used. Each URL is requested
+    with a cold response cache.
+    """
+    app = current_app._get_current_object()
+    budgets = json.load(budgets_file) if budgets_file else app.config.get(
+        "QUERY_BUDGETS", DEFAULT_QUERY_BUDGETS
+    )
+    client = app.test_client()
+    ids = contextvars.Context().run(_sample_ids, app)
+    failed = 0
+    for template, budget in budgets.items():
+        url = template.format(**ids)
+        app.extensions["response_cache"].clear()
+        with capture_queries() as queries:
+            start = time.perf_counter()
+            # In an empty context the request pushes its own app context, so
+            # per-request lookups (table_versions, the identity) are counted
+            # every time instead of being reused from the command's g.
+            response = contextvars.Context().run(client.get, url)
+            response.get_data()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        ok = len(queries) <= budget and 200 <= response.status_code < 300
+        failed += not ok
+        click.echo(
+            f"{'ok  ' if ok else 'FAIL'} {url}: {len(queries)}/{budget} queries, "
+            f"status {response.status_code}, {elapsed_ms:.1f} ms"
+        )
+        if not ok:
+            for shape, n in Counter(statement_shape(q[0]) for q in queries).most_common():
+                click.echo(f"       {n}x {shape}")
+    if failed:
+        click.echo(f"{failed} endpoint(s) over budget or failing")
+        sys.exit(1)
+
+
+def init_app(app):
+    app.cli.add_command(check_query_budgets_command)
+    if not app.config.get("QUERY_PROFILER", app.debug):
+        return
+    app.extensions["query_profiler"] = QueryProfiler(
+        max_queries=int(app.config.get("QUERY_PROFILER_MAX_QUERIES", 20)),
+        max_time_ms=float(app.config.get("QUERY_PROFILER_MAX_TIME_MS", 100.0)),
+        repeat_threshold=int(app.config.get("QUERY_PROFILER_REPEAT_THRESHOLD", 5)),
+        explain=bool(app.config.get("QUERY_PROFILER_EXPLAIN", True)),
+    )
+    if _on_query not in db.query_hooks:
+        db.query_hooks.append(_on_query)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
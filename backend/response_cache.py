@@ -0,0 +1,186 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request, session
+from db import get_db
+
+# Versioned response cache for the catalog endpoints.
+#
+# Every write to a tracked table bumps its row in table_versions (via
+# triggers, so admin routes, reviews, favorites and any later write path are
+# all covered). A cached response remembers the versions of the tables it was
+# built from and is only served while they are unchanged. Responses carry a
+# strong ETag, so clients revalidating with If-None-Match get a 304.
+
+TRACKED_TABLES = ("categories", "places", "reviews", "user_favorites", "users", "image_assets")
+
+
+def _triggers(table):
+    bump = f"UPDATE table_versions SET version = version + 1 WHERE name = '{table}';"
+    return tuple(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} "
+        f"BEGIN {bump} END"
+        for event in ("INSERT", "UPDATE", "DELETE")
+    )
+
+
+def ensure_schema(db):
+    """Create table_versions and the triggers that bump it."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS table_versions ("
+            "name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+        )
+        for table in TRACKED_TABLES:
+            has_table = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            if not has_table:
+                continue
+            db.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+            for trigger in _triggers(table):
+                db.execute(trigger)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def table_versions():
+    """Return {table: version} as of this request, read at most once per request."""
+    if "table_versions" not in g:
+        rows = get_db().execute("SELECT name, version FROM table_versions").fetchall()
+        g.table_versions = {r["name"]: r["version"] for r in rows}
+    return g.table_versions
+
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["versions"] != versions:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key, versions, body, mimetype, etag):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old["body"])
+            self._entries[key] = {
+                "versions": versions,
+                "body": body,
+                "mimetype": mimetype,
+                "etag": etag,
+            }
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted["body"])
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+def get_cache():
+    return current_app.extensions["response_cache"]
+
+
+def _send(body, mimetype, etag, private):
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it; the ETag makes that a 304.
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add("Cookie")
+    return response.make_conditional(request)
+
+
+def _personalized(entry, token, transform):
+    etag = hashlib.sha1(f"{entry['etag']}:{token}".encode()).hexdigest()
+    # Weak comparison: compression.py sends this ETag as weak.
+    if request.if_none_match.contains_weak(etag):
+        return _send(b"", entry["mimetype"], etag, True)
+    data = transform(json.loads(entry["body"]))
+    body = current_app.json.dumps(data).encode("utf-8") + b"\n"
+    return _send(body, entry["mimetype"], etag, True)
+
+
+def cached(*tables, per_user=False, personalize=None):
+    """Cache a GET view's 200 responses until a write touches one of `tables`.
+
+    Entries are keyed by endpoint, view arguments and query string, plus the
+    session user when per_user is set.
+
+    `personalize`, if given, is called on every request and returns either
+    None (serve the shared body) or a (token, transform) pair: the cached JSON
+    is decoded, passed through transform and re-encoded, and token is folded
+    into the ETag so each variant revalidates on its own.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            versions = table_versions()
+            deps = tuple(versions.get(t, 0) for t in tables)
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                session.get("user_id") if per_user else None,
+            )
+            cache = get_cache()
+            entry = cache.get(key, deps)
+            if entry is None:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha1(body).hexdigest(),
+                }
+                cache.put(key, deps, body, response.mimetype, entry["etag"])
+            variant = personalize() if personalize is not None else None
+            if variant is not None:
+                return _personalized(entry, *variant)
+            private = per_user or personalize is not None
+            return _send(entry["body"], entry["mimetype"], entry["etag"], private)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Install the version counters and attach the response cache."""
+    ensure_schema(get_db())
+    app.extensions["response_cache"] = ResponseCache(
+        app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 512),
+        app.config.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+    )
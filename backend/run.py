@@ -5,23 +5,104 @@ from datetime import timedelta
 from flask import Flask, g, jsonify, request, current_app, session, Blueprint
 from flask_cors import CORS
 from auth import require_admin
+import identity
+from identity import current_user, forget_user, load_user
+from db import get_db, get_pool
+import place_stats
+from place_stats import AVERAGE_RATING_SQL, PLACE_STATS_COLUMNS
+import spatial
+import geo_index
+import search
+import response_cache
+from response_cache import cached
+import forum
+import community_feed
+import jobs
+import images
+from images import with_image_sets
+import favorites
+import batch
+import metrics
+import compression
+import json_provider
+import migrations
+import query_profiler
+import write_queue
+from write_queue import run_write
+from fieldsets import Fieldset, InvalidFieldset, columnar_from_dicts
+from pagination import InvalidCursor, decode_cursor, fetch_page, page_args
 import uuid
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.hash import check_password, hash_password
+import utils.hash
 
 community_bp = Blueprint("community", __name__, url_prefix="/api/community")
 
-def get_db():
-    if "db" not in g:
-        db_path = current_app.config["DATABASE"]
-        g.db = sqlite3.connect(db_path)
-        g.db.row_factory = sqlite3.Row
-    return g.db
-
 def _split_origins(val):
     if not val:
         return []
     return [o.strip() for o in val.split(",") if o.strip()]
 
+# Fields the place and category listings can be limited to with ?fields=.
+PLACE_FIELDS = Fieldset(
+    {
+        "id": "p.id",
+        "name": "p.name",
+        "description": "p.description",
+        "location": "p.location",
+        "image": "p.image",
+        "rating": "p.rating",
+        "latitude": "p.latitude",
+        "longitude": "p.longitude",
+        "category_id": "p.category_id",
+        "average_rating": AVERAGE_RATING_SQL,
+        "num_reviews": "p.review_count",
+    },
+    {
+        "is_favorited": ("id", lambda ids: [False] * len(ids)),
+        "image_set": ("image", images.image_set_column),
+    },
+)
+
+CATEGORY_FIELDS = Fieldset(
+    {"id": "id", "name": "name", "image": "image", "description": "description"},
+    {"image_set": ("image", images.image_set_column)},
+)
+
+def _place_columns(fields):
+    return PLACE_FIELDS.select(fields) if fields else f"p.*, {PLACE_STATS_COLUMNS}"
+
+def _place_listing(rows, fields, columnar):
+    """Places as the listing routes return them, honouring ?fields= and ?format=."""
+    if fields:
+        return PLACE_FIELDS.shape(rows, fields, columnar)
+    places = with_image_sets([{**dict(p), "is_favorited": False} for p in rows])
+    return columnar_from_dicts(places) if columnar else places
+
+# Write intents for run_write(): each takes the writer's connection and must
+# not commit.
+
+def _insert_review(conn, place_id, user_id, text, rating):
+    return conn.execute(
+        "INSERT INTO reviews (place_id, user_id, text, rating) VALUES (?, ?, ?, ?)",
+        (place_id, user_id, text, rating),
+    ).lastrowid
+
+def _insert_post(conn, post_id, category, title, body, username):
+    conn.execute(
+        "INSERT INTO forum_posts (id, category, title, body, username) VALUES (?, ?, ?, ?, ?)",
+        (post_id, category, title, body, username),
+    )
+    post = conn.execute(f"SELECT {forum.POST_COLUMNS} FROM forum_posts WHERE id = ?", (post_id,)).fetchone()
+    community_feed.publish(conn, "post_created", post_id, post)
+
+def _insert_comment(conn, post_id, username, body):
+    comment_id = conn.execute(
+        "INSERT INTO forum_comments (post_id, username, body) VALUES (?, ?, ?)",
+        (post_id, username, body),
+    ).lastrowid
+    comment = conn.execute("SELECT * FROM forum_comments WHERE id = ?", (comment_id,)).fetchone()
+    community_feed.publish(conn, "comment_created", post_id, comment)
+
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
 
@@ -47,6 +128,55 @@ def create_app():
         SESSION_COOKIE_SAMESITE="None" if is_production else "Lax",
         SESSION_COOKIE_SECURE=True if is_production else False,
         SESSION_COOKIE_HTTPONLY=True,
+        SPATIAL_CLUSTER_MAX_ZOOM=int(os.getenv("SPATIAL_CLUSTER_MAX_ZOOM", "10")),
+        SPATIAL_MAX_PLACES=int(os.getenv("SPATIAL_MAX_PLACES", "500")),
+        GEO_INDEX_CELL_DEG=float(os.getenv("GEO_INDEX_CELL_DEG", "0.25")),
+        DB_POOL_SIZE=int(os.getenv("DB_POOL_SIZE", "10")),
+        DB_POOL_TIMEOUT=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        DB_JOURNAL_MODE=os.getenv("DB_JOURNAL_MODE", "WAL"),
+        DB_SYNCHRONOUS=os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        DB_BUSY_TIMEOUT_MS=int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+        DB_MMAP_SIZE=int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+        DB_CACHE_SIZE_KB=int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024))),
+        RESPONSE_CACHE_MAX_ENTRIES=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512")),
+        RESPONSE_CACHE_MAX_BYTES=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        PASSWORD_HASH_METHOD=os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1"),
+        PASSWORD_HASH_WORKERS=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+        PASSWORD_HASH_QUEUE_SIZE=int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32")),
+        PASSWORD_HASH_TIMEOUT=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),
+        QUERY_PROFILER=os.getenv("QUERY_PROFILER", "0" if is_production else "1") == "1",
+        QUERY_PROFILER_MAX_QUERIES=int(os.getenv("QUERY_PROFILER_MAX_QUERIES", "20")),
+        QUERY_PROFILER_MAX_TIME_MS=float(os.getenv("QUERY_PROFILER_MAX_TIME_MS", "100")),
+        WRITE_QUEUE=os.getenv("WRITE_QUEUE", "0") == "1",
+        WRITE_QUEUE_MAX_BATCH=int(os.getenv("WRITE_QUEUE_MAX_BATCH", "256")),
+        WRITE_QUEUE_MAX_DELAY_MS=float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "2")),
+        IMAGE_STORE=os.path.abspath(os.getenv("IMAGE_STORE", os.path.join(app.instance_path, "images"))),
+        IMAGE_SOURCE_DIR=os.path.abspath(
+            os.getenv("IMAGE_SOURCE_DIR", os.path.join(app.root_path, "..", "frontend", "public"))
+        ),
+        IMAGE_WIDTHS=tuple(int(w) for w in os.getenv("IMAGE_WIDTHS", "200,400,800,1600").split(",")),
+        IMAGE_DEFAULT_WIDTH=int(os.getenv("IMAGE_DEFAULT_WIDTH", "800")),
+        IMAGE_QUALITY=int(os.getenv("IMAGE_QUALITY", "80")),
+        METRICS_ENABLED=os.getenv("METRICS_ENABLED", "1") == "1",
+        METRICS_TOKEN=os.getenv("METRICS_TOKEN", ""),
+        COMPRESSION_MIN_BYTES=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+        COMPRESSION_GZIP_LEVEL=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        COMPRESSION_BROTLI_QUALITY=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5")),
+        COMPRESSION_CACHE_MAX_BYTES=int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        BATCH_MAX_REQUESTS=int(os.getenv("BATCH_MAX_REQUESTS", "20")),
+        BATCH_WORKERS=int(os.getenv("BATCH_WORKERS", "4")),
+        IMAGE_MAX_UPLOAD_BYTES=int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024))),
+        COMMUNITY_STREAM_POLL_MS=float(os.getenv("COMMUNITY_STREAM_POLL_MS", "1000")),
+        COMMUNITY_STREAM_HEARTBEAT_S=float(os.getenv("COMMUNITY_STREAM_HEARTBEAT_S", "15")),
+        COMMUNITY_STREAM_QUEUE=int(os.getenv("COMMUNITY_STREAM_QUEUE", "256")),
+        COMMUNITY_STREAM_MAX_SUBSCRIBERS=int(os.getenv("COMMUNITY_STREAM_MAX_SUBSCRIBERS", "10000")),
+        COMMUNITY_EVENTS_KEEP=int(os.getenv("COMMUNITY_EVENTS_KEEP", "10000")),
+        JOBS_WORKERS=int(os.getenv("JOBS_WORKERS", "1")),
+        JOBS_POLL_S=float(os.getenv("JOBS_POLL_S", "2")),
+        JOBS_CHUNK_SIZE=int(os.getenv("JOBS_CHUNK_SIZE", "500")),
+        JOBS_CHUNK_PAUSE_MS=float(os.getenv("JOBS_CHUNK_PAUSE_MS", "10")),
+        JOBS_STALE_S=float(os.getenv("JOBS_STALE_S", "300")),
+        JOBS_MAX_ATTEMPTS=int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
     )
     if is_production:
         allowed_origins.append("https://adrenalink-uni-1.onrender.com")
@@ -59,19 +189,46 @@ def create_app():
         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     )
 
-    @app.teardown_appcontext
-    def close_db(e=None):
-        db = g.pop("db", None)
-        if db:
-            db.close()
-
     @app.get("/api/health")
     def health():
-        return {"status": "ok", "database": app.config["DATABASE"]}, 200
+        body = {
+            "status": "ok",
+            "database": app.config["DATABASE"],
+            "pool": get_pool().stats(),
+            "cache": response_cache.get_cache().stats(),
+            "identity": app.extensions["identity_cache"].stats(),
+            "compression": app.extensions["compression"].stats(),
+            "community_feed": app.extensions["community_feed"].stats(),
+            "jobs": app.extensions["jobs"].stats(),
+        }
+        if "write_queue" in app.extensions:
+            body["write_queue"] = app.extensions["write_queue"].stats()
+        return body, 200
 
     with app.app_context():
         from db import init_app
         init_app(app)
+        migrations.init_app(app)
+        metrics.init_app(app)
+        query_profiler.init_app(app)
+        # after_request hooks run last-registered first: compress before the
+        # metrics hook records response sizes, so it sees bytes on the wire.
+        compression.init_app(app)
+        json_provider.init_app(app)
+        identity.init_app(app)
+        utils.hash.init_app(app)
+        write_queue.init_app(app)
+        place_stats.init_app(app)
+        spatial.init_app(app)
+        geo_index.init_app(app)
+        search.init_app(app)
+        response_cache.init_app(app)
+        images.init_app(app)
+        forum.init_app(app)
+        community_feed.init_app(app)
+        jobs.init_app(app)
+        favorites.init_app(app)
+        batch.init_app(app)
         from auth import auth_bp
         from admin import admin_bp
         app.register_blueprint(auth_bp)
@@ -79,51 +236,87 @@ def create_app():
         app.register_blueprint(community_bp)
 
     @app.route("/api/categories", methods=["GET"])
+    @cached("categories", "image_assets")
     def get_all_categories():
+        try:
+            fields, columnar = CATEGORY_FIELDS.parse(request.args)
+        except InvalidFieldset as e:
+            return jsonify({"error": str(e)}), 400
         db = get_db()
+        if fields:
+            rows = db.execute(f"SELECT {CATEGORY_FIELDS.select(fields)} FROM categories").fetchall()
+            return jsonify(CATEGORY_FIELDS.shape(rows, fields, columnar))
         categories = db.execute("SELECT id, name, image, description FROM categories").fetchall()
-        return jsonify([dict(row) for row in categories])
+        categories = with_image_sets([dict(row) for row in categories])
+        return jsonify(columnar_from_dicts(categories) if columnar else categories)
 
     @app.route("/api/places", methods=["GET"])
+    @cached("places", "image_assets", personalize=favorites.personalize)
     def get_places():
+        try:
+            fields, columnar = PLACE_FIELDS.parse(request.args)
+        except InvalidFieldset as e:
+            return jsonify({"error": str(e)}), 400
+        db = get_db()
+        bbox_arg = request.args.get("bbox")
+        if bbox_arg:
+            try:
+                bbox = spatial.parse_bbox(bbox_arg)
+            except ValueError:
+                return jsonify({"error": "Invalid bbox, expected minLng,minLat,maxLng,maxLat"}), 400
+            zoom = request.args.get("zoom", type=int)
+            clusters, places = spatial.viewport(db, bbox, zoom, _place_columns(fields))
+            return jsonify({"clusters": clusters, "places": _place_listing(places, fields, columnar)})
+        places = db.execute(f"SELECT {_place_columns(fields)} FROM places p").fetchall()
+        return jsonify(_place_listing(places, fields, columnar))
+
+    @app.route("/api/places/nearby", methods=["GET"])
+    def get_nearby_places():
+        lat = request.args.get("lat", type=float)
+        lng = request.args.get("lng", type=float)
+        if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({"error": "Valid lat and lng are required"}), 400
+        k = min(max(request.args.get("k", 10, type=int), 1), 100)
+        radius_km = request.args.get("radius_km", type=float)
+        category_id = request.args.get("category", type=int)
+        hits = geo_index.get_index().nearest(
+            lat, lng, k=k, radius_km=radius_km, category_id=category_id
+        )
+        if not hits:
+            return jsonify([])
+        distances = {pid: d for d, pid in hits}
+        marks = ",".join("?" * len(distances))
         db = get_db()
-        places = db.execute("SELECT * FROM places").fetchall()
-        out = []
-        for p in places:
-            avg = db.execute(
-                "SELECT AVG(rating) as avg_rating, COUNT(*) as num_reviews FROM reviews WHERE place_id = ?",
-                (p["id"],),
-            ).fetchone()
-            avg_rating = round(avg["avg_rating"], 2) if avg["avg_rating"] else 0
-            num_reviews = avg["num_reviews"]
-            out.append({**dict(p), "average_rating": avg_rating, "num_reviews": num_reviews})
-        return jsonify(out)
+        rows = db.execute(
+            f"SELECT p.*, {PLACE_STATS_COLUMNS} FROM places p WHERE p.id IN ({marks})",
+            list(distances),
+        ).fetchall()
+        out = [{**dict(p), "distance_km": round(distances[p["id"]], 3)} for p in rows]
+        out.sort(key=lambda p: p["distance_km"])
+        return jsonify(with_image_sets(out))
 
     @app.route("/api/category/<int:id>", methods=["GET"])
+    @cached("categories", "places", "image_assets", personalize=favorites.personalize)
     def get_category(id):
+        try:
+            fields, columnar = PLACE_FIELDS.parse(request.args)
+        except InvalidFieldset as e:
+            return jsonify({"error": str(e)}), 400
         db = get_db()
         category = db.execute("SELECT * FROM categories WHERE id = ?", (id,)).fetchone()
         if not category:
             return jsonify({"error": "Category not found"}), 404
-        places = db.execute("SELECT * FROM places WHERE category_id = ?", (id,)).fetchall()
-        places_out = []
-        for p in places:
-            avg = db.execute(
-                "SELECT AVG(rating) as avg_rating, COUNT(*) as num_reviews FROM reviews WHERE place_id = ?",
-                (p["id"],),
-            ).fetchone()
-            avg_rating = round(avg["avg_rating"], 2) if avg["avg_rating"] else 0
-            num_reviews = avg["num_reviews"]
-            places_out.append({**dict(p), "average_rating": avg_rating, "num_reviews": num_reviews})
-        return jsonify(
-            {
-                "id": category["id"],
-                "name": category["name"],
-                "image": category["image"],
-                "description": category["description"],
-                "places": places_out,
-            }
-        )
+        places = db.execute(
+            f"SELECT {_place_columns(fields)} FROM places p WHERE p.category_id = ?", (id,)
+        ).fetchall()
+        places_out = _place_listing(places, fields, columnar)
+        body = {
+            "id": category["id"],
+            "name": category["name"],
+            "image": category["image"],
+            "description": category["description"],
+        }
+        return jsonify({**with_image_sets([body])[0], "places": places_out})
 
     @app.route("/api/user/favorites", methods=["GET"])
     def get_favorite_places():
@@ -140,7 +333,7 @@ def create_app():
             """,
             (user_id,),
         ).fetchall()
-        return jsonify([dict(f) for f in favorites])
+        return jsonify(with_image_sets([dict(f) for f in favorites]))
 
     @app.route("/api/user/favorites", methods=["POST"])
     def add_favorite_place():
@@ -151,16 +344,27 @@ def create_app():
         place_id = data.get("placeId")
         if not place_id:
             return jsonify({"error": "Missing placeId"}), 400
-        db = get_db()
-        exists = db.execute(
-            "SELECT 1 FROM user_favorites WHERE user_id = ? AND place_id = ?", (user_id, place_id)
-        ).fetchone()
-        if exists:
+        if not run_write(favorites.add_favorite, user_id, place_id):
             return jsonify({"message": "Already in favorites"}), 200
-        db.execute("INSERT INTO user_favorites (user_id, place_id) VALUES (?, ?)", (user_id, place_id))
-        db.commit()
         return jsonify({"message": "Added to favorites"}), 201
 
+    @app.route("/api/user/favorites/sync", methods=["POST"])
+    def sync_favorite_places():
+        user_id = session.get("user_id")
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+        data = request.get_json(force=True, silent=True) or {}
+        add, remove = data.get("add") or [], data.get("remove") or []
+        if not isinstance(add, list) or not isinstance(remove, list):
+            return jsonify({"error": "add and remove must be lists of place ids"}), 400
+        ids = add + remove
+        if not all(isinstance(pid, int) and not isinstance(pid, bool) for pid in ids):
+            return jsonify({"error": "add and remove must be lists of place ids"}), 400
+        if len(ids) > 1000:
+            return jsonify({"error": "Too many place ids (max 1000)"}), 400
+        place_ids = favorites.sync_favorites(user_id, add, remove)
+        return jsonify({"favorites": place_ids}), 200
+
     @app.route("/api/user/favorites", methods=["DELETE"])
     def remove_favorite_place():
         user_id = session.get("user_id")
@@ -170,51 +374,38 @@ def create_app():
         place_id = data.get("placeId")
         if not place_id:
             return jsonify({"error": "Missing placeId"}), 400
-        db = get_db()
-        db.execute("DELETE FROM user_favorites WHERE user_id = ? AND place_id = ?", (user_id, place_id))
-        db.commit()
+        run_write(favorites.remove_favorite, user_id, place_id)
         return jsonify({"message": "Removed from favorites"}), 200
 
     @app.route("/api/place/<int:id>", methods=["GET"])
+    @cached("places", "reviews", "users", "image_assets", personalize=favorites.personalize)
     def get_place(id):
         db = get_db()
-        place = db.execute("SELECT * FROM places WHERE id = ?", (id,)).fetchone()
+        place = db.execute(
+            f"SELECT p.*, {PLACE_STATS_COLUMNS} FROM places p WHERE p.id = ?", (id,)
+        ).fetchone()
         if not place:
             return jsonify({"error": "Place not found"}), 404
-        reviews = db.execute(
-            """
-            SELECT r.id, r.rating, r.text, r.created_at,
-                   COALESCE(u.full_name, u.username, 'Anonymous') AS author,
-                   u.full_name,
-                   u.id AS user_id
-            FROM reviews r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.place_id = ?
-            ORDER BY r.created_at DESC
-            """,
-            (id,),
-        ).fetchall()
-        avg = db.execute(
-            "SELECT AVG(rating) as avg_rating, COUNT(*) as num_reviews FROM reviews WHERE place_id = ?",
-            (id,),
-        ).fetchone()
-        avg_rating = round(avg["avg_rating"], 2) if avg["avg_rating"] else 0
-        num_reviews = avg["num_reviews"]
-        user_id = session.get("user_id")
-        is_favorited = False
-        if user_id:
-            fav = db.execute(
-                "SELECT 1 FROM user_favorites WHERE user_id = ? AND place_id = ?", (user_id, id)
-            ).fetchone()
-            if fav:
-                is_favorited = True
+        limit, cursor = page_args(request.args)
+        sort = request.args.get("sort", "newest")
+        if sort not in place_stats.REVIEW_SORTS:
+            return jsonify({"error": "sort must be 'newest', 'highest' or 'lowest'"}), 400
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, 2 if sort == "newest" else 3)
+            except InvalidCursor:
+                return jsonify({"error": "Invalid cursor"}), 400
+        sql, params, keys = place_stats.review_page_query(id, sort, after)
+        reviews, next_cursor = fetch_page(db, sql, params, keys, limit)
+        body = with_image_sets([{k: place[k] for k in place.keys() if k not in place_stats.STAR_COLUMNS}])[0]
         return jsonify(
             {
-                **dict(place),
-                "reviews": [dict(r) for r in reviews],
-                "average_rating": avg_rating,
-                "num_reviews": num_reviews,
-                "is_favorited": is_favorited,
+                **body,
+                "rating_histogram": place_stats.rating_histogram(place),
+                "reviews": reviews,
+                "next_cursor": next_cursor,
+                "is_favorited": False,
             }
         )
 
@@ -228,24 +419,15 @@ def create_app():
         rating = data.get("rating")
         if not text or rating is None or not (1 <= rating <= 5):
             return jsonify({"error": "Invalid review data"}), 400
-        db = get_db()
-        exists = db.execute(
-            "SELECT 1 FROM reviews WHERE place_id = ? AND user_id = ?", (id, user_id)
-        ).fetchone()
-        if exists:
+        try:
+            review_id = run_write(_insert_review, id, user_id, text, rating)
+        except sqlite3.IntegrityError:
             return jsonify({"error": "You have already reviewed this place"}), 400
-        cur = db.execute(
-            "INSERT INTO reviews (place_id, user_id, text, rating) VALUES (?, ?, ?, ?)",
-            (id, user_id, text, rating),
-        )
-        db.commit()
-        review_id = cur.lastrowid
-        avg = db.execute(
-            "SELECT AVG(rating) as avg_rating FROM reviews WHERE place_id = ?", (id,)
+        db = get_db()
+        stats = db.execute(
+            f"SELECT {PLACE_STATS_COLUMNS} FROM places p WHERE p.id = ?", (id,)
         ).fetchone()
-        avg_rating = round(avg["avg_rating"], 2) if avg["avg_rating"] else 0
-        db.execute("UPDATE places SET rating = ? WHERE id = ?", (avg_rating, id))
-        db.commit()
+        avg_rating = stats["average_rating"] if stats else 0
         review = db.execute(
             """
             SELECT r.id, r.rating, r.text, r.created_at,
@@ -272,47 +454,29 @@ def create_app():
 
     @app.route("/api/users/<int:user_id>", methods=["GET"])
     def get_user_public(user_id):
-        db = get_db()
-        user = db.execute(
-            "SELECT id, username, full_name, profile_picture, location, activities FROM users WHERE id = ?",
-            (user_id,),
-        ).fetchone()
+        user = load_user(user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
-        u = dict(user)
+        fields = ("id", "username", "full_name", "profile_picture", "location", "activities")
+        u = with_image_sets([{k: user[k] for k in fields}], "profile_picture")[0]
         if u.get("activities"):
             u["activities"] = [a.strip() for a in u["activities"].split(",")]
         else:
             u["activities"] = []
         return jsonify(u)
 
-    @app.route("/api/check-auth", methods=["GET"])
-    def check_auth():
-        user_id = session.get("user_id")
-        if not user_id:
-            return jsonify({"logged_in": False})
-        db = get_db()
-        user = db.execute("SELECT id, username, role FROM users WHERE id = ?", (user_id,)).fetchone()
-        if not user:
-            return jsonify({"logged_in": False})
-        return jsonify({"logged_in": True, "user": {"id": user["id"], "username": user["username"], "role": user["role"]}})
-
     @app.route("/api/search", methods=["GET"])
     def search_places():
-        query = request.args.get("q", "").lower()
+        query = request.args.get("q", "")
+        kind = request.args.get("type", "places")
+        limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+        offset = max(request.args.get("offset", 0, type=int), 0)
         db = get_db()
-        results = db.execute(
-            """
-            SELECT id, name, location, description
-            FROM places
-            WHERE LOWER(name) LIKE ? OR LOWER(description) LIKE ? OR LOWER(location) LIKE ?
-            """,
-            (f"%{query}%", f"%{query}%", f"%{query}%"),
-        ).fetchall()
-        return jsonify([dict(r) for r in results])
-    
-    
-    
+        if kind == "posts":
+            return jsonify(search.search_posts(db, query, limit, offset))
+        if kind != "places":
+            return jsonify({"error": "type must be 'places' or 'posts'"}), 400
+        return jsonify(search.search_places(db, query, limit, offset))
 
     @app.route("/api/profile/me", methods=["GET", "PUT", "DELETE"])
     def profile_me():
@@ -323,25 +487,13 @@ def create_app():
         db = get_db()
 
         if request.method == "GET":
-            row = db.execute(
-                """
-                SELECT
-                id,
-                username,
-                COALESCE(full_name,'')       AS full_name,
-                COALESCE(email,'')           AS email,
-                COALESCE(role,'')            AS role,
-                COALESCE(profile_picture,'') AS profile_picture,
-                COALESCE(location,'')        AS location,
-                COALESCE(activities,'')      AS activities
-                FROM users
-                WHERE id = ?
-                """,
-                (user_id,),
-            ).fetchone()
-            if not row:
+            user = current_user()
+            if not user:
                 return jsonify({"error": "User not found"}), 404
-            return jsonify(dict(row)), 200
+            fields = ("full_name", "email", "role", "profile_picture", "location", "activities")
+            return jsonify(
+                {"id": user["id"], "username": user["username"], **{k: user[k] or "" for k in fields}}
+            ), 200
 
         if request.method == "PUT":
             data = request.get_json(force=True) or {}
@@ -353,16 +505,16 @@ def create_app():
             current_password = (data.get("current_password") or "").strip()
 
             if new_password:
-                row = db.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()
+                row = db.execute("SELECT password FROM users WHERE id = ?", (user_id,)).fetchone()
                 if not row:
                     return jsonify({"error": "User not found"}), 404
-                if not check_password_hash(row["password_hash"], current_password):
+                if not check_password(row["password"], current_password):
                     return jsonify({"error": "Current password is incorrect"}), 400
-                new_hash = generate_password_hash(new_password)
+                new_hash = hash_password(new_password)
                 db.execute(
                     """
                     UPDATE users
-                    SET full_name = ?, location = ?, profile_picture = ?, activities = ?, password_hash = ?
+                    SET full_name = ?, location = ?, profile_picture = ?, activities = ?, password = ?
                     WHERE id = ?
                     """,
                     (full_name, location, profile_picture, activities, new_hash, user_id),
@@ -377,31 +529,41 @@ def create_app():
                     (full_name, location, profile_picture, activities, user_id),
                 )
 
+            jobs.process_image(db, profile_picture)
             db.commit()
+            forget_user(user_id)
+            jobs.notify()
             return jsonify({"message": "updated"}), 200
 
-        # DELETE
-        username_row = db.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
-        username = username_row["username"] if username_row else None
-
-        db.execute("DELETE FROM user_favorites WHERE user_id = ?", (user_id,))
-        db.execute("DELETE FROM reviews WHERE user_id = ?", (user_id,))
-        if username:
-            db.execute("DELETE FROM forum_comments WHERE username = ?", (username,))
-            db.execute("DELETE FROM forum_posts WHERE username = ?", (username,))
-        db.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        db.commit()
+        # DELETE: remove the account now; its reviews, favorites and forum
+        # activity are cleaned up by a background job.
+        job_id = jobs.delete_user(db, user_id)
         session.clear()
-        return jsonify({"message": "account deleted"}), 200
+        if job_id is None:
+            return jsonify({"error": "User not found"}), 404
+        return jsonify({"message": "account deleted", "job_id": job_id}), 202
 
 
     return app
 
 @community_bp.get("")
 def get_posts():
+    limit, cursor = page_args(request.args)
+    sort = request.args.get("sort", "new")
+    if sort not in forum.SORT_KEYS:
+        return jsonify({"error": "sort must be 'new', 'active' or 'hot'"}), 400
+    key, tiebreak = forum.SORT_KEYS[sort]
+    sql, params = f"SELECT {forum.POST_COLUMNS} FROM forum_posts", ()
+    if cursor:
+        try:
+            params = tuple(decode_cursor(cursor, 2))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        sql += f" WHERE ({key}, {tiebreak}) < (?, ?)"
+    sql += f" ORDER BY {key} DESC, {tiebreak} DESC"
     db = get_db()
-    posts = db.execute("SELECT * FROM forum_posts ORDER BY created_at DESC").fetchall()
-    return jsonify({"posts": [dict(p) for p in posts]})
+    posts, next_cursor = fetch_page(db, sql, params, (key, tiebreak), limit)
+    return jsonify({"posts": posts, "next_cursor": next_cursor, "total": forum.total_posts(db)})
 
 @community_bp.post("")
 def create_post():
@@ -414,29 +576,44 @@ def create_post():
     category = data.get("category", "").strip()
     if not title or not body or not category:
         return jsonify({"error": "All fields are required"}), 400
-    db = get_db()
-    user = db.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
     post_id = str(uuid.uuid4())
-    db.execute(
-        "INSERT INTO forum_posts (id, category, title, body, username) VALUES (?, ?, ?, ?, ?)",
-        (post_id, category, title, body, user["username"]),
-    )
-    db.commit()
-    new_post = db.execute("SELECT * FROM forum_posts WHERE id = ?", (post_id,)).fetchone()
+    run_write(_insert_post, post_id, category, title, body, user["username"])
+    community_feed.notify()
+    db = get_db()
+    new_post = db.execute(
+        f"SELECT {forum.POST_COLUMNS} FROM forum_posts WHERE id = ?", (post_id,)
+    ).fetchone()
     return jsonify({"post": dict(new_post)}), 201
 
+community_bp.add_url_rule("/stream", "stream", community_feed.stream)
+
 @community_bp.get("/<string:post_id>")
 def get_post(post_id):
     db = get_db()
-    post = db.execute("SELECT * FROM forum_posts WHERE id = ?", (post_id,)).fetchone()
+    post = db.execute(f"SELECT {forum.POST_COLUMNS} FROM forum_posts WHERE id = ?", (post_id,)).fetchone()
     if not post:
         return jsonify({"error": "Post not found"}), 404
-    comments = db.execute(
-        "SELECT * FROM forum_comments WHERE post_id = ? ORDER BY created_at DESC", (post_id,)
-    ).fetchall()
-    return jsonify({**dict(post), "comments": [dict(c) for c in comments]})
+    limit, cursor = page_args(request.args)
+    sql, params = "SELECT * FROM forum_comments WHERE post_id = ?", (post_id,)
+    if cursor:
+        try:
+            params += tuple(decode_cursor(cursor, 2))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        sql += " AND (created_at, id) < (?, ?)"
+    sql += " ORDER BY created_at DESC, id DESC"
+    comments, next_cursor = fetch_page(db, sql, params, ("created_at", "id"), limit)
+    return jsonify(
+        {
+            **dict(post),
+            "comments": comments,
+            "next_cursor": next_cursor,
+            "total_comments": post["comment_count"],
+        }
+    )
 
 @community_bp.post("/<string:post_id>/comments")
 def add_comment(post_id):
@@ -447,23 +624,22 @@ def add_comment(post_id):
     body = data.get("body", "").strip()
     if not body:
         return jsonify({"error": "Comment cannot be empty"}), 400
-    db = get_db()
-    user = db.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
-    db.execute(
-        "INSERT INTO forum_comments (post_id, username, body) VALUES (?, ?, ?)",
-        (post_id, user["username"], body),
-    )
-    db.commit()
+    run_write(_insert_comment, post_id, user["username"], body)
+    community_feed.notify()
     return jsonify({"message": "Comment added"}), 201
 
 @community_bp.delete("/<string:post_id>")
 @require_admin
 def delete_post(post_id):
     db = get_db()
-    db.execute("DELETE FROM forum_posts WHERE id = ?", (post_id,))
+    deleted = db.execute("DELETE FROM forum_posts WHERE id = ?", (post_id,)).rowcount
+    if deleted:
+        community_feed.publish(db, "post_deleted", post_id, {"id": post_id})
     db.commit()
+    community_feed.notify()
     return jsonify({"message": "Post deleted"}), 200
 
 app = create_app()
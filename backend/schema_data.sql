@@ -30,6 +30,12 @@ CREATE TABLE IF NOT EXISTS places (
     latitude REAL,
     longitude REAL,
     review_count INTEGER DEFAULT 0,
+    rating_sum REAL DEFAULT 0,
+    stars_1 INTEGER DEFAULT 0,
+    stars_2 INTEGER DEFAULT 0,
+    stars_3 INTEGER DEFAULT 0,
+    stars_4 INTEGER DEFAULT 0,
+    stars_5 INTEGER DEFAULT 0,
     category_id INTEGER,
     FOREIGN KEY (category_id) REFERENCES categories (id)
 );
@@ -39,9 +45,10 @@ CREATE TABLE IF NOT EXISTS reviews (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     place_id INTEGER NOT NULL,
-    rating INTEGER NOT NULL,
+    rating REAL NOT NULL,
     text TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(place_id, user_id),
     FOREIGN KEY (user_id) REFERENCES users(id),
     FOREIGN KEY (place_id) REFERENCES places(id)
 );
@@ -58,7 +65,8 @@ CREATE TABLE IF NOT EXISTS user_favorites (
 
 -- Forum posts
 CREATE TABLE IF NOT EXISTS forum_posts (
-    id TEXT PRIMARY KEY,
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
     category TEXT NOT NULL,
     title TEXT NOT NULL,
     body TEXT NOT NULL,
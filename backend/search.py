@@ -0,0 +1,155 @@
+import re
+import click
+from db import get_db
+
+# Full-text search over places and forum posts.
+#
+# places_fts and forum_posts_fts are FTS5 external-content indexes: they store
+# only the inverted index and read column values back from the source tables.
+# Triggers on the source tables keep them in sync with every write. Both are
+# keyed on an INTEGER PRIMARY KEY (places.id, forum_posts.seq), so the keys
+# survive VACUUM.
+
+_INDEXES = {
+    "places_fts": {
+        "table": "places",
+        "rowid": "id",
+        "columns": ("name", "location", "description"),
+    },
+    "forum_posts_fts": {
+        "table": "forum_posts",
+        "rowid": "seq",
+        "columns": ("title", "body"),
+    },
+}
+
+# Column weights for bm25(), in the column order declared above.
+PLACE_WEIGHTS = (10.0, 4.0, 1.0)
+POST_WEIGHTS = (5.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _triggers(fts, spec):
+    table, rowid, cols = spec["table"], spec["rowid"], spec["columns"]
+    col_list = ", ".join(cols)
+    new_vals = ", ".join(f"NEW.{c}" for c in cols)
+    old_vals = ", ".join(f"OLD.{c}" for c in cols)
+    delete_row = (
+        f"INSERT INTO {fts} ({fts}, rowid, {col_list}) "
+        f"VALUES ('delete', OLD.{rowid}, {old_vals});"
+    )
+    insert_row = f"INSERT INTO {fts} (rowid, {col_list}) VALUES (NEW.{rowid}, {new_vals});"
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} "
+        f"BEGIN {insert_row} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete_row} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {col_list} ON {table} "
+        f"BEGIN {delete_row} {insert_row} END",
+    )
+
+
+def rebuild_search_index(db):
+    """Rebuild every full-text index from its source table."""
+    for fts in _INDEXES:
+        db.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def ensure_schema(db):
+    """Create the FTS5 indexes and their sync triggers if the database predates them."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        for fts, spec in _INDEXES.items():
+            has_table = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (spec["table"],)
+            ).fetchone()
+            if not has_table:
+                continue
+            exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+            if not exists:
+                db.execute(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                    f"{', '.join(spec['columns'])}, "
+                    f"content='{spec['table']}', content_rowid='{spec['rowid']}', "
+                    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+                db.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            for trigger in _triggers(fts, spec):
+                db.execute(trigger)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def to_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Returns None when the text has no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(text or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def search_places(db, text, limit=20, offset=0):
+    """Return places matching text, best BM25 match first, with highlighted snippets."""
+    match = to_match_query(text)
+    if match is None:
+        return []
+    weights = ", ".join(str(w) for w in PLACE_WEIGHTS)
+    rows = db.execute(
+        f"""
+        SELECT p.id, p.name, p.location, p.description,
+               highlight(places_fts, 0, '<mark>', '</mark>') AS name_highlight,
+               snippet(places_fts, 2, '<mark>', '</mark>', '…', 16) AS snippet,
+               bm25(places_fts, {weights}) AS rank
+        FROM places_fts
+        JOIN places p ON p.id = places_fts.rowid
+        WHERE places_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit, offset),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def search_posts(db, text, limit=20, offset=0):
+    """Return forum posts matching text, best BM25 match first, with highlighted snippets."""
+    match = to_match_query(text)
+    if match is None:
+        return []
+    weights = ", ".join(str(w) for w in POST_WEIGHTS)
+    rows = db.execute(
+        f"""
+        SELECT fp.id, fp.category, fp.title, fp.username, fp.created_at,
+               highlight(forum_posts_fts, 0, '<mark>', '</mark>') AS title_highlight,
+               snippet(forum_posts_fts, 1, '<mark>', '</mark>', '…', 16) AS snippet,
+               bm25(forum_posts_fts, {weights}) AS rank
+        FROM forum_posts_fts
+        JOIN forum_posts fp ON fp.seq = forum_posts_fts.rowid
+        WHERE forum_posts_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit, offset),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@click.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search indexes."""
+    db = get_db()
+    rebuild_search_index(db)
+    db.commit()
+    click.echo('✅ Search index rebuilt.')
+
+
+def init_app(app):
+    """Install the search schema and register the rebuild command."""
+    app.cli.add_command(rebuild_search_index_command)
+    ensure_schema(get_db())
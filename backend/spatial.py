@@ -0,0 +1,198 @@
+import math
+import click
+from flask import current_app
+from db import get_db
+
+# Spatial index over places.latitude/longitude.
+#
+# places_rtree is an SQLite R*Tree with one zero-area box per place. Triggers on
+# places keep it in sync with admin add/update/delete, so viewport queries never
+# scan the places table.
+
+_TRIGGERS = (
+    """
+CREATE TRIGGER IF NOT EXISTS places_rtree_insert AFTER INSERT ON places
+WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+BEGIN
+    INSERT INTO places_rtree (id, min_lng, max_lng, min_lat, max_lat)
+    VALUES (NEW.id, NEW.longitude, NEW.longitude, NEW.latitude, NEW.latitude);
+END
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS places_rtree_update AFTER UPDATE OF id, latitude, longitude ON places
+BEGIN
+    DELETE FROM places_rtree WHERE id = OLD.id;
+    INSERT INTO places_rtree (id, min_lng, max_lng, min_lat, max_lat)
+    SELECT NEW.id, NEW.longitude, NEW.longitude, NEW.latitude, NEW.latitude
+    WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+END
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS places_rtree_delete AFTER DELETE ON places
+BEGIN
+    DELETE FROM places_rtree WHERE id = OLD.id;
+END
+    """,
+)
+
+# Marker size in pixels used to size cluster cells, and the hard cap on the
+# number of cells along either axis of the requested viewport.
+CLUSTER_CELL_PX = 64
+MAX_GRID_CELLS = 32
+
+
+def rebuild_spatial_index(db):
+    """Repopulate places_rtree from the places table."""
+    db.execute("DELETE FROM places_rtree")
+    db.execute(
+        """
+        INSERT INTO places_rtree (id, min_lng, max_lng, min_lat, max_lat)
+        SELECT id, longitude, longitude, latitude, latitude
+        FROM places
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+    )
+
+
+def ensure_schema(db):
+    """Create the R*Tree and its sync triggers if the database predates them."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        has_places = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'places'"
+        ).fetchone()
+        if not has_places:
+            db.rollback()
+            return
+        exists = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'places_rtree'"
+        ).fetchone()
+        if not exists:
+            db.execute(
+                "CREATE VIRTUAL TABLE places_rtree USING rtree(id, min_lng, max_lng, min_lat, max_lat)"
+            )
+            rebuild_spatial_index(db)
+        for trigger in _TRIGGERS:
+            db.execute(trigger)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def parse_bbox(value):
+    """Parse 'minLng,minLat,maxLng,maxLat' into floats, or raise ValueError."""
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must have four comma separated numbers")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not all(math.isfinite(v) for v in parts):
+        raise ValueError("bbox values must be finite")
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox min values must not exceed max values")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def places_in_bbox(db, bbox, columns="p.*", limit=-1):
+    """Return up to limit places whose coordinates fall inside bbox, via the R*Tree."""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    # R*Tree boxes are stored as 32-bit floats, so re-check the exact values.
+    return db.execute(
+        f"""
+        SELECT {columns}
+        FROM places_rtree t
+        JOIN places p ON p.id = t.id
+        WHERE t.max_lng >= ? AND t.min_lng <= ? AND t.max_lat >= ? AND t.min_lat <= ?
+          AND p.longitude BETWEEN ? AND ? AND p.latitude BETWEEN ? AND ?
+        LIMIT ?
+        """,
+        (min_lng, max_lng, min_lat, max_lat, min_lng, max_lng, min_lat, max_lat, limit),
+    ).fetchall()
+
+
+def cluster_cell_size(bbox, zoom):
+    """Cell size in degrees for grid clustering at the given zoom level.
+
+    Without a zoom the viewport is split into MAX_GRID_CELLS cells per axis.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    span = max(max_lng - min_lng, max_lat - min_lat)
+    if zoom is None:
+        return span / MAX_GRID_CELLS
+    cell = 360.0 / (2 ** max(zoom, 0)) * CLUSTER_CELL_PX / 256.0
+    # Never hand back more than MAX_GRID_CELLS x MAX_GRID_CELLS clusters,
+    # whatever bbox/zoom combination the client sends.
+    return max(cell, span / MAX_GRID_CELLS)
+
+
+def clusters_in_bbox(db, bbox, zoom):
+    """Group the places in bbox into grid cells and return one cluster per cell."""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    cell = cluster_cell_size(bbox, zoom)
+    rows = db.execute(
+        """
+        SELECT CAST((p.longitude - ?) / ? AS INTEGER) AS gx,
+               CAST((p.latitude - ?) / ? AS INTEGER) AS gy,
+               COUNT(*) AS count,
+               AVG(p.latitude) AS latitude,
+               AVG(p.longitude) AS longitude,
+               MIN(p.id) AS place_id
+        FROM places_rtree t
+        JOIN places p ON p.id = t.id
+        WHERE t.max_lng >= ? AND t.min_lng <= ? AND t.max_lat >= ? AND t.min_lat <= ?
+          AND p.longitude BETWEEN ? AND ? AND p.latitude BETWEEN ? AND ?
+        GROUP BY gx, gy
+        """,
+        (
+            min_lng, cell, min_lat, cell,
+            min_lng, max_lng, min_lat, max_lat,
+            min_lng, max_lng, min_lat, max_lat,
+        ),
+    ).fetchall()
+    clusters = []
+    for r in rows:
+        cluster = {
+            "latitude": r["latitude"],
+            "longitude": r["longitude"],
+            "count": r["count"],
+        }
+        if r["count"] == 1:
+            cluster["place_id"] = r["place_id"]
+        clusters.append(cluster)
+    return clusters
+
+
+def should_cluster(zoom):
+    # A bbox without a zoom could be the whole world; only a zoomed-in client
+    # gets raw places, and only up to SPATIAL_MAX_PLACES of them (see
+    # viewport), so the payload stays bounded either way.
+    return zoom is None or zoom < current_app.config.get("SPATIAL_CLUSTER_MAX_ZOOM", 10)
+
+
+def viewport(db, bbox, zoom, columns="p.*"):
+    """Return (clusters, places) for a map viewport; one of the two is empty.
+
+    Places are returned one by one when zoomed in and there are at most
+    SPATIAL_MAX_PLACES of them in bbox; otherwise the viewport is clustered.
+    """
+    if not should_cluster(zoom):
+        limit = current_app.config.get("SPATIAL_MAX_PLACES", 500)
+        places = places_in_bbox(db, bbox, columns, limit + 1)
+        if len(places) <= limit:
+            return [], places
+    return clusters_in_bbox(db, bbox, zoom), []
+
+
+@click.command('rebuild-spatial-index')
+def rebuild_spatial_index_command():
+    """Repopulate the places R*Tree from the places table."""
+    db = get_db()
+    rebuild_spatial_index(db)
+    db.commit()
+    click.echo('✅ Spatial index rebuilt.')
+
+
+def init_app(app):
+    """Install the spatial index schema and register the rebuild command."""
+    app.cli.add_command(rebuild_spatial_index_command)
+    ensure_schema(get_db())
@@ -0,0 +1,55 @@
+import json
+from flask import Response, request, stream_with_context
+from json_provider import orjson
+
+# Streaming JSON responses.
+#
+# Rows are pulled from the cursor in chunks and written out as they arrive, so
+# memory stays flat whatever the table size. Clients that send
+# `Accept: application/x-ndjson` get one JSON object per line; everyone else
+# gets a regular JSON array, identical to what jsonify would have produced
+# (keys sorted, compact separators; debug-mode indentation aside).
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+CHUNK_SIZE = 500
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match([NDJSON_MIMETYPE, "application/json"])
+    return best == NDJSON_MIMETYPE
+
+
+def _dumps(row):
+    if orjson is not None:
+        return orjson.dumps(dict(row), default=str, option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(dict(row), ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=str)
+
+
+def iter_json_array(cursor, chunk_size=CHUNK_SIZE):
+    yield "["
+    first = True
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        parts = [_dumps(r) for r in rows]
+        yield ("" if first else ",") + ",".join(parts)
+        first = False
+    yield "]"
+
+
+def iter_ndjson(cursor, chunk_size=CHUNK_SIZE):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield "".join(_dumps(r) + "\n" for r in rows)
+
+
+def stream_rows(cursor, chunk_size=CHUNK_SIZE):
+    """Stream every row of `cursor` as JSON or NDJSON, depending on the Accept header."""
+    if wants_ndjson():
+        body, mimetype = iter_ndjson(cursor, chunk_size), NDJSON_MIMETYPE
+    else:
+        body, mimetype = iter_json_array(cursor, chunk_size), "application/json"
+    return Response(stream_with_context(body), mimetype=mimetype)
@@ -0,0 +1,164 @@
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+# Test fixtures.
+#
+# A template database is built once per session by running the migrations on
+# an empty file and seeding a small, fixed data set through the app's own
+# connection, so triggers maintain review stats, forum counters and the
+# search and spatial indexes as in production. Each test gets a copy of it
+# and a fresh app, so tests can write freely.
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Importing run creates a module-level app; keep it off the developer's database.
+_scratch = tempfile.mkdtemp(prefix="adrenalink-tests-")
+os.environ["DATABASE"] = os.path.join(_scratch, "import.db")
+os.environ["IMAGE_STORE"] = os.path.join(_scratch, "images")
+os.environ["FLASK_ENV"] = "development"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+os.environ["JOBS_WORKERS"] = "0"
+os.environ["QUERY_PROFILER"] = "0"
+
+PASSWORD = "password"
+POSTS = 45
+COMMENTS = 30
+
+
+def _seed(db):
+    password = generate_password_hash(PASSWORD, method="pbkdf2:sha256:1000")
+    db.executemany(
+        "INSERT INTO categories (name, description, image) VALUES (?, ?, ?)",
+        [("Skydiving", "Freefall", "/images/sky.jpg"), ("Caving", "Potholes", "/images/cave.jpg")],
+    )
+    db.executemany(
+        "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+        [
+            ("admin", "admin@example.com", password, "admin"),
+            ("alice", "alice@example.com", password, "client"),
+            ("bob", "bob@example.com", password, "client"),
+        ],
+    )
+    db.executemany(
+        "INSERT INTO places (name, description, location, image, latitude, longitude, category_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (f"Place {i}", "A place", "Bristol", "/images/place.jpg", 51.0 + i / 10, -2.5 + i / 10, 1 + i % 2)
+            for i in range(1, 11)
+        ],
+    )
+    db.executemany(
+        "INSERT INTO reviews (place_id, user_id, rating, text, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(1 + i % 10, 2 + i // 10, 1 + i % 5, "Amazing views", f"2024-01-{1 + i:02d} 12:00:00") for i in range(20)],
+    )
+    db.execute("INSERT INTO user_favorites (user_id, place_id) VALUES (2, 1)")
+    # Timestamps repeat so the id tiebreak of the page cursors is exercised.
+    db.executemany(
+        "INSERT INTO forum_posts (id, category, title, body, username, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (f"post-{i:03d}", "Skydiving", f"Trip report {i}", "Great jump", "alice", f"2024-02-{1 + i // 3:02d}")
+            for i in range(POSTS)
+        ],
+    )
+    db.executemany(
+        "INSERT INTO forum_comments (post_id, username, body, created_at) VALUES (?, ?, ?, ?)",
+        [("post-000", "bob", f"Comment {i}", f"2024-03-{1 + i // 4:02d}") for i in range(COMMENTS)],
+    )
+    db.commit()
+
+
+@pytest.fixture(scope="session")
+def template_db(tmp_path_factory):
+    import migrations
+    import run
+    from db import get_db, get_pool
+
+    path = tmp_path_factory.mktemp("template") / "data.db"
+    os.environ["DATABASE"] = str(path)
+    app = run.create_app()
+    with app.app_context():
+        db = get_db()
+        migrations.migrate(db)
+        _seed(db)
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    get_pool(app).close_all()
+    return path
+
+
+@pytest.fixture
+def app(template_db, tmp_path):
+    import run
+    from db import get_pool
+
+    path = tmp_path / "data.db"
+    shutil.copyfile(template_db, path)
+    os.environ["DATABASE"] = str(path)
+    app = run.create_app()
+    app.config["TESTING"] = True
+    yield app
+    get_pool(app).close_all()
+
+
+@pytest.fixture
+def db(app):
+    from db import get_db
+
+    with app.app_context():
+        yield get_db()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id, role="client"):
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["role"] = role
+    return client
+
+
+@pytest.fixture
+def admin_client(client):
+    return login(client, 1, "admin")
+
+
+@pytest.fixture
+def user_client(client):
+    return login(client, 2)
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when a block runs more SQL statements than allowed.
+
+        with query_budget(3):
+            client.get("/api/place/1")
+
+    The failure lists the statement shapes run, most repeated first.
+    """
+    from query_profiler import capture_queries, statement_shape
+
+    @contextmanager
+    def budget(limit):
+        with capture_queries() as queries:
+            yield queries
+        if len(queries) > limit:
+            shapes = Counter(statement_shape(q[0]) for q in queries).most_common()
+            pytest.fail(
+                f"{len(queries)} statements, budget {limit}:\n"
+                + "\n".join(f"  {n}x {shape}" for shape, n in shapes),
+                pytrace=False,
+            )
+
+    return budget
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _batch(client, requests):
+    return client.post("/api/batch", json={"requests": requests})
+
+
+def test_responses_in_request_order(client):
+    response = _batch(client, ["/api/categories", {"id": "place", "path": "/api/place/1"}, "/api/place/999999"])
+    assert response.status_code == 200
+    items = response.get_json()["responses"]
+    assert [(i["id"], i["status"]) for i in items] == [(0, 200), ("place", 200), (2, 404)]
+    assert items[0]["body"] == client.get("/api/categories").get_json()
+    assert items[1]["body"]["id"] == 1
+    assert "error" in items[2]["body"]
+
+
+def test_shares_the_session(user_client):
+    items = _batch(user_client, ["/api/user/favorites", "/api/user/favorites"]).get_json()["responses"]
+    assert [i["status"] for i in items] == [200, 200]
+    assert items[0]["body"] == items[1]["body"]
+
+
+def test_streamed_sub_response_is_refused(app, client):
+    # The SSE feed never ends; batching it used to hang the whole request.
+    with ThreadPoolExecutor(1) as pool:
+        response = pool.submit(_batch, client, ["/api/community/stream", "/api/categories"]).result(timeout=10)
+    items = response.get_json()["responses"]
+    assert [i["status"] for i in items] == [400, 200]
+    assert "cannot be batched" in items[0]["body"]["error"]
+    assert app.extensions["community_feed"].stats()["subscribers"] == 0
+
+
+def test_streamed_admin_listing_is_refused(admin_client):
+    items = _batch(admin_client, ["/api/admin/users"]).get_json()["responses"]
+    assert items[0]["status"] == 400
+
+
+def test_error_responses_are_not_mistaken_for_streams(client):
+    items = _batch(client, ["/api/nowhere", "/api/admin/users"]).get_json()["responses"]
+    assert [i["status"] for i in items] == [404, 403]
+
+
+def test_invalid_batches(client, app):
+    too_many = ["/api/categories"] * (app.config["BATCH_MAX_REQUESTS"] + 1)
+    for requests in (
+        [],
+        "not a list",
+        too_many,
+        [{"path": "/api/categories", "method": "POST"}],
+        ["/api/batch"],
+        ["/index.html"],
+        ["https://example.com/api/categories"],
+        [42],
+    ):
+        response = _batch(client, requests)
+        assert response.status_code == 400, requests
+        assert "error" in response.get_json()
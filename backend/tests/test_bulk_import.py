@@ -0,0 +1,65 @@
+import csv
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from bulk_import import IMPORTERS, _Importer
+
+
+def _import(client, entity, body, fmt="csv"):
+    return client.post(f"/api/admin/import/{entity}?format={fmt}", data=body)
+
+
+def test_imports_and_reports_per_row(admin_client, db):
+    response = _import(admin_client, "places", b"name,category_id\nA,1\n,1\nB,99\nC,2\n")
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report["inserted"], report["failed"]) == (2, 2)
+    assert [e["row"] for e in report["errors"]] == [2, 3]
+
+
+def test_invalid_utf8_fails_only_its_row(admin_client, db):
+    response = _import(admin_client, "places", b"name,category_id\nok,1\n\xff\xfe,1\nalso ok,2\n")
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"row": 2, "error": "Row is not valid UTF-8"}]
+
+
+def test_invalid_utf8_in_ndjson(admin_client):
+    body = b'{"name": "ok", "category_id": 1}\n{"name": "\xff", "category_id": 1}\n'
+    report = _import(admin_client, "places", body, "ndjson").get_json()
+    assert report["inserted"] == 1
+    assert report["errors"] == [{"row": 2, "error": "Row is not valid UTF-8"}]
+
+
+def test_malformed_csv_fails_only_its_row(admin_client):
+    body = b"name,category_id\nok,1\n" + b"x" * 200 + b",1\nalso ok,2\n"
+    limit = csv.field_size_limit(100)
+    try:
+        report = _import(admin_client, "places", body).get_json()
+    finally:
+        csv.field_size_limit(limit)
+    assert report["inserted"] == 2
+    assert report["errors"][0]["row"] == 2
+    assert report["errors"][0]["error"].startswith("Malformed CSV")
+
+
+def test_password_hashes_are_checked(admin_client, db):
+    good = generate_password_hash("secret", method="pbkdf2:sha256:1000")
+    body = (
+        "username,email,password_hash\n"
+        f"carol,carol@example.com,{good}\n"
+        "dave,dave@example.com,secret\n"
+        "erin,erin@example.com,md5$salt$abcdef\n"
+    ).encode()
+    report = _import(admin_client, "users", body).get_json()
+    assert report["inserted"] == 1
+    assert [e["row"] for e in report["errors"]] == [2, 3]
+    assert db.execute("SELECT password FROM users WHERE username = 'carol'").fetchone()[0] == good
+
+
+def test_importers_must_validate():
+    with pytest.raises(TypeError):
+        type("NoValidate", (_Importer,), {"table": "x", "columns": ()})()
+    assert all(issubclass(importer, _Importer) for importer in IMPORTERS.values())
@@ -0,0 +1,21 @@
+import json
+
+import forum
+
+POST_KEYS = set(forum.POST_COLUMNS.split(", "))
+
+
+def test_post_payloads_hide_internal_keys(user_client, db):
+    created = user_client.post("/api/community", json={"title": "T", "body": "B", "category": "Caving"})
+    post = created.get_json()["post"]
+    assert set(post) == POST_KEYS
+
+    listed = user_client.get("/api/community").get_json()["posts"]
+    assert all(set(p) == POST_KEYS for p in listed)
+
+    single = user_client.get(f"/api/community/{post['id']}").get_json()
+    assert "seq" not in single
+    assert POST_KEYS <= set(single)
+
+    event = db.execute("SELECT data FROM community_events WHERE type = 'post_created'").fetchone()
+    assert set(json.loads(event[0])) == POST_KEYS
@@ -0,0 +1,13 @@
+def test_index_is_loaded_at_startup(app):
+    index = app.extensions["geo_index"]
+    assert index.loaded
+    assert len(index.points) == 10
+
+
+def test_nearby_picks_up_new_places(admin_client):
+    response = admin_client.post(
+        "/api/admin/places", json={"name": "Far", "category_id": 1, "latitude": 10.0, "longitude": 10.0}
+    )
+    assert response.status_code == 201
+    nearest = admin_client.get("/api/places/nearby?lat=10&lng=10&k=1").get_json()
+    assert [p["name"] for p in nearest] == ["Far"]
@@ -0,0 +1,49 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from utils.hash import HashingUnavailable, PasswordHasher
+
+METHOD = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(method=METHOD, workers=1, queue_size=1, timeout=1.0)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hashes_in_worker_processes(hasher):
+    hashed = hasher.hash("secret")
+    assert hasher.check(hashed, "secret")
+    assert not hasher.check(hashed, "wrong")
+    assert not hasher.needs_rehash(hashed)
+
+
+def test_pool_starts_on_first_hash(hasher):
+    assert hasher._executor is None
+    hasher.hash("secret")
+    assert hasher._executor is not None
+
+
+def test_queueing_and_hashing_share_one_timeout(hasher, monkeypatch):
+    hasher.hash("warm up")
+    hasher.timeout = 0.5
+    # Hold the only slot for most of the timeout from another thread.
+    hasher._slots.acquire()
+    threading.Timer(0.4, hasher._slots.release).start()
+    monkeypatch.setattr(hasher, "_pool", lambda: _Slow())
+    start = time.monotonic()
+    with pytest.raises(HashingUnavailable):
+        hasher.hash("secret")
+    assert time.monotonic() - start < 0.8
+
+
+class _Slow:
+    """Stands in for the process pool with work that never finishes in time."""
+
+    def submit(self, fn, *args):
+        return Future()
@@ -0,0 +1,28 @@
+import sqlite3
+
+
+def _other_worker(app, sql, params=()):
+    # A write made elsewhere: no forget_user() in this process.
+    conn = sqlite3.connect(app.config["DATABASE"])
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_demoted_admin_loses_access_at_once(app, admin_client):
+    assert admin_client.get("/api/admin/jobs").status_code == 200
+    _other_worker(app, "UPDATE users SET role = 'client' WHERE id = 1")
+    assert admin_client.get("/api/admin/jobs").status_code == 403
+
+
+def test_deleted_user_is_logged_out_at_once(app, user_client):
+    assert user_client.get("/api/profile/me").status_code == 200
+    _other_worker(app, "DELETE FROM users WHERE id = 2")
+    assert user_client.get("/api/profile/me").status_code == 404
+
+
+def test_unchanged_users_are_served_from_the_cache(app, user_client):
+    user_client.get("/api/profile/me")
+    hits = app.extensions["identity_cache"].stats()["hits"]
+    user_client.get("/api/profile/me")
+    assert app.extensions["identity_cache"].stats()["hits"] == hits + 1
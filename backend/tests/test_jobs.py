@@ -0,0 +1,96 @@
+import pytest
+
+import images
+from db import get_pool
+
+
+def _run_jobs(app):
+    runner = app.extensions["jobs"]
+    conn = get_pool(app).connect()
+    conn.isolation_level = None
+    try:
+        while runner.run_one(conn):
+            pass
+    finally:
+        conn.close()
+
+
+def _jobs(db):
+    return [tuple(r) for r in db.execute("SELECT kind, status FROM jobs ORDER BY id")]
+
+
+@pytest.mark.skipif(not images.available(), reason="Pillow is not installed")
+def test_saving_a_place_queues_its_image(app, admin_client, db, tmp_path):
+    from PIL import Image
+
+    app.config["IMAGE_SOURCE_DIR"] = str(tmp_path)
+    Image.new("RGB", (640, 480), "red").save(tmp_path / "new.jpg")
+    response = admin_client.post("/api/admin/places", json={"name": "New", "category_id": 1, "image": "/new.jpg"})
+    assert response.status_code == 201
+    # The request only queued the work.
+    assert _jobs(db) == [("process_image", "queued")]
+    assert db.execute("SELECT 1 FROM image_assets WHERE source = '/new.jpg'").fetchone() is None
+
+    _run_jobs(app)
+    assert _jobs(db) == [("process_image", "done")]
+    row = db.execute("SELECT width, height FROM image_assets WHERE source = '/new.jpg'").fetchone()
+    assert tuple(row) == (640, 480)
+
+
+def test_external_images_are_not_queued(admin_client, db):
+    response = admin_client.post(
+        "/api/admin/places", json={"name": "New", "category_id": 1, "image": "https://example.com/a.jpg"}
+    )
+    assert response.status_code == 201
+    assert _jobs(db) == []
+
+
+@pytest.mark.skipif(not images.available(), reason="Pillow is not installed")
+def test_uploading_an_image_queues_its_derivatives(app, admin_client, db):
+    import io
+
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), "blue").save(buf, "JPEG")
+    response = admin_client.post("/api/admin/images", data=buf.getvalue())
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["image"].startswith(images.URL_PREFIX) and body["image_set"] is None
+    assert _jobs(db) == [("process_image", "queued")]
+
+    _run_jobs(app)
+    assert _jobs(db) == [("process_image", "done")]
+    row = db.execute("SELECT width, height FROM image_assets WHERE source = ?", (body["image"],)).fetchone()
+    assert tuple(row) == (640, 480)
+
+
+@pytest.mark.skipif(not images.available(), reason="Pillow is not installed")
+def test_build_images_commits_what_it_builds(app, tmp_path):
+    from PIL import Image
+
+    app.config["IMAGE_SOURCE_DIR"] = str(tmp_path)
+    (tmp_path / "images").mkdir()
+    Image.new("RGB", (300, 200), "green").save(tmp_path / "images" / "place.jpg")
+    with app.app_context():
+        result = app.test_cli_runner().invoke(images.build_images_command)
+    assert "1 built" in result.output
+    # Read through another connection: the row must have been committed.
+    conn = get_pool(app).connect()
+    try:
+        row = conn.execute("SELECT width, height FROM image_assets WHERE source = '/images/place.jpg'").fetchone()
+        assert tuple(row) == (300, 200)
+    finally:
+        conn.close()
+
+
+def test_deleting_an_account_cleans_up_in_a_job(app, user_client, db):
+    response = user_client.delete("/api/profile/me")
+    assert response.status_code == 202
+    assert db.execute("SELECT 1 FROM users WHERE id = 2").fetchone() is None
+    assert db.execute("SELECT COUNT(*) FROM reviews WHERE user_id = 2").fetchone()[0] > 0
+
+    _run_jobs(app)
+    assert _jobs(db) == [("delete_user", "done")]
+    assert db.execute("SELECT COUNT(*) FROM reviews WHERE user_id = 2").fetchone()[0] == 0
+    assert db.execute("SELECT COUNT(*) FROM forum_posts WHERE username = 'alice'").fetchone()[0] == 0
@@ -0,0 +1,31 @@
+import pytest
+
+
+def test_metrics_needs_an_admin(client):
+    assert client.get("/api/metrics").status_code == 403
+
+
+def test_metrics_for_a_client_is_forbidden(user_client):
+    assert user_client.get("/api/metrics").status_code == 403
+
+
+def test_metrics_for_an_admin(admin_client):
+    admin_client.get("/api/categories")
+    response = admin_client.get("/api/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{endpoint="/api/categories",method="GET",status="200"} 1' in response.text
+
+
+@pytest.mark.parametrize("header, status", [("Bearer s3cret", 200), ("Bearer wrong", 403), ("s3cret", 403)])
+def test_metrics_scrape_token(app, client, header, status):
+    app.config["METRICS_TOKEN"] = "s3cret"
+    assert client.get("/api/metrics", headers={"Authorization": header}).status_code == status
+
+
+def test_metrics_can_be_turned_off(template_db, monkeypatch):
+    import run
+
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    app = run.create_app()
+    assert "metrics" not in app.extensions
+    assert app.test_client().get("/api/metrics").status_code == 404
@@ -0,0 +1,32 @@
+import logging
+import sqlite3
+
+import migrations
+
+
+def test_duplicate_reviews_keep_the_latest(caplog):
+    # The reviews table of databases built from older schema files.
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute(
+        "CREATE TABLE reviews (id INTEGER PRIMARY KEY, place_id INTEGER, user_id INTEGER, "
+        "rating INTEGER, created_at TIMESTAMP)"
+    )
+    db.executemany(
+        "INSERT INTO reviews (id, place_id, user_id, rating, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (1, 1, 1, 2, "2024-01-01"),
+            (2, 1, 1, 5, "2024-03-01"),
+            (3, 1, 1, 4, "2024-02-01"),
+            (4, 1, 2, 3, "2024-01-01"),
+            (5, 2, 1, 1, None),
+            (6, 2, 1, 4, None),
+        ],
+    )
+    with caplog.at_level(logging.WARNING, logger="migrations"):
+        migrations._unique_reviews(db)
+    assert [r["id"] for r in db.execute("SELECT id FROM reviews ORDER BY id")] == [2, 4, 6]
+    assert "Removed 3 duplicate review(s)" in caplog.text
+    # Now enforced by the index.
+    index = db.execute("SELECT name FROM sqlite_master WHERE name = 'idx_reviews_place_user'").fetchone()
+    assert index is not None
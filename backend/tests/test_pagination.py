@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import COMMENTS, POSTS
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    values = ["2024-01-01 12:00:00", 42, 1.5, None]
+    assert decode_cursor(encode_cursor(values), 4) == values
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "!!!",
+        encode_cursor(["only one"]),
+        encode_cursor([1, 2, 3]),
+        encode_cursor([{"a": 1}, "x"]),
+        encode_cursor([[1], "x"]),
+    ],
+)
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 2)
+
+
+def _walk(client, url, key):
+    rows, cursor = [], None
+    while True:
+        page = client.get(url + (f"&cursor={cursor}" if cursor else "")).get_json()
+        rows += page[key]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows, page
+
+
+@pytest.mark.parametrize("sort, key", [("new", "created_at"), ("active", "last_activity_at"), ("hot", "hot_score")])
+def test_posts_pages_cover_every_post_once(client, sort, key):
+    posts, last = _walk(client, f"/api/community?sort={sort}&limit=7", "posts")
+    assert last["total"] == POSTS
+    assert len({p["id"] for p in posts}) == len(posts) == POSTS
+    keys = [(p[key], p["id"]) for p in posts]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_comments_pages_cover_every_comment_once(client):
+    comments, last = _walk(client, "/api/community/post-000?limit=8", "comments")
+    assert last["total_comments"] == COMMENTS
+    assert len({c["id"] for c in comments}) == len(comments) == COMMENTS
+    keys = [(c["created_at"], c["id"]) for c in comments]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_limit_is_clamped(client):
+    assert len(client.get("/api/community?limit=0").get_json()["posts"]) == 1
+    assert len(client.get("/api/community?limit=1000").get_json()["posts"]) == POSTS
+
+
+@pytest.mark.parametrize("url", ["/api/community", "/api/community/post-000"])
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor([{"$gt": 0}, "x"]), encode_cursor(["x"])])
+def test_invalid_cursor_is_a_400(client, url, cursor):
+    response = client.get(f"{url}?cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+def test_new_post_leads_the_first_page(user_client):
+    response = user_client.post("/api/community", json={"title": "New", "body": "Hello", "category": "Caving"})
+    assert response.status_code == 201
+    post_id = response.get_json()["post"]["id"]
+    first = user_client.get("/api/community?limit=5").get_json()
+    assert first["posts"][0]["id"] == post_id
+    assert first["total"] == POSTS + 1
@@ -0,0 +1,64 @@
+import contextvars
+
+import pytest
+
+import migrations
+from db import get_db
+from query_profiler import DEFAULT_QUERY_BUDGETS, SAMPLE_IDS
+
+
+def test_migrations_are_up_to_date(db):
+    assert migrations.migrate(db) == []
+    assert migrations.current_version(db) == migrations.MIGRATIONS[-1][0]
+
+
+def test_hot_queries_use_indexes(db):
+    assert migrations.check_query_plans(db) == {}
+
+
+def test_full_scan_is_reported(db):
+    assert migrations.full_scans(db, "SELECT * FROM places WHERE description = ?", ("x",))
+
+
+def _invoke(app, *args):
+    # `flask` pushes an app context for every command; the test runner does not.
+    with app.app_context():
+        return app.test_cli_runner().invoke(args=list(args))
+
+
+def test_check_query_plans_command(app):
+    result = _invoke(app, "check-query-plans")
+    assert result.exit_code == 0, result.output
+
+
+@pytest.mark.parametrize("template, budget", DEFAULT_QUERY_BUDGETS.items())
+def test_query_budget(app, query_budget, template, budget):
+    with app.app_context():
+        conn = get_db()
+        url = template.format(**{name: conn.execute(sql).fetchone()[0] for name, sql in SAMPLE_IDS.items()})
+    client = app.test_client()
+    app.extensions["response_cache"].clear()
+    with query_budget(budget):
+        response = contextvars.Context().run(client.get, url)
+        response.get_data()
+    assert response.status_code == 200, url
+
+
+def test_query_budget_reports_statements(db, query_budget):
+    with pytest.raises(pytest.fail.Exception, match=r"2 statements, budget 1:\n  2x SELECT \?"):
+        with query_budget(1):
+            db.execute("SELECT 1").fetchone()
+            db.execute("SELECT 2").fetchone()
+
+
+def test_check_query_budgets_command(app):
+    result = _invoke(app, "check-query-budgets")
+    assert result.exit_code == 0, result.output
+
+
+def test_check_query_budgets_fails_on_error_status(app, tmp_path):
+    budgets = tmp_path / "budgets.json"
+    budgets.write_text('{"/api/place/999999": 10}')
+    result = _invoke(app, "check-query-budgets", str(budgets))
+    assert result.exit_code != 0
+    assert "status 404" in result.output
@@ -0,0 +1,35 @@
+import spatial
+
+WORLD = "-180,-90,180,90"
+
+
+def test_bbox_without_zoom_is_clustered(client):
+    body = client.get(f"/api/places?bbox={WORLD}").get_json()
+    assert body["places"] == []
+    assert sum(c["count"] for c in body["clusters"]) == 10
+    assert len(body["clusters"]) <= spatial.MAX_GRID_CELLS ** 2
+
+
+def test_zoomed_in_bbox_returns_places_up_to_the_cap(app, client):
+    body = client.get(f"/api/places?bbox={WORLD}&zoom=12").get_json()
+    assert body["clusters"] == []
+    assert len(body["places"]) == 10 <= app.config["SPATIAL_MAX_PLACES"]
+
+
+def test_zoomed_in_bbox_is_clustered_past_the_cap(app, client):
+    app.config["SPATIAL_MAX_PLACES"] = 9
+    body = client.get(f"/api/places?bbox={WORLD}&zoom=12").get_json()
+    assert body["places"] == []
+    assert sum(c["count"] for c in body["clusters"]) == 10
+    assert len(body["clusters"]) <= spatial.MAX_GRID_CELLS ** 2
+
+
+def test_columnar_viewport(client):
+    body = client.get(f"/api/places?bbox={WORLD}&zoom=12&fields=id,latitude&format=columnar").get_json()
+    assert body["places"]["length"] == 10
+    assert sorted(body["places"]["columns"]["id"]) == list(range(1, 11))
+
+
+def test_cell_size_without_zoom_follows_the_viewport():
+    assert spatial.cluster_cell_size((0, 0, 32, 16), None) == 1
+    assert spatial.cluster_cell_size((0, 0, 32, 16), 0) > 1
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+import streaming
+
+ROWS = [{"name": "Place 1", "id": 1, "category_id": 2}, {"name": "Place 2", "id": 2, "category_id": 1}]
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def fetchmany(self, n):
+        chunk, self.rows = self.rows[:n], self.rows[n:]
+        return chunk
+
+
+@pytest.mark.parametrize("orjson", [streaming.orjson, None])
+def test_streamed_array_matches_jsonify(app, monkeypatch, orjson):
+    monkeypatch.setattr(streaming, "orjson", orjson)
+    with app.test_request_context():
+        expected = app.json.dumps(ROWS)
+    assert "".join(streaming.iter_json_array(_Cursor(ROWS), chunk_size=1)) == expected
+
+
+def test_ndjson_lines_have_sorted_keys():
+    lines = "".join(streaming.iter_ndjson(_Cursor(ROWS))).splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
+    assert all(list(json.loads(line)) == sorted(ROWS[0]) for line in lines)
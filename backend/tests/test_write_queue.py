@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from db import get_pool
+from write_queue import WriteQueue, WriteQueueTimeout
+
+
+def _insert_category(conn, name, delay=0.0):
+    time.sleep(delay)
+    return conn.execute("INSERT INTO categories (name) VALUES (?)", (name,)).lastrowid
+
+
+@pytest.fixture
+def writer(app):
+    return WriteQueue(get_pool(app), max_delay=0, timeout=0.2)
+
+
+def test_writes_are_committed(writer, db):
+    category_id = writer.execute(_insert_category, "Kayaking")
+    assert db.execute("SELECT name FROM categories WHERE id = ?", (category_id,)).fetchone()[0] == "Kayaking"
+
+
+def test_started_write_is_waited_for_past_the_timeout(writer, db):
+    # The intent outlives the timeout but was already running: it commits, so
+    # the caller must get its result rather than WriteQueueTimeout.
+    category_id = writer.execute(_insert_category, "Slow", 0.5)
+    assert db.execute("SELECT name FROM categories WHERE id = ?", (category_id,)).fetchone()[0] == "Slow"
+
+
+def test_queued_write_that_never_started_times_out(writer, db):
+    started = threading.Event()
+
+    def block(conn):
+        started.set()
+        time.sleep(0.5)
+
+    blocker = writer.submit(block)
+    started.wait(1)
+    with pytest.raises(WriteQueueTimeout):
+        writer.execute(_insert_category, "Never")
+    blocker.result(2)
+    time.sleep(0.1)
+    assert db.execute("SELECT 1 FROM categories WHERE name = 'Never'").fetchone() is None
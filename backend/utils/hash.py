@@ -1,9 +1,142 @@
-import bcrypt
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing service.
+#
+# Hashes are computed in a small process pool so a burst of logins cannot tie
+# up every request thread (or the GIL) with CPU-bound key derivation. Callers
+# share a bounded number of in-flight slots and wait at most
+# PASSWORD_HASH_TIMEOUT seconds in all, queueing included; past that they get
+# HashingUnavailable, which the app turns into a 503.
+#
+# PASSWORD_HASH_METHOD is any werkzeug method string, e.g. "scrypt:32768:8:1"
+# or "pbkdf2:sha256:1000000". Stored hashes made with different parameters are
+# upgraded on the next successful login (see needs_rehash).
+
+
+class HashingUnavailable(RuntimeError):
+    """The hashing pool is saturated or did not answer in time."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _check(hashed, password):
+    return check_password_hash(hashed, password)
+
+
+class PasswordHasher:
+    def __init__(self, method="scrypt", workers=2, queue_size=32, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._method_prefix = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Started on the first hash, so CLI commands and importers of
+                # the app never start workers. By then this process runs other
+                # threads (jobs, the community feed, the batch pool), and a
+                # fork could copy a lock one of them holds, so workers come
+                # from a forkserver (or are spawned) instead.
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        # One deadline for the whole call: queueing and hashing share the timeout.
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingUnavailable("Password hashing queue is full")
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._reset_pool()
+                raise HashingUnavailable("Password hashing pool crashed")
+            raise
+        # The slot is held until the work is really finished (or cancelled),
+        # not just until this caller stops waiting, so the bound holds.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            raise HashingUnavailable("Password hashing timed out")
+        except BrokenProcessPool:
+            self._reset_pool()
+            raise HashingUnavailable("Password hashing pool crashed")
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def check(self, hashed, password):
+        if not hashed:
+            return False
+        return self._run(_check, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """True when a stored hash was made with a different method or cost."""
+        if self._method_prefix is None:
+            # Let werkzeug expand defaults, e.g. "scrypt" -> "scrypt:32768:8:1".
+            self._method_prefix = generate_password_hash("", method=self.method).split("$", 1)[0]
+        return hashed.split("$", 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        self._reset_pool()
+
+
+def _hasher():
+    return current_app.extensions["password_hasher"]
+
 
-# Hash a plain text password
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Hash a plain text password with the configured method."""
+    return _hasher().hash(password)
+
+
+def check_password(hashed, password):
+    """Check a plain text password against a stored hash."""
+    return _hasher().check(hashed, password)
+
+
+def needs_rehash(hashed):
+    return _hasher().needs_rehash(hashed)
+
+
+def init_app(app):
+    cfg = app.config
+    app.extensions["password_hasher"] = PasswordHasher(
+        method=cfg.get("PASSWORD_HASH_METHOD", "scrypt"),
+        workers=int(cfg.get("PASSWORD_HASH_WORKERS", 2)),
+        queue_size=int(cfg.get("PASSWORD_HASH_QUEUE_SIZE", 32)),
+        timeout=float(cfg.get("PASSWORD_HASH_TIMEOUT", 10.0)),
+    )
 
-# Check if the provided password matches the stored hash
-def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    @app.errorhandler(HashingUnavailable)
+    def hashing_unavailable(e):
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503
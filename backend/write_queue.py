@@ -0,0 +1,147 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from flask import current_app
+from db import get_db, get_pool
+
+# Optional group-commit writer.
+#
+# With WRITE_QUEUE enabled, handlers hand small write functions to a single
+# writer thread instead of committing on their own pooled connection. The
+# writer takes everything queued within WRITE_QUEUE_MAX_DELAY_MS (up to
+# WRITE_QUEUE_MAX_BATCH intents) and applies it in one transaction. Each intent
+# runs under its own SAVEPOINT, so a failing intent is rolled back alone and
+# its exception goes to its caller. Futures resolve only after COMMIT, so a
+# request that waited on its write reads its own data back on its normal
+# connection.
+#
+# Handlers call run_write(fn, *args); fn(conn, *args) must only touch conn
+# and return plain data. Without the queue, run_write calls fn on the request
+# connection and commits it, so behaviour is the same either way.
+
+
+class WriteQueueTimeout(sqlite3.OperationalError):
+    """The writer did not start an intent within WRITE_QUEUE_TIMEOUT; it never runs."""
+
+
+class WriteQueue:
+    def __init__(self, pool, max_batch=256, max_delay=0.002, timeout=10.0):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stats = {"intents": 0, "batches": 0, "failed": 0, "largest_batch": 0}
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args) and return a Future for its result."""
+        future = Future()
+        self._ensure_writer().put((future, fn, args))
+        return future
+
+    def execute(self, fn, *args):
+        """Queue fn(conn, *args) and wait for it to be committed."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise WriteQueueTimeout("Timed out waiting for the database writer")
+            # The writer already started it, so it may commit: report what it
+            # actually did rather than a timeout the client would retry.
+            return future.result()
+
+    def _run(self):
+        conn = self.pool.connect()
+        conn.isolation_level = None  # transactions are managed explicitly below
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._apply(conn, batch)
+
+    def _apply(self, conn, batch):
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, fn, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT intent")
+                try:
+                    result = fn(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO intent")
+                    conn.execute("RELEASE intent")
+                    future.set_exception(e)
+                    self._stats["failed"] += 1
+                    continue
+                conn.execute("RELEASE intent")
+                done.append((future, result))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _, _ in batch:
+                if not future.done():
+                    if not future.running():
+                        future.set_running_or_notify_cancel()
+                    future.set_exception(e)
+            return
+        for future, result in done:
+            future.set_result(result)
+        self._stats["intents"] += len(batch)
+        self._stats["batches"] += 1
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+    def stats(self):
+        return {**self._stats, "queued": self._queue.qsize() if self._queue else 0}
+
+
+def run_write(fn, *args):
+    """Apply fn(conn, *args) through the write queue if enabled, else directly."""
+    writer = current_app.extensions.get("write_queue")
+    if writer is not None:
+        return writer.execute(fn, *args)
+    db = get_db()
+    try:
+        result = fn(db, *args)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
+def init_app(app):
+    if not app.config.get("WRITE_QUEUE"):
+        return
+    app.extensions["write_queue"] = WriteQueue(
+        get_pool(app),
+        max_batch=int(app.config.get("WRITE_QUEUE_MAX_BATCH", 256)),
+        max_delay=float(app.config.get("WRITE_QUEUE_MAX_DELAY_MS", 2)) / 1000,
+        timeout=float(app.config.get("WRITE_QUEUE_TIMEOUT", 10.0)),
+    )
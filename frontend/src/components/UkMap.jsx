@@ -1,8 +1,8 @@
-import { useEffect, useState } from 'react';
 import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
 import { Link } from 'react-router-dom';
 import L from 'leaflet';
 import 'leaflet/dist/leaflet.css';
+import ViewportPlaces from './ViewportPlaces';
 
 delete L.Icon.Default.prototype._getIconUrl;
 L.Icon.Default.mergeOptions({
@@ -18,8 +18,8 @@ const customIcon = L.icon({
   popupAnchor: [0, -35],
 });
 
-// use same pattern as in Home.jsx
-const BASE = process.env.REACT_APP_BACKEND_URL || 'http://localhost:5000';
+// Only what the markers and popups show, as parallel arrays.
+const MARKER_FIELDS = 'id,name,latitude,longitude,category_id,rating';
 
 const gmapsViewUrl = (lat, lng) =>
   `https://www.google.com/maps/search/?api=1&query=${lat},${lng}`;
@@ -28,23 +28,6 @@ const gmapsDirectionsUrl = (lat, lng) =>
   `https://www.google.com/maps/dir/?api=1&destination=${lat},${lng}`;
 
 export default function UkMap() {
-  const [places, setPlaces] = useState([]);
-
-  useEffect(() => {
-    fetch(`${BASE}/api/places`, { credentials: 'include' })
-      .then((res) => {
-        if (!res.ok) {
-          throw new Error(`HTTP ${res.status}`);
-        }
-        return res.json();
-      })
-      .then((data) => {
-        console.log('PLACES FROM API:', data);
-        setPlaces(data);
-      })
-      .catch((err) => console.error('Error fetching places:', err));
-  }, []);
-
   return (
     <MapContainer
       center={[54.5, -3]}
@@ -56,43 +39,46 @@ export default function UkMap() {
         attribution='© <a href="https://www.openstreetmap.org/">OpenStreetMap</a>'
       />
 
-      {places.map((place) => {
-        const { id, name, latitude, longitude } = place;
-        const lat = Number(latitude);
-        const lng = Number(longitude);
+      <ViewportPlaces
+        fields={MARKER_FIELDS}
+        renderPlace={(place) => {
+          const { id, name, latitude, longitude } = place;
+          const lat = Number(latitude);
+          const lng = Number(longitude);
 
-        if (isNaN(lat) || isNaN(lng)) return null;
+          if (isNaN(lat) || isNaN(lng)) return null;
 
-        return (
-          <Marker key={id} position={[lat, lng]} icon={customIcon}>
-            <Popup>
-              <strong>{name}</strong>
-              <br />
-              
+          return (
+            <Marker key={id} position={[lat, lng]} icon={customIcon}>
+              <Popup>
+                <strong>{name}</strong>
+                <br />
+                
 
-              <div style={{ marginTop: 8, display: 'grid', gap: 6 }}>
-                <Link to={`/place/${id}`}>View Place Details</Link>
+                <div style={{ marginTop: 8, display: 'grid', gap: 6 }}>
+                  <Link to={`/place/${id}`}>View Place Details</Link>
 
-                <a
-                  href={gmapsViewUrl(lat, lng)}
-                  target="_blank"
-                  rel="noopener noreferrer"
-                >
-                  Open in Google Maps
-                </a>
+                  <a
+                    href={gmapsViewUrl(lat, lng)}
+                    target="_blank"
+                    rel="noopener noreferrer"
+                  >
+                    Open in Google Maps
+                  </a>
 
-                <a
-                  href={gmapsDirectionsUrl(lat, lng)}
-                  target="_blank"
-                  rel="noopener noreferrer"
-                >
-                  Directions in Google Maps
-                </a>
-              </div>
-            </Popup>
-          </Marker>
-        );
-      })}
+                  <a
+                    href={gmapsDirectionsUrl(lat, lng)}
+                    target="_blank"
+                    rel="noopener noreferrer"
+                  >
+                    Directions in Google Maps
+                  </a>
+                </div>
+              </Popup>
+            </Marker>
+          );
+        }}
+      />
     </MapContainer>
   );
 }
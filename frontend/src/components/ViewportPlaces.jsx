@@ -0,0 +1,65 @@
+import { useCallback, useEffect, useRef, useState } from 'react';
+import { Marker, useMapEvents } from 'react-leaflet';
+import L from 'leaflet';
+import { apiGet, fromColumnar } from '../lib/api';
+
+// Places for the visible part of a Leaflet map. Asks /api/places for the
+// current bbox and zoom on mount and after every pan or zoom; the server
+// answers with either the places themselves or, zoomed out (or when there
+// are too many), clusters, shown as count bubbles that zoom in on click.
+// Must be rendered inside a <MapContainer>.
+
+const clamp = (v, lo, hi) => Math.min(Math.max(v, lo), hi);
+
+const clusterIcon = (count) =>
+  L.divIcon({
+    html: `<span>${count}</span>`,
+    className: 'map-cluster',
+    iconSize: [36, 36],
+  });
+
+export default function ViewportPlaces({ fields, renderPlace }) {
+  const [view, setView] = useState({ clusters: [], places: [] });
+  const latest = useRef(0);
+
+  const load = useCallback(
+    (map) => {
+      const b = map.getBounds();
+      const bbox = [
+        clamp(b.getWest(), -180, 180),
+        clamp(b.getSouth(), -90, 90),
+        clamp(b.getEast(), -180, 180),
+        clamp(b.getNorth(), -90, 90),
+      ].join(',');
+      const query = fields ? `&fields=${fields}&format=columnar` : '';
+      const seq = ++latest.current;
+      apiGet(`/api/places?bbox=${bbox}&zoom=${map.getZoom()}${query}`)
+        .then(({ clusters, places }) => {
+          // A slower answer for an earlier viewport must not overwrite this one.
+          if (seq !== latest.current) return;
+          setView({ clusters, places: fields ? fromColumnar(places) : places });
+        })
+        .catch((err) => console.error('Error fetching places:', err));
+    },
+    [fields]
+  );
+
+  const map = useMapEvents({ moveend: () => load(map) });
+  useEffect(() => load(map), [load, map]);
+
+  return (
+    <>
+      {view.clusters.map((c) => (
+        <Marker
+          key={`${c.latitude},${c.longitude}`}
+          position={[c.latitude, c.longitude]}
+          icon={clusterIcon(c.count)}
+          eventHandlers={{
+            click: () => map.setView([c.latitude, c.longitude], map.getZoom() + 2),
+          }}
+        />
+      ))}
+      {view.places.map(renderPlace)}
+    </>
+  );
+}
@@ -32,20 +32,87 @@ async function request(path, opts = {}) {
 
   const body = await parseBody(res);
 
-  if (!res.ok) {
-    const msg =
-      (body && typeof body === "object" && (body.error || body.message)) ||
+  if (!res.ok) throw errorFrom(body, res.status);
+  return body ?? {};
+}
+
+// Plain GETs issued in the same tick (e.g. by components mounting together)
+// go out as one POST /api/batch; each caller still gets its own result/error.
+const BATCH_MAX = 20;
+let pendingGets = null;
+
+function errorFrom(body, status) {
+  return new Error(
+    (body && typeof body === "object" && (body.error || body.message)) ||
       (typeof body === "string" && body) ||
-      `HTTP ${res.status}`;
-    throw new Error(msg);
+      `HTTP ${status}`
+  );
+}
+
+async function sendBatch(items) {
+  if (items.length === 1) {
+    request(items[0].path).then(items[0].resolve, items[0].reject);
+    return;
   }
-  return body ?? {};
+  let responses;
+  try {
+    ({ responses } = await request("/api/batch", {
+      method: "POST",
+      body: JSON.stringify({ requests: items.map((i) => i.path) }),
+    }));
+  } catch {
+    items.forEach((i) => request(i.path).then(i.resolve, i.reject));
+    return;
+  }
+  responses.forEach(({ status, body }, n) => {
+    if (status >= 200 && status < 300) items[n].resolve(body ?? {});
+    else items[n].reject(errorFrom(body, status));
+  });
 }
 
-export const apiGet  = (path, opts) => request(path, opts);
+function flushGets() {
+  const items = pendingGets;
+  pendingGets = null;
+  for (let i = 0; i < items.length; i += BATCH_MAX) sendBatch(items.slice(i, i + BATCH_MAX));
+}
+
+function batchedGet(path) {
+  if (!pendingGets) {
+    pendingGets = [];
+    setTimeout(flushGets, 0);
+  }
+  return new Promise((resolve, reject) => pendingGets.push({ path, resolve, reject }));
+}
+
+export const apiGet  = (path, opts) => (opts ? request(path, opts) : batchedGet(path));
 export const apiSend = (path, method = "POST", body = {}, opts = {}) =>
   request(path, {
     method,
     body: Object.keys(body || {}).length ? JSON.stringify(body) : undefined,
     ...opts,
-  });
\ No newline at end of file
+  });
+// Image sets from the API ({src, srcset, webp_srcset}) use backend-relative URLs.
+export const imageSet = (set) =>
+  set && {
+    src: buildUrl(set.src),
+    srcSet: set.srcset.replace(/(^|, )\//g, `$1${API_BASE}/`),
+    webpSrcSet: set.webp_srcset.replace(/(^|, )\//g, `$1${API_BASE}/`),
+  };
+
+// Rows from a ?format=columnar payload ({length, columns: {field: [...]}}).
+export const fromColumnar = ({ length, columns }) =>
+  Array.from({ length }, (_, i) =>
+    Object.fromEntries(Object.keys(columns).map((k) => [k, columns[k][i]]))
+  );
+
+// Server-Sent Events: calls handlers[event.type](data) for each JSON event.
+// EventSource reconnects and resumes from the last event id by itself; a
+// `reset` event means events were missed, so handlers.reset should reload.
+// Returns a function that closes the stream.
+export const openStream = (path, handlers) => {
+  const source = new EventSource(buildUrl(path), { withCredentials: true });
+  Object.entries(handlers).forEach(([type, handler]) =>
+    source.addEventListener(type, (e) => handler(e.data ? JSON.parse(e.data) : null))
+  );
+  return () => source.close();
+};
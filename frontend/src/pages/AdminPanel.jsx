@@ -17,9 +17,9 @@ function AdminPanel() {
     setLoading(true);
     setError(null);
     try {
-      
-      const result = await apiGet(`/api/admin/${activeTab}`);
-      
+      // Admin listings are streamed, which /api/batch refuses: fetch directly.
+      const result = await apiGet(`/api/admin/${activeTab}`, {});
+
       const rows = Array.isArray(result) ? result : result?.items || [];
       setData(rows);
     } catch (err) {
@@ -3,7 +3,7 @@ import { useEffect, useState } from "react";
 import { FaStar } from "react-icons/fa";
 import "../styles/CategoryPage.css";
 import CategoryMap from "./CategoryMap";
-import { apiGet } from "../lib/api";
+import { apiGet, imageSet } from "../lib/api";
 
 export default function CategoryPage({ isLoggedIn, openAuth }) {
   const { id } = useParams();
@@ -125,18 +125,25 @@ export default function CategoryPage({ isLoggedIn, openAuth }) {
             category.places.map((place, index) => {
               const pid = place.id ?? index;
               const rounded = Math.round(place.rating || 0);
+              const img = imageSet(place.image_set);
 
               return (
                 <Link to={`/place/${pid}`} key={pid} className="place-card">
                   <div className="place-image-wrap">
-                    <img
-                      src={place.image || "/images/default.jpg"}
-                      alt={place.name || "Unknown"}
-                      loading="lazy"
-                      onError={(e) => {
-                        e.currentTarget.src = "/images/default.jpg";
-                      }}
-                    />
+                    <picture>
+                      {img && <source type="image/webp" srcSet={img.webpSrcSet} sizes="(max-width: 600px) 100vw, 400px" />}
+                      <img
+                        src={img ? img.src : place.image || "/images/default.jpg"}
+                        srcSet={img ? img.srcSet : undefined}
+                        sizes="(max-width: 600px) 100vw, 400px"
+                        alt={place.name || "Unknown"}
+                        loading="lazy"
+                        onError={(e) => {
+                          e.currentTarget.srcset = "";
+                          e.currentTarget.src = "/images/default.jpg";
+                        }}
+                      />
+                    </picture>
                     <div className="img-gradient" />
                     <div className="place-title-onimage">{place.name || "Some Place"}</div>
                   </div>
@@ -1,10 +1,11 @@
 import { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
 import "../styles/Community.css";
-import { apiGet, apiSend } from "../lib/api";
+import { apiGet, apiSend, openStream } from "../lib/api";
 
 export default function Community({ isLoggedIn }) {
   const [posts, setPosts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showForm, setShowForm] = useState(false);
   const [newPost, setNewPost] = useState({ title: "", body: "", category: "" });
@@ -17,6 +18,7 @@ export default function Community({ isLoggedIn }) {
     try {
       const d = await apiGet("/api/community");
       setPosts(Array.isArray(d.posts) ? d.posts : []);
+      setNextCursor(d.next_cursor || null);
     } catch (e) {
       setError(e.message);
     } finally {
@@ -31,6 +33,33 @@ export default function Community({ isLoggedIn }) {
     loadPosts();
   }, []);
 
+  useEffect(() => {
+    if (!isLoggedIn) return undefined;
+    return openStream("/api/community/stream", {
+      post_created: (post) =>
+        setPosts((prev) => (prev.some((p) => p.id === post.id) ? prev : [post, ...prev])),
+      post_deleted: ({ id }) => setPosts((prev) => prev.filter((p) => p.id !== id)),
+      comment_created: (c) =>
+        setPosts((prev) =>
+          prev.map((p) => (p.id === c.post_id ? { ...p, comment_count: (p.comment_count || 0) + 1 } : p))
+        ),
+      reset: () => loadPosts(),
+    });
+  }, [isLoggedIn]);
+
+  const handleLoadMore = async () => {
+    try {
+      const d = await apiGet(`/api/community?cursor=${encodeURIComponent(nextCursor)}`);
+      setPosts((prev) => {
+        const seen = new Set(prev.map((p) => p.id));
+        return [...prev, ...(d.posts || []).filter((p) => !seen.has(p.id))];
+      });
+      setNextCursor(d.next_cursor || null);
+    } catch (e) {
+      setError(e.message);
+    }
+  };
+
   const handleInputChange = (e) => {
     const { name, value } = e.target;
     setNewPost((prev) => ({ ...prev, [name]: value }));
@@ -114,6 +143,11 @@ export default function Community({ isLoggedIn }) {
               </div>
             </Link>
           ))}
+          {nextCursor && (
+            <button className="btn load-more" onClick={handleLoadMore}>
+              Load more posts
+            </button>
+          )}
         </div>
       )}
 
@@ -1,6 +1,7 @@
 import { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
 import "../styles/global.css";
+import { apiGet } from "../lib/api";
 
 const PROMO_TEXTS = [
   "Find your next adventure",
@@ -8,8 +9,6 @@ const PROMO_TEXTS = [
   "Track your favorite places",
 ];
 
-const BASE = process.env.REACT_APP_BACKEND_URL || "http://localhost:5000";
-
 export default function Home({ isLoggedIn }) {
   const [categories, setCategories] = useState([]);
   const [promoIndex, setPromoIndex] = useState(0);
@@ -21,11 +20,7 @@ export default function Home({ isLoggedIn }) {
     setIsLoadingCategories(true);
     setLoadError(null);
 
-    fetch(`${BASE}/api/categories`, { credentials: "include" })
-      .then((res) => {
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        return res.json();
-      })
+    apiGet("/api/categories")
       .then((data) => {
         if (!cancelled) {
           setCategories(data || []);
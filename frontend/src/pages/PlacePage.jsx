@@ -7,7 +7,7 @@ import { toast } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 import "leaflet/dist/leaflet.css";
 import "../styles/PlacePage.css";
-import { apiGet, apiSend } from "../lib/api";
+import { apiGet, apiSend, imageSet } from "../lib/api";
 import { FaLocationArrow } from "react-icons/fa";
 
 const customMarkerIcon = new L.Icon({
@@ -129,7 +129,11 @@ export default function PlacePage({ isLoggedIn, userRole, currentUser }) {
             (sum, r) => sum + (Number(r.rating) || 0),
             0
           ) / updatedReviews.length;
-        return { ...prev, reviews: updatedReviews, rating: avgRating };
+        return {
+          ...prev,
+          reviews: updatedReviews,
+          rating: savedReview.place_avg_rating ?? avgRating,
+        };
       });
 
       setRating(0);
@@ -140,6 +144,21 @@ export default function PlacePage({ isLoggedIn, userRole, currentUser }) {
     }
   };
 
+  const handleLoadMoreReviews = async () => {
+    try {
+      const data = await apiGet(
+        `/api/place/${id}?cursor=${encodeURIComponent(place.next_cursor)}`
+      );
+      setPlace((prev) => ({
+        ...prev,
+        reviews: [...(prev.reviews || []), ...(data.reviews || [])],
+        next_cursor: data.next_cursor,
+      }));
+    } catch {
+      toast.error("Failed to load more reviews.");
+    }
+  };
+
   const handleDeleteReview = async (reviewId) => {
     if (!window.confirm("Delete this review?")) return;
     try {
@@ -172,6 +191,7 @@ export default function PlacePage({ isLoggedIn, userRole, currentUser }) {
     ));
 
   if (!place) return <div>Loading...</div>;
+  const heroImage = imageSet(place.image_set);
 
   return (
     <div className="place-page">
@@ -198,7 +218,17 @@ export default function PlacePage({ isLoggedIn, userRole, currentUser }) {
       </nav>
 
       <div className="image-container">
-        <img src={place.image} alt={place.name} className="place-image" loading="lazy" />
+        <picture>
+          {heroImage && <source type="image/webp" srcSet={heroImage.webpSrcSet} sizes="100vw" />}
+          <img
+            src={heroImage ? heroImage.src : place.image}
+            srcSet={heroImage ? heroImage.srcSet : undefined}
+            sizes="100vw"
+            alt={place.name}
+            className="place-image"
+            loading="lazy"
+          />
+        </picture>
         <div className="place-details">
           <div className="map-button-container-horizontal">
             <div className="map-button-item">
@@ -385,6 +415,11 @@ export default function PlacePage({ isLoggedIn, userRole, currentUser }) {
             </div>
           ))}
         </div>
+        {place.next_cursor && (
+          <button className="load-more-reviews" onClick={handleLoadMoreReviews}>
+            Load more reviews
+          </button>
+        )}
       </section>
     </div>
   );
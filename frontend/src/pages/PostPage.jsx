@@ -1,7 +1,7 @@
 import { useEffect, useState } from "react";
 import { useParams, useNavigate, Link } from "react-router-dom";
 import "../styles/Community.css";
-import { apiGet, apiSend } from "../lib/api";
+import { apiGet, apiSend, openStream } from "../lib/api";
 
 export default function PostPage() {
   const { id } = useParams();
@@ -31,6 +31,42 @@ export default function PostPage() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [id]);
 
+  useEffect(
+    () =>
+      openStream(`/api/community/stream?post=${encodeURIComponent(id)}`, {
+        comment_created: (c) =>
+          setPost((prev) => {
+            if (!prev) return prev;
+            const comments = prev.comments || [];
+            if (comments.some((x) => x.id === c.id)) return prev;
+            // Replace our own optimistic copy (it has no id yet) if it is there.
+            const mine = comments.findIndex((x) => x.id === undefined && x.body === c.body);
+            const rest = mine === -1 ? comments : comments.filter((_, i) => i !== mine);
+            return { ...prev, comments: [c, ...rest] };
+          }),
+        post_deleted: () => navigate("/community"),
+        reset: () => load(),
+      }),
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+    [id]
+  );
+
+  const handleLoadMore = async () => {
+    try {
+      const data = await apiGet(`/api/community/${id}?cursor=${encodeURIComponent(post.next_cursor)}`);
+      setPost((prev) => {
+        const seen = new Set((prev.comments || []).map((c) => c.id));
+        return {
+          ...prev,
+          comments: [...(prev.comments || []), ...(data.comments || []).filter((c) => !seen.has(c.id))],
+          next_cursor: data.next_cursor,
+        };
+      });
+    } catch (e) {
+      setError(e.message || "Failed to load more comments");
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (!comment.trim() || sending) return;
@@ -114,6 +150,11 @@ export default function PostPage() {
         ) : (
           <p className="empty-state">No comments yet.</p>
         )}
+        {post.next_cursor && (
+          <button className="btn load-more" onClick={handleLoadMore}>
+            Load more comments
+          </button>
+        )}
 
         <form className="comment-form" onSubmit={handleSubmit}>
           <textarea